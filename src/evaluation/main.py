@@ -1,27 +1,19 @@
+import argparse
 import os
 import re
 import sys
 import traceback
 
-import pandas as pd
-from pandas.errors import EmptyDataError
-
 from ..laws_database import similarity_search
+from ..question_crawl.question_bank import load_question_bank
+from .results_store import ResultsStore
+from .runner import EVAL_WORKERS, run_ordered
 
-
-def get_qa_from_csv(file_path: str):
-    try:
-        df = pd.read_csv(file_path)
-    except EmptyDataError:
-        print(f"The file at {file_path} is empty.", file=sys.stderr)
-        return pd.DataFrame(columns=["number", "answer", "question"])
-    except Exception as e:
-        print(f"Error reading {file_path}: {e}", file=sys.stderr)
-        return pd.DataFrame(columns=["number", "answer", "question"])
-    return df
+# 預設的評估代號，結果同時匯出成 evaluation_results.csv
+RUN_ID = "main"
 
 
-def ask(query: str):
+def ask(query: str, echo: bool = True):
     agent = similarity_search.create_law_assistant_agent(
         verbose=True, config={"recursion_limit": 100}, model_name="gpt-oss:20b"
     )
@@ -64,27 +56,30 @@ def ask(query: str):
             # print(token.content_blocks)
             if token.content_blocks and token.content_blocks[0].get('type', '') == 'text':
                 result += token.content_blocks[0].get('text', '')
-                print(token.content_blocks[0].get('text', ''), end='', flush=True, file=sys.stderr)
+                if echo:
+                    print(token.content_blocks[0].get('text', ''), end='', flush=True, file=sys.stderr)
             elif token.content_blocks and token.content_blocks[0].get('type', '') in ['tool_call_chunk']:
                 pass
 
         elif metadata['langgraph_node'] in ['tools']:
             pass
-        else:
+        elif echo:
             print(f"node: {metadata['langgraph_node']}", flush=True, file=sys.stderr)
             print(token.content_blocks, end='', flush=True, file=sys.stderr)
     final_answer = result.strip().split("\n")[-1]
 
     return final_answer
 
-def try_ask(question: str) -> str:
+def try_ask(question: str, echo: bool = True) -> str:
     response = ""
+    last_error = None
     try_times = 0
     while True:
         try_times += 1
         if try_times > 10:
             print("FAILED")
-            break
+            # 丟出例外讓 run_ordered 記下錯誤，這題不算已作答，下次執行重新問
+            raise RuntimeError(f"no valid answer after 10 tries: {last_error}") from last_error
         try:
             if try_times > 7:
                 print("FINAL TRIES:")
@@ -93,10 +88,11 @@ def try_ask(question: str) -> str:
                     ("請直接輸出正確的選項編號（例如：1、2、3、4、A、B、C、D）。\n"
                     "不要輸出解釋或其他文字。\n"
                     "答案格式：只輸出數字或英文字母。\n"
-                    "如果不確定，也請選最可能的答案。")
+                    "如果不確定，也請選最可能的答案。"),
+                    echo=echo,
                 )
             else:
-                response = ask(question)
+                response = ask(question, echo=echo)
                 # print(response)
                 # print(response.strip())
                 # for idx, c in enumerate(response.strip()):
@@ -108,47 +104,72 @@ def try_ask(question: str) -> str:
             if not response or response.strip()[-1] == "…" or len(response.strip().split('|'))<2:
                 raise Exception("model output incorrect")
             break
-        except Exception:
+        except Exception as e:
+            last_error = e
             print("Error during ask():")
             print(traceback.format_exc())
             print("Retrying...")
     return response
 
-def main():
-    for f in os.listdir(os.path.join(os.path.dirname(__file__),"..","question_crawl", "csvs")):
-        result_csv = os.path.join(os.path.dirname(__file__),"evaluation_results.csv")
-        print(f"Evaluating file: {f}")
-        df = get_qa_from_csv(os.path.join(os.path.dirname(__file__),"..","question_crawl", "csvs", f))
-        if df.empty:
-            continue
-        for _, row in df.iterrows():
-            idx = row["number"]
-            question = row["question"]
-            answer = row["answer"]
-            print("-----")
-            print(f"#Q{idx} Question: {question}")
-            
-            response = try_ask(question)
-            print()
-            response = response.split('|')[-1]
+def main(workers: int = EVAL_WORKERS, run_id: str = RUN_ID):
+    result_path = os.path.join(os.path.dirname(__file__), "evaluation_results.csv")
+    # 題庫 (question_crawl/question_bank.parquet) 一次載入
+    bank = load_question_bank()
+    questions = list(bank[["file", "number", "question", "answer"]].itertuples(index=False, name=None))
+    store = ResultsStore()
+    try:
+        if store.count(run_id) == 0 and run_id == RUN_ID:
+            # 舊版直接附加到 CSV 的結果
+            imported = store.import_csv(run_id, result_path)
+            if imported:
+                print(f"Imported {imported} answers from {result_path}")
+        # 已作答的題目跳過，中斷後重新執行從沒做完的地方繼續
+        answered = store.answered(run_id)
+        todo = [item for item in questions if (item[0], int(item[1])) not in answered]
+        print(
+            f"Run {run_id}: {len(questions)} questions from {bank['file'].nunique()} files, "
+            f"{len(questions) - len(todo)} already answered, evaluating {len(todo)} with {workers} workers"
+        )
+        # 同時只有一題時照舊即時印出模型的輸出
+        echo = workers <= 1
+
+        def evaluate(item):
+            f, idx, question, answer = item
+            if echo:
+                print("-----")
+                print(f"#Q{idx} Question: {question}")
+            response = try_ask(question, echo=echo)
+            if echo:
+                print()
+            return response.split('|')[-1]
+
+        def write_result(item, response, latency, error):
+            f, idx, question, answer = item
             # match = re.search(r'([A-Za-z0-9]+)$', response.strip())
             # if match:
             #     response = match.group(1)
-            print(f"Model Answer: {response}")
-            print(f"Correct Answer: {answer}")
-            row = pd.DataFrame([{
-                "file": f,
-                "number": idx,
-                "question": question,
-                "model_answer": response,
-                "correct_answer": answer
-            }])
-            result_path = os.path.join(os.path.dirname(__file__), result_csv)
-            if not os.path.exists(result_path):
-                row.to_csv(result_path, index=False, encoding="utf-8")
+            if error is not None:
+                print(f"#Q{idx} ({f}) failed: {error}")
             else:
-                row.to_csv(result_path, mode="a", index=False, header=False, encoding="utf-8")
+                print(f"[{f}] #Q{idx} Model Answer: {response} Correct Answer: {answer} ({latency:.1f}s)")
+            store.record(
+                run_id, f, idx, question, response or "", answer, latency,
+                None if error is None else f"{type(error).__name__}: {error}",
+            )
+
+        run_ordered(todo, evaluate, write_result, workers)
+    finally:
+        # view_result.ipynb 讀取的 CSV
+        if run_id == RUN_ID:
+            store.export_csv(result_path, [run_id])
+        store.close()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Ask the law assistant every question of the question bank")
+    parser.add_argument("--workers", type=int, default=EVAL_WORKERS,
+                        help="questions in flight (default: EVAL_WORKERS or OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--run-id", default=RUN_ID,
+                        help="results are stored per run id; questions already answered in this run are skipped")
+    args = parser.parse_args()
+    main(args.workers, args.run_id)
@@ -1,24 +1,15 @@
+import argparse
 import os
 import re
 import sys
 import traceback
 
-import pandas as pd
-from pandas.errors import EmptyDataError
-
 from ..laws_database import similarity_search
+from ..question_crawl.question_bank import load_question_bank
+from .results_store import ResultsStore
+from .runner import EVAL_WORKERS, run_ordered
 
-
-def get_qa_from_csv(file_path: str):
-    try:
-        df = pd.read_csv(file_path)
-    except EmptyDataError:
-        print(f"The file at {file_path} is empty.", file=sys.stderr)
-        return pd.DataFrame(columns=["number", "answer", "question"])
-    except Exception as e:
-        print(f"Error reading {file_path}: {e}", file=sys.stderr)
-        return pd.DataFrame(columns=["number", "answer", "question"])
-    return df
+RUN_ID = "repeat"
 
 
 def ask(query: str):
@@ -79,12 +70,14 @@ def ask(query: str):
 
 def try_ask(question: str) -> str:
     response = ""
+    last_error = None
     try_times = 0
     while True:
         try_times += 1
         if try_times > 10:
             print("FAILED")
-            break
+            # 丟出例外讓 run_ordered 記下錯誤，這題不算已作答，下次執行重新問
+            raise RuntimeError(f"no valid answer after 10 tries: {last_error}") from last_error
         try:
             if try_times > 7:
                 print("FINAL TRIES:")
@@ -108,49 +101,73 @@ def try_ask(question: str) -> str:
             if not response or response.strip()[-1] == "…":
                 raise Exception("model output incorrect")
             break
-        except Exception:
+        except Exception as e:
+            last_error = e
             print("Error during ask():")
             print(traceback.format_exc())
             print("Retrying...")
     return response
 
-def main():
+def main(workers: int = EVAL_WORKERS, repeats: int = 5, run_id: str = RUN_ID):
     # for f in os.listdir(os.path.join(os.path.dirname(__file__),"..","question_crawl", "csvs")):
-    for f in ["22200_-職業安全衛生管理學科.csv"]:
-        result_csv = os.path.join(os.path.dirname(__file__),"evaluation_results_repeat.csv")
-        print(f"Evaluating file: {f}")
-        df = get_qa_from_csv(os.path.join(os.path.dirname(__file__),"..","question_crawl", "csvs", f))
-        if df.empty:
-            continue
-        for _, row in df.iterrows():
-            idx = row["number"]
-            question = row["question"]
-            answer = row["answer"]
-            for i in range(5):
-                print("-----")
-                print(f"#Q{idx} Question: {question}")
-                
-                response = try_ask(question)
-                print()
-                response = response.split('|')[-1]
-                # match = re.search(r'([A-Za-z0-9]+)$', response.strip())
-                # if match:
-                #     response = match.group(1)
+    files = ["22200_-職業安全衛生管理學科.csv"]
+    result_path = os.path.join(os.path.dirname(__file__), "evaluation_results_repeat.csv")
+    bank = load_question_bank()
+    bank = bank[bank["file"].isin(files)]
+    # 每題問 repeats 次，第 i 次的結果存在 "<run_id>-<i>"
+    run_ids = [f"{run_id}-{i + 1}" for i in range(repeats)]
+    store = ResultsStore()
+    try:
+        if run_id == RUN_ID and not store.repeat_run_ids(run_id):
+            # 舊版直接附加到 CSV 的結果，同一題的第 i 列為第 i 次重複
+            imported = store.import_csv(run_id, result_path, repeated=True)
+            if imported:
+                print(f"Imported {imported} answers from {result_path}")
+        answered = {rid: store.answered(rid) for rid in run_ids}
+        questions = [
+            (f, idx, question, answer, i)
+            for f, idx, question, answer in bank[["file", "number", "question", "answer"]].itertuples(index=False, name=None)
+            for i in range(repeats)
+        ]
+        todo = [item for item in questions if (item[0], int(item[1])) not in answered[run_ids[item[4]]]]
+        print(
+            f"Run {run_id}: {len(bank)} questions x {repeats}, {len(questions) - len(todo)} already answered, "
+            f"evaluating {len(todo)} with {workers} workers"
+        )
+
+        def evaluate(item):
+            return try_ask(item[2]).split('|')[-1]
+
+        def write_result(item, response, latency, error):
+            f, idx, question, answer, i = item
+            print("-----")
+            print(f"#Q{idx} Question: {question} (run {i + 1}/{repeats}, {latency:.1f}s)")
+            # match = re.search(r'([A-Za-z0-9]+)$', response.strip())
+            # if match:
+            #     response = match.group(1)
+            if error is not None:
+                print(f"#Q{idx} ({f}) failed: {error}")
+            else:
                 print(f"Model Answer: {response}")
                 print(f"Correct Answer: {answer}")
-                row = pd.DataFrame([{
-                    "file": f,
-                    "number": idx,
-                    "question": question,
-                    "model_answer": response,
-                    "correct_answer": answer
-                }])
-                result_path = os.path.join(os.path.dirname(__file__), result_csv)
-                if not os.path.exists(result_path):
-                    row.to_csv(result_path, index=False, encoding="utf-8")
-                else:
-                    row.to_csv(result_path, mode="a", index=False, header=False, encoding="utf-8")
+            store.record(
+                run_ids[i], f, idx, question, response or "", answer, latency,
+                None if error is None else f"{type(error).__name__}: {error}",
+            )
+
+        run_ordered(todo, evaluate, write_result, workers)
+    finally:
+        # 匯入的重複次數可能多於 repeats，一併匯出
+        store.export_csv(result_path, sorted(set(run_ids) | set(store.repeat_run_ids(run_id))))
+        store.close()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Ask every question of the selected files several times")
+    parser.add_argument("--workers", type=int, default=EVAL_WORKERS,
+                        help="questions in flight (default: EVAL_WORKERS or OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--run-id", default=RUN_ID,
+                        help="repeat i is stored as <run-id>-<i>; questions already answered are skipped")
+    args = parser.parse_args()
+    main(args.workers, args.repeats, args.run_id)
@@ -0,0 +1,224 @@
+"""
+評估結果 (evaluation_results.db，SQLite)
+
+每題一列，以 (run_id, file, number) 為主鍵，記錄題目、模型答案、正確答案、延遲與錯誤訊息。
+取代原本每題都建一個 DataFrame、重新開檔附加一列的 evaluation_results.csv：
+連線只開一次，每題一個 upsert 立即提交，中斷後重新執行時 answered() 的題目直接跳過。
+
+- run_id 區分不同次的評估 (例如換模型、換切塊方式)；repeat.py 的第 i 次重複為 "<run_id>-<i>"
+- 丟出例外的題目也會記下 (error 不為空)，但不算已作答，下次執行重新問
+- 第一次開啟某個 run 時匯入舊版的 CSV (repeat.py 的 CSV 同一題的第 i 列匯入 "<run_id>-<i>")；
+  跑完後匯出成 CSV，view_result.ipynb 照舊讀取
+
+從 src/ 執行：
+    python -m evaluation.results_store status
+    python -m evaluation.results_store export --run-id main --output evaluation/evaluation_results.csv
+"""
+import argparse
+import csv
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+import pandas as pd
+
+RESULTS_DB = os.path.join(os.path.dirname(__file__), "evaluation_results.db")
+CSV_COLUMNS = ["file", "number", "question", "model_answer", "correct_answer"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS evaluation_results (
+    run_id TEXT NOT NULL,
+    file TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    question TEXT,
+    model_answer TEXT,
+    correct_answer TEXT,
+    latency REAL,
+    error TEXT,
+    answered_at TEXT NOT NULL,
+    PRIMARY KEY (run_id, file, number)
+);
+"""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+class ResultsStore:
+    def __init__(self, path: str = RESULTS_DB):
+        self.path = path
+        # run_ordered 只在主執行緒寫入，lock 讓其他執行緒讀取 (例如 Jupyter) 也安全
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def count(self, run_id: str) -> int:
+        with self._lock:
+            return self.conn.execute(
+                "SELECT count(*) FROM evaluation_results WHERE run_id = ?", (run_id,)
+            ).fetchone()[0]
+
+    def answered(self, run_id: str) -> set[tuple[str, int]]:
+        """已作答 (沒有錯誤) 的 (file, number)。"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT file, number FROM evaluation_results WHERE run_id = ? AND error IS NULL", (run_id,)
+            )
+            return {(row["file"], row["number"]) for row in rows}
+
+    def record(
+        self,
+        run_id: str,
+        file: str,
+        number: int,
+        question: str,
+        model_answer: str,
+        correct_answer: str,
+        latency: float | None = None,
+        error: str | None = None,
+    ):
+        with self._lock:
+            self.conn.execute(
+                """
+                INSERT INTO evaluation_results
+                    (run_id, file, number, question, model_answer, correct_answer, latency, error, answered_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (run_id, file, number) DO UPDATE SET
+                    question = excluded.question, model_answer = excluded.model_answer,
+                    correct_answer = excluded.correct_answer, latency = excluded.latency,
+                    error = excluded.error, answered_at = excluded.answered_at
+                """,
+                (run_id, file, int(number), question, model_answer, str(correct_answer), latency, error, _now()),
+            )
+
+    def repeat_run_ids(self, run_id: str) -> list[str]:
+        """已存在的 "<run_id>-<i>" (repeat.py 的各次重複)。"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT run_id FROM evaluation_results WHERE run_id GLOB ?", (f"{run_id}-[0-9]*",)
+            )
+            run_ids = [row[0] for row in rows if row[0][len(run_id) + 1:].isdigit()]
+        return sorted(run_ids, key=lambda rid: int(rid[len(run_id) + 1:]))
+
+    def import_csv(self, run_id: str, csv_path: str, repeated: bool = False) -> int:
+        """
+        匯入舊版的結果 CSV (file, number, question, model_answer, correct_answer)，已有的題目不覆蓋。
+        repeated 時同一題的第 i 列存成 "<run_id>-<i>" (repeat.py 的 CSV 每題有多列)。
+        """
+        if not os.path.exists(csv_path):
+            return 0
+        df = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+        if df.empty:
+            return 0
+        df = df[CSV_COLUMNS]
+        if repeated:
+            occurrence = df.groupby(["file", "number"], sort=False).cumcount() + 1
+            run_ids = [f"{run_id}-{i}" for i in occurrence]
+        else:
+            run_ids = [run_id] * len(df)
+        rows = [
+            (rid, r.file, int(r.number), r.question, r.model_answer, r.correct_answer, _now())
+            for rid, r in zip(run_ids, df.itertuples(index=False))
+        ]
+        with self._lock:
+            before = self.conn.total_changes
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany(
+                    """
+                    INSERT INTO evaluation_results
+                        (run_id, file, number, question, model_answer, correct_answer, answered_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (run_id, file, number) DO NOTHING
+                    """,
+                    rows,
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            return self.conn.total_changes - before
+
+    def frame(self, run_id: str | None = None) -> pd.DataFrame:
+        query = "SELECT * FROM evaluation_results"
+        params = ()
+        if run_id is not None:
+            query += " WHERE run_id = ?"
+            params = (run_id,)
+        with self._lock:
+            return pd.read_sql_query(query + " ORDER BY run_id, answered_at, file, number", self.conn, params=params)
+
+    def export_csv(self, csv_path: str, run_ids: list[str]) -> int:
+        """把 run_ids 的結果依作答順序寫成舊版格式的 CSV (先寫暫存檔再取代)。"""
+        placeholders = ", ".join("?" for _ in run_ids)
+        with self._lock:
+            rows = self.conn.execute(
+                f"""
+                SELECT file, number, question, model_answer, correct_answer FROM evaluation_results
+                WHERE run_id IN ({placeholders}) ORDER BY answered_at, rowid
+                """,
+                run_ids,
+            ).fetchall()
+        tmp = f"{csv_path}.tmp"
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_COLUMNS)
+            writer.writerows(tuple(row) for row in rows)
+        os.replace(tmp, csv_path)
+        return len(rows)
+
+    def status(self) -> list[dict]:
+        with self._lock:
+            rows = self.conn.execute(
+                """
+                SELECT run_id, count(*) AS questions, count(*) - count(error) AS answered,
+                       count(error) AS failed,
+                       sum(CASE WHEN error IS NULL AND model_answer = correct_answer THEN 1 ELSE 0 END) AS correct,
+                       max(answered_at) AS last_answer
+                FROM evaluation_results GROUP BY run_id ORDER BY run_id
+                """
+            )
+            return [dict(row) for row in rows]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or export the evaluation results store")
+    parser.add_argument("--db", default=RESULTS_DB)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="answered / failed / correct per run")
+    export_parser = sub.add_parser("export", help="write one or more runs as a results CSV")
+    export_parser.add_argument("--run-id", action="append", required=True)
+    export_parser.add_argument("--output", required=True)
+    import_parser = sub.add_parser("import", help="import a results CSV written by an older version")
+    import_parser.add_argument("--run-id", required=True)
+    import_parser.add_argument("--repeated", action="store_true",
+                               help="several rows per question (repeat.py): row i goes to <run-id>-<i>")
+    import_parser.add_argument("csv")
+    args = parser.parse_args()
+
+    with ResultsStore(args.db) as store:
+        if args.command == "status":
+            for row in store.status():
+                print(
+                    f"{row['run_id']}: {row['answered']} answered, {row['failed']} failed, "
+                    f"{row['correct']} correct, last {row['last_answer']}"
+                )
+        elif args.command == "export":
+            print(f"{store.export_csv(args.output, args.run_id)} rows -> {args.output}")
+        else:
+            print(f"imported {store.import_csv(args.run_id, args.csv, args.repeated)} rows")
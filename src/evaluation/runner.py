@@ -0,0 +1,123 @@
+"""
+並行評估：同時送出 workers 個問題給 agent (Ollama 同時處理的請求數由 OLLAMA_NUM_PARALLEL 決定，
+workers 預設與它相同，多送只會在 Ollama 端排隊)，結果仍依題目順序交給 on_result 寫入。
+每完成一題印出進度：完成數、每分鐘題數、預估剩餘時間與每題延遲的 p50 / p95。
+"""
+import os
+import statistics
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+
+# 預設與 Ollama 的平行槽數相同
+EVAL_WORKERS = int(os.environ.get("EVAL_WORKERS", os.environ.get("OLLAMA_NUM_PARALLEL", "1")))
+
+
+class Progress:
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.latencies = []
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, latency: float, failed: bool = False):
+        with self._lock:
+            self.done += 1
+            self.failed += failed
+            self.latencies.append(latency)
+            line = self.line()
+        print(line, file=sys.stderr, flush=True)
+
+    def line(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        rate = self.done / elapsed if elapsed else 0.0
+        eta = (self.total - self.done) / rate if rate else float("inf")
+        latencies = sorted(self.latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0
+        return (
+            f"[eval] {self.done}/{self.total} ({self.failed} failed), {rate * 60:.1f} q/min, "
+            f"ETA {_duration(eta)}, latency p50 {statistics.median(latencies) if latencies else 0:.1f}s p95 {p95:.1f}s"
+        )
+
+    def summary(self) -> dict:
+        latencies = sorted(self.latencies)
+        elapsed = time.perf_counter() - self.started
+        return {
+            "questions": self.done,
+            "failed": self.failed,
+            "seconds": round(elapsed, 1),
+            "questions_per_min": round(self.done / elapsed * 60, 2) if elapsed else None,
+            "latency_p50": round(statistics.median(latencies), 2) if latencies else None,
+            "latency_p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2) if latencies else None,
+            "latency_max": round(latencies[-1], 2) if latencies else None,
+        }
+
+
+def _duration(seconds: float) -> str:
+    if seconds == float("inf"):
+        return "?"
+    hours, rest = divmod(int(seconds), 3600)
+    return f"{hours}h{rest // 60:02d}m" if hours else f"{rest // 60}m{rest % 60:02d}s"
+
+
+def _write_finished(items: list, futures: list, on_result: Callable):
+    """中斷後依順序寫入沒有被取消的題目 (等正在問的題目完成)，到第一個被取消的為止；再按一次 Ctrl-C 放棄等待。"""
+    running = sum(not future.done() for future in futures if not future.cancelled())
+    print(f"[eval] interrupted, waiting for {running} questions in flight (Ctrl-C again to abandon them)",
+          file=sys.stderr, flush=True)
+    try:
+        for item, future in zip(items, futures):
+            if future.cancelled():
+                break
+            on_result(item, *future.result())
+    except KeyboardInterrupt:
+        pass
+
+
+def run_ordered(
+    items: Iterable,
+    func: Callable,
+    on_result: Callable,
+    workers: int = EVAL_WORKERS,
+) -> dict:
+    """
+    以 workers 個執行緒對每個 item 呼叫 func(item)，依 items 的順序呼叫 on_result(item, result, latency, error)
+    (先完成的結果會等前面的題目寫完)；func 丟出例外時 result 為 None、error 為例外。回傳進度摘要。
+    Ctrl-C 時取消還沒開始的題目，已完成與正在問的題目仍依順序交給 on_result 後才把 KeyboardInterrupt 往外丟。
+    """
+    items = list(items)
+    progress = Progress(len(items))
+
+    def timed(item):
+        start = time.perf_counter()
+        try:
+            result, error = func(item), None
+        except Exception as e:
+            result, error = None, e
+        latency = time.perf_counter() - start
+        progress.add(latency, failed=error is not None)
+        return result, latency, error
+
+    pool = ThreadPoolExecutor(max_workers=max(1, workers))
+    futures = [pool.submit(timed, item) for item in items]
+    written = 0
+    try:
+        for item, future in zip(items, futures):
+            on_result(item, *future.result())
+            written += 1
+    except KeyboardInterrupt:
+        # 不再開始新的題目；已經在問的題目執行緒停不下來 (結束時也會等它們)，等完一併寫入，不浪費已花的時間
+        pool.shutdown(wait=False, cancel_futures=True)
+        _write_finished(items[written:], futures[written:], on_result)
+        raise
+    except BaseException:
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+    summary = progress.summary()
+    print(f"[eval] done: {summary}", file=sys.stderr, flush=True)
+    return summary
@@ -0,0 +1,157 @@
+"""
+一次新增多部法規 (例如檢索時記下的 web_crawl/no_law_name_filter.txt)
+
+add_single_law 每次只處理一個名稱、每個行程重新載入模型，逐部查詢、下載、編碼。這裡改成：
+1. 以本機法規目錄查出所有名稱的網址 (不連網)，已在資料庫中的法規略過
+2. 以 async_fetch 並行下載、解析，存成 CSV / Parquet 並記入 crawl_manifest
+3. 所有法規一起切塊，模型只載入一次、只呼叫一次 encode，同一個交易寫入 (create_vector.process_dfs)
+4. 重新整理檢索用的 law_search 與其索引一次，印出每部法規的結果
+
+從 src/ 執行：
+    python -m laws_database.add_laws                       # 預設讀 web_crawl/no_law_name_filter.txt
+    python -m laws_database.add_laws 勞動基準法 職業安全衛生法
+    python -m laws_database.add_laws --file names.txt --prune --output add_laws.json
+"""
+import argparse
+import json
+import os
+import time
+
+from psycopg2 import sql
+
+from ..web_crawl.async_fetch import CRAWL_CONCURRENCY, CRAWL_RATE_PER_HOST, fetch_all, run_sync
+from ..web_crawl.crawl_manifest import CrawlManifest
+from ..web_crawl.crawler import save_law_csv
+from ..web_crawl.generate_law import find_law_by_name
+from ..web_crawl.law_parser import parse_law
+from . import create_vector
+from .vector_index import MAINTENANCE_WORK_MEM, MAINTENANCE_WORKERS, build_search_table
+
+NO_LAW_NAME_FILTER = os.path.join(os.path.dirname(__file__), "..", "web_crawl", "no_law_name_filter.txt")
+
+
+def read_law_names(path: str = NO_LAW_NAME_FILTER) -> list[str]:
+    """一行一個名稱，去除空行、"None" 與重複 (保留順序)。"""
+    with open(path, "r", encoding="utf-8") as f:
+        names = [line.strip() for line in f]
+    return list(dict.fromkeys(name for name in names if name and name != "None"))
+
+
+def prune_law_names(done: set[str], path: str = NO_LAW_NAME_FILTER):
+    """從清單移除已新增 (或已在資料庫中) 的名稱。"""
+    remaining = [name for name in read_law_names(path) if name not in done]
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(name + "\n" for name in remaining)
+
+
+def existing_laws(conn, table: str, names: list[str]) -> set[str]:
+    with conn.cursor() as cur:
+        cur.execute(
+            sql.SQL("SELECT DISTINCT law_name FROM {} WHERE law_name = ANY(%s)").format(sql.Identifier(table)),
+            (names,),
+        )
+        return {row[0] for row in cur.fetchall()}
+
+
+def add_laws(
+    names: list[str],
+    concurrency: int = CRAWL_CONCURRENCY,
+    rate_per_host: float = CRAWL_RATE_PER_HOST,
+    refresh_search: bool = True,
+) -> list[dict]:
+    """
+    新增 names 中還不在資料庫的法規，回傳每個名稱的結果
+    {"name", "law_name", "url", "status": not_found / exists / fetch_failed / parse_failed / added, "rows", "error"}。
+    """
+    start = time.perf_counter()
+    conn, table = create_vector.ingest_target()
+
+    outcomes = []
+    for name in names:
+        found = find_law_by_name(name)
+        outcomes.append({
+            "name": name,
+            "law_name": found["name"] if found else None,
+            "url": found["url"] if found else None,
+            "status": "not_found" if found is None else None,
+            "rows": 0,
+            "error": None,
+        })
+    resolved = [o for o in outcomes if o["status"] is None]
+    present = existing_laws(conn, table, [o["law_name"] for o in resolved])
+    for outcome in resolved:
+        if outcome["law_name"] in present:
+            outcome["status"] = "exists"
+    todo = {}
+    for outcome in resolved:
+        if outcome["status"] is None:
+            todo.setdefault(outcome["url"], []).append(outcome)
+    print(f"[add_laws] {len(names)} names, {len(todo)} laws to crawl, {len(present)} already in {table}")
+
+    manifest = CrawlManifest()
+    manifest.add_urls(list(todo))
+    frames = []
+
+    def handle(response):
+        # 在 fetch_all 的執行緒中解析、存檔
+        if not response.ok:
+            manifest.record_failure(response.url, response.error or f"HTTP {response.status}")
+            return "fetch_failed", response.error or f"HTTP {response.status}"
+        try:
+            page = parse_law(response.text)
+            df = page.to_frame()
+            csv_path = save_law_csv(response.url, page.title, df, manifest, queue_ingest=False)
+        except Exception as e:
+            manifest.record_failure(response.url, f"{type(e).__name__}: {e}")
+            return "parse_failed", f"{type(e).__name__}: {e}"
+        frames.append((response.url, df, os.path.basename(csv_path)))
+        return None, None
+
+    try:
+        results, _ = run_sync(fetch_all(list(todo), handler=handle, concurrency=concurrency, rate_per_host=rate_per_host))
+    finally:
+        manifest.save()
+        manifest.close()
+    for url, (status, error) in zip(todo, results):
+        for outcome in todo[url]:
+            outcome["status"], outcome["error"] = status, error
+
+    if frames:
+        # 檢查點以 CSV 檔名為 source，與 create_vector.py 相同
+        inserted = create_vector.process_dfs([(df, source) for _, df, source in frames])
+        for url, _, source in frames:
+            for outcome in todo[url]:
+                outcome["status"], outcome["rows"] = "added", inserted.get(source, 0)
+        if refresh_search:
+            # 新的資料列要進 law_search 才查得到
+            with create_vector._metrics.stage("index"):
+                build_search_table(conn, table, MAINTENANCE_WORKERS, MAINTENANCE_WORK_MEM)
+    print(f"[add_laws] done in {time.perf_counter() - start:.1f}s")
+    return outcomes
+
+
+def print_outcomes(outcomes: list[dict]):
+    for outcome in outcomes:
+        detail = outcome["error"] or (f"{outcome['rows']} rows" if outcome["status"] == "added" else "")
+        print(f"{outcome['status']:<13} {outcome['name']} -> {outcome['law_name'] or '-'}  {detail}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resolve, crawl and embed many missing laws in one batch")
+    parser.add_argument("names", nargs="*", help="law names (default: read --file)")
+    parser.add_argument("--file", default=NO_LAW_NAME_FILTER, help="one law name per line")
+    parser.add_argument("--concurrency", type=int, default=CRAWL_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=CRAWL_RATE_PER_HOST, help="requests per second per host (0 = unlimited)")
+    parser.add_argument("--no-refresh", dest="refresh", action="store_false", help="do not refresh the law_search view afterwards")
+    parser.add_argument("--prune", action="store_true", help="remove added and already present names from --file")
+    parser.add_argument("--output", default=None, help="write the per-law outcome as JSON")
+    args = parser.parse_args()
+
+    names = args.names or read_law_names(args.file)
+    outcomes = add_laws(names, args.concurrency, args.rate, args.refresh)
+    print_outcomes(outcomes)
+    if args.prune and not args.names:
+        prune_law_names({o["name"] for o in outcomes if o["status"] in ("added", "exists")}, args.file)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(outcomes, f, ensure_ascii=False, indent=2)
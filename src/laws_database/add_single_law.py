@@ -1,6 +1,9 @@
-from ..web_crawl.generate_law import append_and_sort_file, search_law_by_name
-from ..web_crawl.crawler import process_url as crawl_url
+from ..web_crawl.generate_law import add_link, find_law_by_name
+from ..web_crawl.crawl_manifest import CrawlManifest
+from ..web_crawl.crawler import law_csv_path, process_url as crawl_url, save_law_csv
+from . import create_vector
 from .create_vector import process_df as vector_process_df
+from .vector_index import refresh_search_table
 import os
 
 def add_single_law(lawname: str, save_link: bool = True, save_csv: bool = True):
@@ -8,23 +11,34 @@ def add_single_law(lawname: str, save_link: bool = True, save_csv: bool = True):
     Adds a single URL to extract law data and insert it into the database.
     """
     try:
-        law_link_result = search_law_by_name(lawname)
+        law_link_result = find_law_by_name(lawname)
         if law_link_result is None:
             print(f"Law '{lawname}' not found.")
             return
         law_url = law_link_result['url']
         law_title = law_link_result['name']
         if save_link:
-            append_and_sort_file(law_url)
+            # 加入 crawl_manifest.db，之後的 crawler.py 會定期重新爬取
+            add_link(law_url)
             print(f"Saved link for law '{law_title}': {law_url}")
 
         df, filename = crawl_url(law_url)
+        csv_path = law_csv_path(filename, law_url)
         if save_csv:
-            df.to_csv(os.path.join(os.path.dirname(__file__), "..", "web_crawl", "laws", "{}_{}.csv".format(filename, law_url.replace(":", "_").replace("/", "_").replace("?", "_"))),index=False)
-            print(f"Saved CSV for law '{law_title}': {filename}_{law_url.replace(':', '_').replace('/', '_').replace('?', '_')}.csv")
-        vector_process_df(df, filename)
+            # 記入 crawl_manifest (修正日期)，下面直接匯入，不加入待匯入清單
+            manifest = CrawlManifest()
+            csv_path = save_law_csv(law_url, filename, df, manifest, queue_ingest=False)
+            manifest.save()
+            manifest.close()
+            print(f"Saved CSV for law '{law_title}': {os.path.basename(csv_path)}")
+        # 檢查點以 CSV 檔名為 source，與 create_vector.py、add_laws.py 相同 (delete_laws / --changed 才清得掉)
+        vector_process_df(df, filename, source=os.path.basename(csv_path))
+        # 檢索讀取 law_search_active：把法規加入 laws 並更新目前資料表的 law_search，新的法規才查得到
+        # (CONCURRENTLY，不移除 HNSW 索引，同時進行的檢索不受影響)
+        conn, table = create_vector.ingest_target()
+        refresh_search_table(conn, table, df["actname"].dropna().unique().tolist())
     except Exception as e:
-        print(f"Error adding law '{law_title}': {e}")
+        print(f"Error adding law '{lawname}': {e}")
         return
 if __name__ == "__main__":
     import sys
@@ -0,0 +1,209 @@
+"""
+只測檢索 (不經過 LLM) 的離線評估：recall@k、MRR 與查詢延遲
+
+每次改切塊方式、索引參數或檢索方法，都要跑完整個 agent 評估 (evaluation/main.py) 需要好幾個小時。
+這裡只跑 SimilaritySearch：所有問題一次批次編碼，再逐題查詢 (與 agent 相同的 SQL 或快照索引)，
+與標註的法規 / 條號比對，幾分鐘就能看出檢索有沒有退步。
+
+標註檔為 JSONL，每行 {"question": ..., "law_name": ..., "article_no": ...}，與 compare_splitters.py 相同；
+article_no 為 null 時只比對法規名稱。可由考古題題庫產生 (labels 子命令)：題目中提到語料內的法規名稱
+(取最長的名稱，提到兩部以上不同法規的題目略過)，並寫出「第N條」時 (國字數字轉成阿拉伯數字) 一併標註條號。
+
+- 命中：回傳的 chunk 法規名稱相同，且 (有條號時) 條號相同；同一段文字的多個出現位置算同一個名次
+- recall@k：前 k 名內有命中的題目比例；MRR：第一個命中名次的倒數平均 (max k 名內沒有命中為 0)
+- 延遲：批次編碼的總時間 (平均每題) 與每題查詢的 p50 / p95 / p99
+
+檢索設定與 agent 相同 (LAW_SNAPSHOT、EMBEDDING_MODEL 環境變數)。從 src/ 執行：
+    python -m laws_database.bench_retrieval labels --limit 300 --output laws_database/retrieval_labels.jsonl
+    python -m laws_database.bench_retrieval run --labels laws_database/retrieval_labels.jsonl --k 1 3 5 10 --output retrieval_report.json
+"""
+import argparse
+import json
+import os
+import random
+import re
+import time
+
+import numpy as np
+
+from ..question_crawl.question_bank import load_question_bank
+from .create_vector import read_law_file
+
+LAWS_DIR = os.path.join(os.path.dirname(__file__), "..", "web_crawl", "laws")
+RETRIEVAL_LABELS = os.path.join(os.path.dirname(__file__), "retrieval_labels.jsonl")
+
+_ARTICLE = re.compile(r"第\s*([0-9０-９零〇一二兩三四五六七八九十百千]+)\s*條(?:\s*之\s*([0-9０-９一二三四五六七八九十]+))?")
+_CN_DIGITS = {"零": 0, "〇": 0, "一": 1, "二": 2, "兩": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_CN_UNITS = {"十": 10, "百": 100, "千": 1000}
+
+
+def _to_int(text: str) -> int:
+    """阿拉伯數字 (含全形) 或國字數字 (例如 十二、一百零五) 轉成整數。"""
+    text = text.translate(str.maketrans("０１２３４５６７８９", "0123456789"))
+    if text.isdigit():
+        return int(text)
+    total, digit = 0, 0
+    for char in text:
+        if char in _CN_DIGITS:
+            digit = _CN_DIGITS[char]
+        else:
+            total += (digit or 1) * _CN_UNITS[char]
+            digit = 0
+    return total + digit
+
+
+def normalize_article(article_no: str | None) -> str:
+    """條號統一成「第N條」/「第N-M條」(去除空白、國字轉數字)；沒有條號時為空字串。"""
+    if not article_no:
+        return ""
+    article_no = "".join(str(article_no).split())
+    match = _ARTICLE.fullmatch(article_no)
+    if match is None:
+        # 法規頁面的條號寫成「第 6-1 條」
+        return article_no
+    number = _to_int(match.group(1))
+    return f"第{number}-{_to_int(match.group(2))}條" if match.group(2) else f"第{number}條"
+
+
+def corpus_articles(laws_dir: str = LAWS_DIR) -> dict[str, set[str]]:
+    """語料中每部法規的名稱與條號 (由爬下來的 CSV / Parquet 讀取)。"""
+    laws = {}
+    for item in sorted(f for f in os.listdir(laws_dir) if f.endswith(".csv")):
+        df = read_law_file(os.path.join(laws_dir, item))
+        if df.empty:
+            continue
+        for name, titles in df.groupby("actname")["title"]:
+            laws.setdefault(str(name), set()).update(normalize_article(t) for t in titles.dropna())
+    return laws
+
+
+def label_question(question: str, laws: dict[str, set[str]], names: list[str]) -> dict | None:
+    """題目提到的法規 (與條號)；沒有提到或提到兩部以上不同法規時為 None。names 依長度遞減排序。"""
+    found = []
+    for name in names:
+        # 較短的名稱只是已找到名稱的一部分時略過 (例如「職業安全衛生法施行細則」中的「職業安全衛生法」)
+        if name in question and not any(name in longer for longer in found):
+            found.append(name)
+    if len(found) != 1:
+        return None
+    law_name = found[0]
+    article_no = None
+    # 只看法規名稱後面的條號
+    match = _ARTICLE.search(question, question.index(law_name) + len(law_name))
+    if match is not None and normalize_article(match.group(0)) in laws[law_name]:
+        article_no = normalize_article(match.group(0))
+    return {"question": question, "law_name": law_name, "article_no": article_no}
+
+
+def build_labels(laws_dir: str = LAWS_DIR, limit: int | None = 300, seed: int = 0) -> list[dict]:
+    """由題庫產生標註，limit 筆時以固定的 seed 抽樣 (每次產生相同的集合)。"""
+    laws = corpus_articles(laws_dir)
+    names = sorted(laws, key=len, reverse=True)
+    bank = load_question_bank()
+    labels = []
+    for f, number, question in bank[["file", "number", "question"]].itertuples(index=False, name=None):
+        label = label_question(str(question), laws, names)
+        if label is not None:
+            labels.append({**label, "file": f, "number": int(number)})
+    print(f"{len(labels)} of {len(bank)} questions mention exactly one law of the corpus "
+          f"({sum(label['article_no'] is not None for label in labels)} with an article)")
+    if limit and len(labels) > limit:
+        labels = random.Random(seed).sample(labels, limit)
+        labels.sort(key=lambda label: (label["file"], label["number"]))
+    return labels
+
+
+def load_labels(path: str = RETRIEVAL_LABELS) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def first_hit(results: list[tuple], label: dict) -> int | None:
+    """第一個命中的名次 (從 1 開始，同一段文字的出現位置算同一名)，沒有命中時為 None。"""
+    gold_article = normalize_article(label.get("article_no"))
+    rank = 0
+    last_content = None
+    for row in results:
+        law_name, article_no, content = row[1], row[3], row[6]
+        if content != last_content:
+            rank += 1
+            last_content = content
+        if law_name == label["law_name"] and (not gold_article or normalize_article(article_no) == gold_article):
+            return rank
+    return None
+
+
+def run_benchmark(labels: list[dict], ks: list[int], batch_size: int = 32, law_filter: bool = False) -> tuple[dict, list[dict]]:
+    """回傳 (報告, 每題的結果)。"""
+    # 載入模型並連線 (或載入快照)，與 agent 使用同一個實例
+    from .similarity_search import similarity_search
+
+    max_k = max(ks)
+    start = time.perf_counter()
+    embeddings = similarity_search.encode_queries([label["question"] for label in labels], batch_size=batch_size)
+    encode_seconds = time.perf_counter() - start
+
+    latencies = []
+    ranks = []
+    details = []
+    for label, embedding in zip(labels, embeddings):
+        start = time.perf_counter()
+        results = similarity_search.query_by_embedding(embedding, max_k, label["law_name"] if law_filter else None)
+        latencies.append((time.perf_counter() - start) * 1000)
+        rank = first_hit(results, label)
+        ranks.append(rank)
+        details.append({**label, "rank": rank, "retrieved": [(row[1], row[3]) for row in results]})
+
+    n = len(labels)
+    latencies = np.array(latencies)
+    report = {
+        "labels": n,
+        "with_article": sum(bool(label.get("article_no")) for label in labels),
+        "model": similarity_search.model_name,
+        "snapshot": similarity_search.memory_index is not None,
+        "law_filter": law_filter,
+        **{f"recall@{k}": round(sum(r is not None and r <= k for r in ranks) / n, 4) for k in ks},
+        f"mrr@{max_k}": round(sum(1 / r for r in ranks if r is not None) / n, 4),
+        "encode_seconds": round(encode_seconds, 2),
+        "encode_ms_per_query": round(encode_seconds * 1000 / n, 2),
+        "search_ms_p50": round(float(np.percentile(latencies, 50)), 2),
+        "search_ms_p95": round(float(np.percentile(latencies, 95)), 2),
+        "search_ms_p99": round(float(np.percentile(latencies, 99)), 2),
+        "search_ms_mean": round(float(latencies.mean()), 2),
+    }
+    return report, details
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrieval-only benchmark (recall@k, MRR, latency) without the LLM")
+    sub = parser.add_subparsers(dest="command", required=True)
+    labels_parser = sub.add_parser("labels", help="derive a labeled set from the question bank")
+    labels_parser.add_argument("--laws-dir", default=LAWS_DIR)
+    labels_parser.add_argument("--limit", type=int, default=300, help="sample this many questions (0 = all)")
+    labels_parser.add_argument("--seed", type=int, default=0)
+    labels_parser.add_argument("--output", default=RETRIEVAL_LABELS)
+    run_parser = sub.add_parser("run", help="run SimilaritySearch on a labeled set")
+    run_parser.add_argument("--labels", default=RETRIEVAL_LABELS, help="JSONL with question / law_name / article_no")
+    run_parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10])
+    run_parser.add_argument("--batch-size", type=int, default=32)
+    run_parser.add_argument("--law-filter", action="store_true", help="filter by the gold law name (the agent's second step)")
+    run_parser.add_argument("--output", default=None, help="write the report as JSON")
+    run_parser.add_argument("--details", default=None, help="write the rank and retrieved articles of every question as JSONL")
+    args = parser.parse_args()
+
+    if args.command == "labels":
+        labels = build_labels(args.laws_dir, args.limit or None, args.seed)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(label, ensure_ascii=False) + "\n" for label in labels)
+        print(f"Saved {len(labels)} labels to {args.output}")
+    else:
+        report, details = run_benchmark(load_labels(args.labels), args.k, args.batch_size, args.law_filter)
+        for metric, value in report.items():
+            print(f"{metric:<22}{value!s:>14}")
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"Saved report to {args.output}")
+        if args.details:
+            with open(args.details, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(detail, ensure_ascii=False) + "\n" for detail in details)
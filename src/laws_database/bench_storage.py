@@ -0,0 +1,170 @@
+"""
+比較寬 / 窄兩種檢索資料表的 buffer 使用量與查詢延遲
+
+- narrow：目前的 law_search_active (content_hash + embedding + law_ids)，
+          HNSW 找到 top-k 後才到 law_chunks_active 取回條文內容 (與 SimilaritySearch 相同的查詢)
+- wide：  舊的做法，每個出現位置一列、條文內容與元數據和向量放在同一列
+          (建立 law_search_wide 與其 HNSW 索引，結束後刪除，除非 --keep-wide)
+
+查詢向量取自 chunk_texts 中隨機的向量，不需要載入模型。每個查詢先暖機一次，
+再以 EXPLAIN (ANALYZE, BUFFERS) 記錄 shared hit / read 的區塊數，並另外量測實際執行的延遲。
+
+    python bench_storage.py --queries 100 --top-k 5 --output storage_bench.json
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import psycopg2
+from psycopg2 import sql
+
+try:
+    from .corpus_versions import active_table
+    from .vector_index import PG_CONN_STRING, build_vector_index, search_table
+except ImportError:
+    from corpus_versions import active_table
+    from vector_index import PG_CONN_STRING, build_vector_index, search_table
+
+WIDE_TABLE = "law_search_wide"
+
+NARROW_QUERY = """
+WITH hits AS (
+    SELECT content_hash, embedding, embedding <-> %(q)s::vector AS distance
+    FROM law_search_active
+    ORDER BY embedding <-> %(q)s::vector
+    LIMIT %(k)s
+)
+SELECT c.id, c.law_name, c.chapter, c.article_no, c.subsection_no, c.chunk_index, c.content, h.embedding
+FROM hits h
+JOIN law_chunks_active c ON c.content_hash = h.content_hash
+WHERE c.chunk_index IS NOT NULL AND c.content <> '（刪除）'
+ORDER BY h.distance
+"""
+
+WIDE_QUERY = f"""
+SELECT id, law_name, chapter, article_no, subsection_no, chunk_index, content, embedding
+FROM {WIDE_TABLE}
+ORDER BY embedding <-> %(q)s::vector
+LIMIT %(k)s
+"""
+
+
+def build_wide_table(conn):
+    """以 law_chunks_active 建立舊格式 (每個出現位置一列、含條文內容) 的檢索表與其 HNSW 索引。"""
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("DROP MATERIALIZED VIEW IF EXISTS {}").format(sql.Identifier(WIDE_TABLE)))
+        cur.execute(
+            sql.SQL(
+                "CREATE MATERIALIZED VIEW {} AS "
+                "SELECT c.id, c.law_name, c.chapter, c.article_no, c.subsection_no, c.chunk_index, c.page_no, "
+                "c.content, t.embedding "
+                "FROM law_chunks_active c JOIN chunk_texts t ON t.content_hash = c.content_hash "
+                "WHERE c.chunk_index IS NOT NULL AND c.content <> '（刪除）'"
+            ).format(sql.Identifier(WIDE_TABLE))
+        )
+    conn.commit()
+    build_vector_index(conn, WIDE_TABLE)
+
+
+def relation_stats(conn, relation: str) -> dict:
+    with conn.cursor() as cur:
+        cur.execute(
+            sql.SQL(
+                "SELECT count(*), pg_relation_size(%s::regclass), pg_total_relation_size(%s::regclass) FROM {}"
+            ).format(sql.Identifier(relation)),
+            (relation, relation),
+        )
+        rows, heap_bytes, total_bytes = cur.fetchone()
+    conn.commit()
+    return {
+        "rows": rows,
+        "heap_mb": round(heap_bytes / 2**20, 2),
+        "total_mb": round(total_bytes / 2**20, 2),
+        "heap_bytes_per_row": round(heap_bytes / rows, 1) if rows else None,
+    }
+
+
+def sample_queries(conn, n: int) -> list[str]:
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT embedding::text FROM chunk_texts WHERE content_hash IN (SELECT content_hash FROM law_search_active) "
+            "ORDER BY random() LIMIT %s",
+            (n,),
+        )
+        queries = [row[0] for row in cur.fetchall()]
+    conn.commit()
+    return queries
+
+
+def _buffers(plan: dict) -> tuple[int, int]:
+    return plan.get("Shared Hit Blocks", 0), plan.get("Shared Read Blocks", 0)
+
+
+def run_layout(conn, query: str, queries: list[str], top_k: int) -> dict:
+    latencies = []
+    hits = []
+    reads = []
+    with conn.cursor() as cur:
+        for q in queries:
+            params = {"q": q, "k": top_k}
+            cur.execute(query, params)  # 暖機
+            cur.fetchall()
+            start = time.perf_counter()
+            cur.execute(query, params)
+            cur.fetchall()
+            latencies.append((time.perf_counter() - start) * 1000)
+            cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, params)
+            plan = cur.fetchone()[0][0]["Plan"]
+            hit, read = _buffers(plan)
+            hits.append(hit)
+            reads.append(read)
+    conn.commit()
+    latencies = np.array(latencies)
+    return {
+        "latency_ms_p50": round(float(np.percentile(latencies, 50)), 2),
+        "latency_ms_p95": round(float(np.percentile(latencies, 95)), 2),
+        "latency_ms_mean": round(float(latencies.mean()), 2),
+        "shared_hit_blocks_mean": round(float(np.mean(hits)), 1),
+        "shared_read_blocks_mean": round(float(np.mean(reads)), 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the narrow search view against the wide row layout")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--keep-wide", action="store_true", help=f"keep {WIDE_TABLE} for later runs")
+    parser.add_argument("--output", default=None, help="write the report as JSON")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(PG_CONN_STRING)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass(%s) IS NOT NULL", (WIDE_TABLE,))
+            wide_exists = cur.fetchone()[0]
+        conn.commit()
+        if not wide_exists:
+            build_wide_table(conn)
+        queries = sample_queries(conn, args.queries)
+        report = {
+            "queries": len(queries),
+            "top_k": args.top_k,
+            # law_search_active 是視圖，大小以它指向的 materialized view 計算
+            "narrow": {**relation_stats(conn, search_table(active_table(conn))), **run_layout(conn, NARROW_QUERY, queries, args.top_k)},
+            "wide": {**relation_stats(conn, WIDE_TABLE), **run_layout(conn, WIDE_QUERY, queries, args.top_k)},
+        }
+        if not args.keep_wide:
+            with conn.cursor() as cur:
+                cur.execute(sql.SQL("DROP MATERIALIZED VIEW IF EXISTS {}").format(sql.Identifier(WIDE_TABLE)))
+            conn.commit()
+    finally:
+        conn.close()
+
+    print(f"{'metric':<26}{'narrow':>14}{'wide':>14}")
+    for metric in report["narrow"]:
+        print(f"{metric:<26}{report['narrow'][metric]!s:>14}{report['wide'][metric]!s:>14}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Saved report to {args.output}")
@@ -0,0 +1,135 @@
+"""
+比較原本的字元切塊器與法條切塊器 (legal_splitter.py)
+
+報告內容：
+- chunk 數量、平均 token 數、超過 e5 512 token 上限而會被截斷的 chunk 數
+- 重疊造成的膨脹倍率 (所有 chunk 的 token 總數 / 原文 token 總數)
+- 估計的向量資料與 HNSW 索引大小
+- 若提供 --labels，於記憶體中計算 recall@k (命中同一法規、同一條即算命中)
+
+labels 為 JSONL，每行 {"question": ..., "law_name": ..., "article_no": ...}，
+article_no 可為 null (只比對法規名稱)。
+
+    python compare_splitters.py --labels retrieval_labels.jsonl --top-k 5 --output splitter_report.json
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from sentence_transformers import SentenceTransformer
+
+try:
+    from .create_vector import MODEL_NAME, clean_value
+    from .legal_splitter import build_char_splitter, build_legal_splitter
+    from .vector_index import HNSW_M
+except ImportError:
+    from create_vector import MODEL_NAME, clean_value
+    from legal_splitter import build_char_splitter, build_legal_splitter
+    from vector_index import HNSW_M
+
+LAWS_DIR = os.path.join(os.path.dirname(__file__), "..", "web_crawl", "laws")
+E5_MAX_TOKENS = 512
+EMBEDDING_DIM = 1024
+
+
+def load_articles(laws_dir: str = LAWS_DIR, limit_laws: int | None = None) -> list[tuple[str, str | None, str]]:
+    """讀取爬下來的 CSV，回傳 (法規名稱, 條號, 內容)。"""
+    articles = []
+    files = sorted(f for f in os.listdir(laws_dir) if f.endswith(".csv"))
+    if limit_laws:
+        files = files[:limit_laws]
+    for item in files:
+        df = pd.read_csv(os.path.join(laws_dir, item))
+        for rows in df.itertuples():
+            article = clean_value(rows.article)
+            if article is None:
+                continue
+            articles.append((clean_value(rows.actname), clean_value(rows.title), article))
+    return articles
+
+
+def split_articles(splitter, articles) -> list[tuple[str, str | None, str]]:
+    chunks = []
+    for law_name, article_no, article in articles:
+        for chunk in splitter.split_text(article):
+            chunks.append((law_name, article_no, chunk))
+    return chunks
+
+
+def chunk_stats(tokenizer, articles, chunks) -> dict:
+    article_tokens = sum(len(tokenizer.tokenize(a[2])) for a in articles)
+    chunk_tokens = [len(tokenizer.tokenize("passage: " + c[2])) + 2 for c in chunks]  # +2: <s> </s>
+    n = len(chunks)
+    return {
+        "chunks": n,
+        "unique_chunks": len({c[2] for c in chunks}),
+        "mean_tokens": float(np.mean(chunk_tokens)) if chunk_tokens else 0.0,
+        "max_tokens": int(max(chunk_tokens, default=0)),
+        "truncated_chunks": sum(t > E5_MAX_TOKENS for t in chunk_tokens),
+        "overlap_inflation": (sum(chunk_tokens) / article_tokens) if article_tokens else 0.0,
+        # vector(1024) 為 4 bytes * dim + 8 bytes 標頭；HNSW 第 0 層約 2*m 個鄰居、每個 6 bytes
+        "est_vector_mb": n * (4 * EMBEDDING_DIM + 8) / 2**20,
+        "est_hnsw_index_mb": n * (4 * EMBEDDING_DIM + 8 + 2 * HNSW_M * 6) / 2**20,
+    }
+
+
+def _normalize_article(article_no: str | None) -> str:
+    return "".join(str(article_no).split()) if article_no else ""
+
+
+def recall_at_k(model, chunks, labels, top_k: int) -> float:
+    """以 L2 距離 (與 pgvector 的 <-> 相同) 在記憶體中檢索，計算 recall@k。"""
+    if not labels or not chunks:
+        return 0.0
+    chunk_embeddings = model.encode(["passage: " + c[2] for c in chunks], batch_size=64, show_progress_bar=True)
+    query_embeddings = model.encode(["query: " + label["question"] for label in labels], batch_size=64)
+    chunk_sq = (chunk_embeddings ** 2).sum(axis=1)
+    hits = 0
+    for label, query in zip(labels, query_embeddings):
+        distances = chunk_sq - 2 * chunk_embeddings @ query
+        top = np.argpartition(distances, min(top_k, len(chunks) - 1))[:top_k]
+        gold_article = _normalize_article(label.get("article_no"))
+        for i in top:
+            law_name, article_no, _ = chunks[i]
+            if law_name == label["law_name"] and (not gold_article or _normalize_article(article_no) == gold_article):
+                hits += 1
+                break
+    return hits / len(labels)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the character splitter with the legal-structure splitter")
+    parser.add_argument("--laws-dir", default=LAWS_DIR)
+    parser.add_argument("--limit-laws", type=int, default=None)
+    parser.add_argument("--labels", default=None, help="JSONL with question / law_name / article_no")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--output", default=None, help="write the report as JSON")
+    args = parser.parse_args()
+
+    model = SentenceTransformer(MODEL_NAME, tokenizer_kwargs={"padding_side": "left"})
+    tokenizer = model.tokenizer
+    articles = load_articles(args.laws_dir, args.limit_laws)
+    labels = []
+    if args.labels:
+        with open(args.labels, "r", encoding="utf-8") as f:
+            labels = [json.loads(line) for line in f if line.strip()]
+
+    report = {}
+    for name, splitter in [("char", build_char_splitter()), ("legal", build_legal_splitter(tokenizer))]:
+        chunks = split_articles(splitter, articles)
+        report[name] = chunk_stats(tokenizer, articles, chunks)
+        if labels:
+            report[name][f"recall@{args.top_k}"] = recall_at_k(model, chunks, labels, args.top_k)
+
+    print(f"{'metric':<22}{'char':>14}{'legal':>14}")
+    for metric in report["char"]:
+        char_value, legal_value = report["char"][metric], report["legal"][metric]
+        fmt = "{:>14.3f}" if isinstance(char_value, float) else "{:>14}"
+        print(f"{metric:<22}" + fmt.format(char_value) + fmt.format(legal_value))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Saved report to {args.output}")
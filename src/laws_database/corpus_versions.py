@@ -0,0 +1,250 @@
+"""
+語料版本管理 (blue/green)
+
+create_vector 重建時寫入新的 law_chunks_v<N>，服務中的 SimilaritySearch 仍讀取
+law_chunks_active 視圖所指向的舊版本；新版本建好檢索用的 law_search_v<N> 與其索引、
+筆數檢查通過後，在同一個交易中把 law_chunks_active / law_search_active 兩個視圖切換過去，
+舊版本保留以便立即 rollback。
+
+    python corpus_versions.py status
+    python corpus_versions.py activate 3
+    python corpus_versions.py rollback
+    python corpus_versions.py prune --keep 2
+"""
+import argparse
+import os
+
+import psycopg2
+from psycopg2 import sql
+
+try:
+    from .vector_index import build_search_table, has_search_table, search_table
+except ImportError:
+    from vector_index import build_search_table, has_search_table, search_table
+
+PG_HOST = os.environ.get("PG_HOST", "localhost")
+PG_PORT = os.environ.get("PG_PORT", "5432")
+PG_DATABASE = os.environ.get("PG_DATABASE", "lawdb")
+PG_USER = os.environ.get("PG_USER", "postgres")
+PG_PASSWORD = os.environ.get("PG_PASSWORD", "postgres")
+
+PG_CONN_STRING = (
+    f"dbname={PG_DATABASE} user={PG_USER} password={PG_PASSWORD} "
+    f"host={PG_HOST} port={PG_PORT}"
+)
+
+ACTIVE_VIEW = "law_chunks_active"
+SEARCH_VIEW = "law_search_active"
+LEGACY_TABLE = "law_chunks"
+# 保留幾個已建好的版本 (含 active)，其餘由 prune 刪除
+KEEP_VERSIONS = int(os.environ.get("CORPUS_KEEP_VERSIONS", "2"))
+# 新版本筆數至少要是目前 active 版本的這個比例，避免半途而廢的版本被切換上線
+MIN_ROW_RATIO = float(os.environ.get("CORPUS_MIN_ROW_RATIO", "0.9"))
+
+
+def active_version(conn) -> tuple[int, str] | None:
+    """回傳 (version, table_name)；尚未建立任何版本時回傳 None。"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT version, table_name FROM corpus_versions WHERE status = 'active'")
+        row = cur.fetchone()
+    conn.commit()
+    return row
+
+
+def active_table(conn) -> str:
+    """目前服務中的實體資料表名稱。"""
+    row = active_version(conn)
+    return row[1] if row else LEGACY_TABLE
+
+
+def building_version(conn) -> tuple[int, str] | None:
+    """最近一個尚未完成 (status = 'building') 的版本，供 create_vector 依檢查點接續匯入。"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT version, table_name FROM corpus_versions WHERE status = 'building' ORDER BY version DESC LIMIT 1")
+        row = cur.fetchone()
+    conn.commit()
+    return row
+
+
+def _count_rows(cur, table: str) -> int:
+    cur.execute(sql.SQL("SELECT count(*) FROM {}").format(sql.Identifier(table)))
+    return cur.fetchone()[0]
+
+
+def create_version(conn, note: str | None = None) -> tuple[int, str]:
+    """建立新的版本資料表 (與 law_chunks 相同欄位、尚無向量索引)，回傳 (version, table_name)。"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT nextval(pg_get_serial_sequence('corpus_versions', 'version'))")
+        version = cur.fetchone()[0]
+        table = f"{LEGACY_TABLE}_v{version}"
+        cur.execute(
+            sql.SQL("CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS, PRIMARY KEY (id))").format(
+                sql.Identifier(table), sql.Identifier(LEGACY_TABLE)
+            )
+        )
+        cur.execute(
+            "INSERT INTO corpus_versions (version, table_name, note) VALUES (%s, %s, %s)",
+            (version, table, note),
+        )
+    conn.commit()
+    print(f"[corpus_versions] Building version {version} in {table}")
+    return version, table
+
+
+def mark_failed(conn, version: int, note: str):
+    conn.rollback()
+    with conn.cursor() as cur:
+        cur.execute("UPDATE corpus_versions SET status = 'failed', note = %s WHERE version = %s", (note, version))
+    conn.commit()
+
+
+def validate_version(conn, version: int, expected_rows: int, min_ratio: float = MIN_ROW_RATIO) -> int:
+    """
+    檢查版本資料表的筆數：必須等於實際寫入的筆數，且不少於 active 版本的 min_ratio 倍。
+    通過後標記為 ready 並回傳筆數，否則拋出 ValueError。
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT table_name FROM corpus_versions WHERE version = %s", (version,))
+        table = cur.fetchone()[0]
+        row_count = _count_rows(cur, table)
+        if row_count != expected_rows:
+            raise ValueError(f"{table} has {row_count} rows, expected {expected_rows}")
+        current = active_table(conn)
+        current_count = _count_rows(cur, current)
+        if row_count < current_count * min_ratio:
+            raise ValueError(
+                f"{table} has {row_count} rows, less than {min_ratio:.0%} of {current} ({current_count} rows)"
+            )
+        cur.execute(
+            "UPDATE corpus_versions SET status = 'ready', row_count = %s WHERE version = %s",
+            (row_count, version),
+        )
+    conn.commit()
+    print(f"[corpus_versions] Version {version} validated: {row_count} rows")
+    return row_count
+
+
+def activate_version(conn, version: int):
+    """
+    在單一交易內切換 active 版本與 law_chunks_active / law_search_active 視圖。
+    DROP VIEW 會等進行中的查詢結束，之後的查詢則直接看到新版本，不會讀到一半的資料。
+    較早建立、還沒有 (或只有舊格式的) 檢索用 materialized view 的版本會先補建。
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT table_name, status FROM corpus_versions WHERE version = %s", (version,))
+        row = cur.fetchone()
+        if row is None:
+            raise ValueError(f"Version {version} does not exist")
+        table, status = row
+        if status not in ("ready", "active"):
+            raise ValueError(f"Version {version} is {status}, only ready versions can be activated")
+    conn.commit()
+    if not has_search_table(conn, table):
+        build_search_table(conn, table)
+
+    with conn.cursor() as cur:
+        cur.execute("UPDATE corpus_versions SET status = 'ready' WHERE status = 'active'")
+        cur.execute(
+            "UPDATE corpus_versions SET status = 'active', activated_at = now() WHERE version = %s",
+            (version,),
+        )
+        cur.execute(sql.SQL("DROP VIEW IF EXISTS {}").format(sql.Identifier(ACTIVE_VIEW)))
+        cur.execute(
+            sql.SQL("CREATE VIEW {} AS SELECT * FROM {}").format(sql.Identifier(ACTIVE_VIEW), sql.Identifier(table))
+        )
+        cur.execute(sql.SQL("DROP VIEW IF EXISTS {}").format(sql.Identifier(SEARCH_VIEW)))
+        cur.execute(
+            sql.SQL("CREATE VIEW {} AS SELECT * FROM {}").format(
+                sql.Identifier(SEARCH_VIEW), sql.Identifier(search_table(table))
+            )
+        )
+    conn.commit()
+    print(f"[corpus_versions] Activated version {version} ({table})")
+
+
+def rollback(conn) -> int:
+    """切回 active 之前最近的一個 ready 版本。"""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT version FROM corpus_versions
+            WHERE status = 'ready'
+              AND version < COALESCE((SELECT version FROM corpus_versions WHERE status = 'active'), 2147483647)
+            ORDER BY version DESC LIMIT 1
+            """
+        )
+        row = cur.fetchone()
+    if row is None:
+        raise ValueError("No previous ready version to roll back to")
+    activate_version(conn, row[0])
+    return row[0]
+
+
+def prune_versions(conn, keep: int = KEEP_VERSIONS):
+    """刪除較舊的版本資料表，只保留 active 與最新的幾個 ready 版本；失敗的版本一併刪除。"""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT version, table_name, status FROM corpus_versions
+            WHERE status IN ('ready', 'active', 'failed')
+            ORDER BY (status = 'active') DESC, version DESC
+            """
+        )
+        rows = cur.fetchall()
+        kept = 0
+        for version, table, status in rows:
+            if status != "failed" and kept < keep:
+                kept += 1
+                continue
+            cur.execute(sql.SQL("DROP MATERIALIZED VIEW IF EXISTS {}").format(sql.Identifier(search_table(table))))
+            cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(table)))
+            cur.execute("DELETE FROM ingested_files WHERE target_table = %s", (table,))
+            cur.execute("DELETE FROM ingest_checkpoints WHERE target_table = %s", (table,))
+            cur.execute("UPDATE corpus_versions SET status = 'dropped' WHERE version = %s", (version,))
+            print(f"[corpus_versions] Dropped version {version} ({table})")
+    conn.commit()
+
+
+def print_status(conn):
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT version, table_name, status, row_count, created_at, activated_at, note "
+            "FROM corpus_versions ORDER BY version"
+        )
+        rows = cur.fetchall()
+    conn.commit()
+    if not rows:
+        print(f"No corpus versions yet, {ACTIVE_VIEW} points to {LEGACY_TABLE}")
+        return
+    for version, table, status, row_count, created_at, activated_at, note in rows:
+        line = f"v{version:<4} {status:<9} {table:<20} rows={row_count} created={created_at:%Y-%m-%d %H:%M}"
+        if activated_at:
+            line += f" activated={activated_at:%Y-%m-%d %H:%M}"
+        print(line)
+        if note:
+            print(f"      {note}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage blue/green law_chunks corpus versions")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status")
+    activate_parser = subparsers.add_parser("activate")
+    activate_parser.add_argument("version", type=int)
+    subparsers.add_parser("rollback")
+    prune_parser = subparsers.add_parser("prune")
+    prune_parser.add_argument("--keep", type=int, default=KEEP_VERSIONS)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(PG_CONN_STRING)
+    try:
+        if args.command == "status":
+            print_status(conn)
+        elif args.command == "activate":
+            activate_version(conn, args.version)
+        elif args.command == "rollback":
+            rollback(conn)
+        else:
+            prune_versions(conn, args.keep)
+    finally:
+        conn.close()
@@ -1,14 +1,45 @@
+import argparse
 import hashlib
 import os
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 import pandas as pd
 import psycopg2
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from psycopg2 import sql
+from psycopg2.extras import execute_values
 from sentence_transformers import SentenceTransformer
 from tqdm import tqdm
 
+try:
+    from .corpus_versions import (KEEP_VERSIONS, MIN_ROW_RATIO, activate_version, active_table, building_version,
+                                  create_version, mark_failed, prune_versions, validate_version)
+    from .embedding_models import MODEL_NAME, model_fingerprint, record_fingerprint
+    from .ingest_journal import INGEST_BATCH_ROWS, IngestMetrics, completed_batches, dedup_stats, journal_rows, record_batch
+    from .legal_splitter import build_char_splitter, build_legal_splitter
+    from .pdf_extract import PDF_WORKERS, collect_pages, file_sha256, submit_pdf
+    from .vector_index import MAINTENANCE_WORK_MEM, MAINTENANCE_WORKERS, build_search_table
+except ImportError:
+    from corpus_versions import (KEEP_VERSIONS, MIN_ROW_RATIO, activate_version, active_table, building_version,
+                                 create_version, mark_failed, prune_versions, validate_version)
+    from embedding_models import MODEL_NAME, model_fingerprint, record_fingerprint
+    from ingest_journal import INGEST_BATCH_ROWS, IngestMetrics, completed_batches, dedup_stats, journal_rows, record_batch
+    from legal_splitter import build_char_splitter, build_legal_splitter
+    from pdf_extract import PDF_WORKERS, collect_pages, file_sha256, submit_pdf
+    from vector_index import MAINTENANCE_WORK_MEM, MAINTENANCE_WORKERS, build_search_table
+
+# web_crawl/crawler.py 寫入的待匯入清單 (新的或有修正的法規 CSV，一行一個檔名)；讀寫時持有與爬蟲共用的檔案鎖
+# LAW_DTYPES 為爬下來的法規欄位型別，crawler.py 在 CSV 旁另存同名的 Parquet
+try:
+    from ..web_crawl.crawl_manifest import CHANGED_LAWS, read_changed_laws, remove_changed_laws
+    from ..web_crawl.law_parser import DTYPES as LAW_DTYPES
+except ImportError:
+    # 直接執行 create_vector.py 時從 web_crawl 匯入
+    import sys
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "web_crawl"))
+    from crawl_manifest import CHANGED_LAWS, read_changed_laws, remove_changed_laws
+    from law_parser import DTYPES as LAW_DTYPES
+
 PG_HOST = os.environ.get("PG_HOST", "localhost")  # 默認為 localhost
 PG_PORT = os.environ.get("PG_PORT", "5432")      # 默認為 5432
 PG_DATABASE = os.environ.get("PG_DATABASE", "lawdb")
@@ -21,38 +52,82 @@ PG_CONN_STRING = (
 )
 # print(f"Database connection string assembled (excluding password): dbname={PG_DATABASE} user={PG_USER} host={PG_HOST} port={PG_PORT}")
 
+LAWS_DIR = os.path.join(os.path.dirname(__file__), "..", "web_crawl", "laws")
+
+# init_migrate.sql 的版本 (寫入 schema_migrations)
+SCHEMA_VERSION = 1
+
+# legal: 以 e5 tokenizer 計算長度、依款/目切分 (預設)；char: 原本的 500 字 / 重疊 200 字
+TEXT_SPLITTER = os.environ.get("TEXT_SPLITTER", "legal")
+
 _conn = None
 _model = None
+# 目前模型的指紋，隨向量寫入 chunk_texts (見 embedding_models.py)
+_fingerprint = None
 _text_splitter = None
+# 寫入的資料表；預設為目前 active 版本 (見 corpus_versions.py)
+_table = None
+# 本次執行的各階段統計 (見 ingest_journal.py)
+_metrics = IngestMetrics()
 def _init_resources():
-    global _conn, _model, _text_splitter
+    global _conn, _model, _fingerprint, _text_splitter, _table
     if _conn is None:
         _conn = psycopg2.connect(PG_CONN_STRING)
+        ensure_schema(_conn)
+    if _table is None:
+        _table = active_table(_conn)
     if _model is None:
-        MODEL_NAME = "intfloat/multilingual-e5-large"
         # device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         # print(f"Using device: {device}")
         _model = SentenceTransformer(
             MODEL_NAME,
             tokenizer_kwargs={"padding_side": "left"},
         )
+        _fingerprint = model_fingerprint(MODEL_NAME, _model)
+        record_fingerprint(_conn, MODEL_NAME, _fingerprint)
     if _text_splitter is None:
-        _text_splitter = RecursiveCharacterTextSplitter(
-            separators=[
-                "\n\n",           # 1. 結構性分隔 (多於一個換行符)
-                "\n",             # 2. 單行換行符 (段落內換行)
-                "；", ";",          # 3. 分號 (較長的語義單元)
-                "。", "！", "？",  # 4. 中文句尾標點 (降級，除非段落過長才使用)
-                ".\n", "!\n", "?\n",
-                ". ", "! ", "? ", # 5. 英文句尾標點 (注意後接空格)
-                "，", ",",          # 6. 逗號
-                "、",              # 7. 頓號
-                " ",               # 8. 空格
-                ""                 # 9. 最差情況：強制字元切分
-            ],
-            chunk_size=500, chunk_overlap=200
-        )
-def generate_sha256_id(actname: str, chapter: str | None, article_no: str | None, subsection_no: str | None, chunk_index: int | None, content: str) -> str:
+        if TEXT_SPLITTER == "char":
+            _text_splitter = build_char_splitter()
+        else:
+            _text_splitter = build_legal_splitter(_model.tokenizer)
+
+def set_target_table(table: str):
+    """指定之後 process_df / process_pdf_pages 寫入的資料表。"""
+    global _table
+    _table = table
+
+def ingest_target() -> tuple:
+    """process_df / process_dfs 寫入的 (連線, 資料表)，尚未初始化時先載入。"""
+    if not _model or not _conn or not _text_splitter:
+        _init_resources()
+    return _conn, _table
+
+def ensure_schema(conn):
+    """
+    執行 init.sql（只有冪等的 DDL），讓既有資料庫補上新的欄位與資料表；
+    schema_migrations 沒有紀錄時再執行一次 init_migrate.sql (補 content_hash、chunk_texts、laws 與建立索引)。
+    """
+    with open(os.path.join(os.path.dirname(__file__), "init.sql"), "r", encoding="utf-8") as f:
+        init_sql = f.read()
+    with conn.cursor() as cur:
+        cur.execute(init_sql)
+        cur.execute("SELECT EXISTS (SELECT 1 FROM schema_migrations WHERE version = %s)", (SCHEMA_VERSION,))
+        migrated = cur.fetchone()[0]
+    conn.commit()
+    if migrated:
+        return
+    print("[create_vector] Running the one-time migration (init_migrate.sql)")
+    with open(os.path.join(os.path.dirname(__file__), "init_migrate.sql"), "r", encoding="utf-8") as f:
+        migrate_sql = f.read()
+    with conn.cursor() as cur:
+        # 同時開始的其他匯入等這裡做完
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('init_migrate'))")
+        cur.execute("SELECT EXISTS (SELECT 1 FROM schema_migrations WHERE version = %s)", (SCHEMA_VERSION,))
+        if not cur.fetchone()[0]:
+            cur.execute(migrate_sql)
+    conn.commit()
+
+def generate_sha256_id(actname: str, chapter: str | None, article_no: str | None, subsection_no: str | None, chunk_index: int | None, content: str, page_no: int | None = None) -> str:
     """計算基於法條元數據和內容的 SHA-256 雜湊 ID"""
     # 將所有輸入參數合併成一個字串
     if chapter is None:
@@ -64,38 +139,131 @@ def generate_sha256_id(actname: str, chapter: str | None, article_no: str | None
     if chunk_index is None:
         chunk_index = ""
     unique_string = f"{actname}-{chapter}-{article_no}-{subsection_no}-{chunk_index}-{content}"
+    if page_no is not None:
+        # 只有 PDF 來源才加上頁碼，CSV 來源的 ID 維持不變
+        unique_string += f"-{page_no}"
     
     # 計算 SHA-256 雜湊並返回十六進位字串
     return hashlib.sha256(unique_string.encode('utf-8')).hexdigest()
 
-def insert_chunk_and_commit(conn, actname: str, chapter: str | None, article_no: str | None, subsection_no: str | None, chunk_index: int | None, content: str, embedding: np.ndarray | None):
+def content_hash(content: str) -> str:
+    """chunk 文字的 SHA-256，與 SQL 的 encode(sha256(convert_to(content, 'UTF8')), 'hex') 相同。"""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def known_content_hashes(conn, hashes: list[str], fingerprint: str | None) -> set[str]:
     """
-    將單一 Chunk 及其向量插入到 PostgreSQL 資料庫，並立即提交 (COMMIT)。
+    已由目前的模型 (相同指紋) 編碼並存在 chunk_texts 中的 content_hash。
+    指紋不同或沒有指紋 (舊資料) 的文字視為未編碼，重新編碼後覆蓋其向量。
     """
-    cur = conn.cursor()
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT content_hash FROM chunk_texts WHERE content_hash = ANY(%s) AND fingerprint = %s",
+            (list(hashes), fingerprint),
+        )
+        return {row[0] for row in cur.fetchall()}
 
-    primary_id = generate_sha256_id(actname, chapter, article_no, subsection_no, chunk_index, content)
-    
-    # 將 NumPy 向量轉換為 pgvector 期望的字串表示
-    embedding_str = str(embedding.tolist()) if isinstance(embedding, np.ndarray) else None
-    
-    try:
+def insert_chunk_texts(conn, texts: dict[str, str], embeddings, fingerprint: str | None = None) -> int:
+    """
+    寫入不重複的 chunk 文字與向量 (texts 為 content_hash → content)，不提交。
+    已存在但由其他模型指紋產生的向量以新的向量取代。
+    """
+    values = [
+        (h, content, str(embedding.tolist()), fingerprint)
+        for (h, content), embedding in zip(texts.items(), embeddings)
+    ]
+    if not values:
+        return 0
+    with conn.cursor() as cur:
+        inserted = execute_values(
+            cur,
+            "INSERT INTO chunk_texts (content_hash, content, embedding, fingerprint) VALUES %s "
+            "ON CONFLICT (content_hash) DO UPDATE SET embedding = EXCLUDED.embedding, fingerprint = EXCLUDED.fingerprint "
+            "WHERE chunk_texts.fingerprint IS DISTINCT FROM EXCLUDED.fingerprint RETURNING content_hash",
+            values,
+            template="(%s, %s, %s::VECTOR, %s)",
+            fetch=True,
+        )
+    return len(inserted)
+
+def insert_chunks(conn, rows: list[tuple], table: str) -> int:
+    """
+    批次寫入多筆 chunk 出現位置，不提交 (由呼叫端與檢查點一起 COMMIT)，回傳實際新增的筆數。
+    rows 為 (actname, chapter, article_no, subsection_no, chunk_index, page_no, content, content_hash)；
+    向量只存在 chunk_texts，以 content_hash 對應。整條的父資料列 content_hash 為 None。
+    重複的 ID (相同的元數據與內容) 會被略過。
+    """
+    values = []
+    for actname, chapter, article_no, subsection_no, chunk_index, page_no, content, chunk_hash in rows:
+        primary_id = generate_sha256_id(actname, chapter, article_no, subsection_no, chunk_index, content, page_no)
+        values.append((primary_id, actname, chapter, article_no, subsection_no, chunk_index, page_no, content, chunk_hash))
+    if not values:
+        return 0
+    with conn.cursor() as cur:
+        inserted = execute_values(
+            cur,
+            sql.SQL("""
+            INSERT INTO {}
+            (id, law_name, chapter, article_no, subsection_no, chunk_index, page_no, content, content_hash)
+            VALUES %s
+            ON CONFLICT (id) DO NOTHING
+            RETURNING id
+            """).format(sql.Identifier(table)).as_string(conn),
+            values,
+            fetch=True,
+        )
+    return len(inserted)
+
+def _encode_new(chunks: list[str]) -> tuple[list[str], dict[str, str], list]:
+    """
+    只編碼 chunk_texts 中還沒有的文字 (同一段文字只編碼一次)，
+    回傳 (每個 chunk 的 content_hash, 新的文字 content_hash → content, 新文字的向量)。
+    """
+    hashes = [content_hash(chunk) for chunk in chunks]
+    with _metrics.stage("encode"):
+        known = known_content_hashes(_conn, hashes, _fingerprint) if hashes else set()
+        texts = {h: chunk for h, chunk in zip(hashes, chunks) if h not in known}
+        embeddings = _model.encode(["passage: " + chunk for chunk in texts.values()]) if texts else []
+    _metrics.add("chunks_encoded", len(texts))
+    _metrics.add("chunks_deduplicated", len(chunks) - len(texts))
+    return hashes, texts, embeddings
+
+def _with_hashes(rows: list[tuple], hashes: list[str]) -> list[tuple]:
+    # rows 中最後一欄為 int 者代表 chunks 的位置
+    return [row[:-1] + (hashes[row[-1]] if isinstance(row[-1], int) else None,) for row in rows]
+
+def _write_batch(rows: list[tuple], chunks: list[str], source: str, batch_no: int) -> int:
+    """
+    只編碼 chunk_texts 中還沒有的文字，連同出現位置與檢查點在同一個交易中寫入，回傳新增的出現位置筆數。
+    """
+    hashes, texts, embeddings = _encode_new(chunks)
+    rows = _with_hashes(rows, hashes)
+    with _metrics.stage("write"):
+        try:
+            _metrics.add("texts_written", insert_chunk_texts(_conn, texts, embeddings, _fingerprint))
+            inserted = insert_chunks(_conn, rows, _table)
+            with _conn.cursor() as cur:
+                record_batch(cur, _table, source, batch_no, inserted)
+            _conn.commit()
+        except Exception:
+            _conn.rollback()
+            raise
+    _metrics.add("rows_written", inserted)
+    _metrics.add("batches")
+    return inserted
+
+def is_file_ingested(conn, sha256: str, table: str) -> bool:
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1 FROM ingested_files WHERE sha256 = %s AND target_table = %s", (sha256, table))
+        return cur.fetchone() is not None
+
+def mark_file_ingested(conn, sha256: str, filename: str, kind: str, table: str):
+    with conn.cursor() as cur:
         cur.execute(
-            """
-            INSERT INTO law_chunks 
-            (id, law_name, chapter, article_no, subsection_no, chunk_index, content, embedding) 
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s::VECTOR)
-            """,
-            (primary_id, actname, chapter, article_no, subsection_no, chunk_index, content, embedding_str)
+            "INSERT INTO ingested_files (sha256, target_table, filename, kind) VALUES (%s, %s, %s, %s) "
+            "ON CONFLICT (sha256, target_table) DO NOTHING",
+            (sha256, table, filename, kind),
         )
-        # 關鍵：每次插入後立即提交
-        conn.commit()
-    except Exception as e:
-        conn.rollback() # 發生錯誤時回滾該筆資料
-        print(f"Error inserting {actname} - {chapter} - {article_no} - {subsection_no} (Index {chunk_index}): {e}")
-        # 由於是逐條儲存，這裡可以選擇不拋出異常，繼續處理下一筆
-    finally:
-        cur.close()
+    conn.commit()
 
 def clean_value(value):
     """
@@ -112,34 +280,260 @@ def clean_value(value):
         return None
     return value
 
-def process_df(df: pd.DataFrame, lawname: str):
+def read_law_file(csv_path: str) -> pd.DataFrame:
+    """
+    讀取一部法規：同名的 Parquet 存在且不比 CSV 舊時直接讀 Parquet (已有型別，不需解析文字)，
+    否則以 LAW_DTYPES 讀 CSV。
+    """
+    parquet_path = os.path.splitext(csv_path)[0] + ".parquet"
+    if os.path.exists(parquet_path) and os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path):
+        return pd.read_parquet(parquet_path)
+    header = pd.read_csv(csv_path, nrows=0).columns
+    return pd.read_csv(csv_path, dtype={c: t for c, t in LAW_DTYPES.items() if c in header})
+
+def clean_frame(df: pd.DataFrame, subsection_float: bool) -> pd.DataFrame:
+    """
+    以整欄運算取代逐格的 clean_value：NaN / NA 與空白字串都變成 None，回傳 object 欄位的新 DataFrame。
+    subsection_float 時項號為浮點數 (1.0)，否則為整數，與原本 pd.read_csv 讀入的值相同 (整欄有空值時
+    pandas 讀成浮點數)，資料列 ID 不變。
+    """
+    cleaned = {}
+    for column in ["actname", "chapter", "title", "article"]:
+        values = df[column].astype("string")
+        values = values.mask(values.str.strip() == "")
+        cleaned[column] = values.astype(object).where(values.notna(), None)
+    subsection = pd.to_numeric(df["subsection"], errors="coerce").astype("Float64" if subsection_float else "Int64")
+    cleaned["subsection"] = subsection.astype(object).where(subsection.notna(), None)
+    return pd.DataFrame(cleaned, index=df.index)
+
+def process_df(df: pd.DataFrame, lawname: str, source: str | None = None) -> int:
     """
     Process the DataFrame to insert law chunks and their embeddings into the database.
+    Rows are written in batches of INGEST_BATCH_ROWS together with a checkpoint, so batches
+    already recorded for `source` (default: lawname) are skipped on a rerun.
+    Returns the number of rows inserted.
     """
     if not _model or not _conn or not _text_splitter:
         _init_resources()
-    model = _model
-    conn = _conn
-    text_splitter = _text_splitter
-    for rows in tqdm(df.itertuples(), total=len(df), desc=f"Processing {lawname}"):
-        # content = rows[2]
-        # embedding = model.encode(content)
-        # print(f"Document: {content}\nEmbedding: {embedding[:5]}... (dim: {len(embedding)})\n")
-        actname = clean_value(rows.actname) # 法條
-        chapter = clean_value(rows.chapter) # 章
-        title = clean_value(rows.title) # 第?條
-        subsection_no = clean_value(rows.subsection) # 款號
-        article = clean_value(rows.article) # 內容
-        insert_chunk_and_commit(conn, actname, chapter, title, subsection_no, None, article, None)
-
-        chunks = text_splitter.split_text(article)
-
-        document_embeddings = model.encode(["passage: " + chunk for chunk in chunks])
-        # print("embedding done")
-        for i, vec in enumerate(document_embeddings):
-            insert_chunk_and_commit(conn, actname, chapter, title, subsection_no, i, chunks[i], vec)
+    source = source or lawname
+    done = completed_batches(_conn, _table, source)
+    inserted = 0
+    subsection_float = bool(df["subsection"].isna().any())
+    for batch_no, start in enumerate(tqdm(range(0, len(df), INGEST_BATCH_ROWS), desc=f"Processing {lawname}")):
+        if batch_no in done:
+            _metrics.add("batches_skipped")
+            continue
+        chunks = []
+        with _metrics.stage("split"):
+            rows = split_rows(df.iloc[start:start + INGEST_BATCH_ROWS], subsection_float, chunks)
+        _metrics.add("chunks_split", len(chunks))
+        inserted += _write_batch(rows, chunks, source, batch_no)
+    return inserted
+
+def split_rows(df: pd.DataFrame, subsection_float: bool, chunks: list[str]) -> list[tuple]:
+    """
+    把法規資料列切塊：每一列產生一筆整條的父資料列與各個 chunk 的資料列，chunk 文字附加到 chunks，
+    資料列最後一欄為它在 chunks 中的位置 (父資料列為 None)。
+    """
+    rows = []
+    batch = clean_frame(df, subsection_float)
+    for actname, chapter, title, article, subsection_no in batch.itertuples(index=False, name=None):
+        # 法條、章、第?條、內容、款號
+        if article is None:
+            continue
+        rows.append((actname, chapter, title, subsection_no, None, None, article, None))
+        for i, chunk in enumerate(_text_splitter.split_text(article)):
+            rows.append((actname, chapter, title, subsection_no, i, None, chunk, len(chunks)))
+            chunks.append(chunk)
+    return rows
+
+def process_dfs(frames: list[tuple[pd.DataFrame, str]]) -> dict[str, int]:
+    """
+    一次匯入多部法規 (frames 為 (DataFrame, source) 的列表)：全部切塊後只呼叫一次 model.encode，
+    chunk 文字、出現位置與每個 source 各批次的檢查點在同一個交易中寫入。
+    與 process_df 相同只略過已有檢查點的批次 (匯入到一半的法規補完其餘批次)。回傳每個 source 新增的筆數。
+    """
+    if not _model or not _conn or not _text_splitter:
+        _init_resources()
+    chunks = []
+    # (source, batch_no, rows)
+    batches = []
+    inserted = {}
+    with _metrics.stage("split"):
+        for df, source in frames:
+            done = completed_batches(_conn, _table, source)
+            inserted[source] = 0
+            subsection_float = bool(df["subsection"].isna().any())
+            for batch_no, start in enumerate(range(0, len(df), INGEST_BATCH_ROWS)):
+                if batch_no in done:
+                    _metrics.add("batches_skipped")
+                    continue
+                batches.append((source, batch_no, split_rows(df.iloc[start:start + INGEST_BATCH_ROWS], subsection_float, chunks)))
+    _metrics.add("chunks_split", len(chunks))
+    hashes, texts, embeddings = _encode_new(chunks)
+    with _metrics.stage("write"):
+        try:
+            _metrics.add("texts_written", insert_chunk_texts(_conn, texts, embeddings, _fingerprint))
+            with _conn.cursor() as cur:
+                for source, batch_no, rows in batches:
+                    count = insert_chunks(_conn, _with_hashes(rows, hashes), _table)
+                    record_batch(cur, _table, source, batch_no, count)
+                    inserted[source] += count
+                    _metrics.add("batches")
+            _conn.commit()
+        except Exception:
+            _conn.rollback()
+            raise
+    _metrics.add("rows_written", sum(inserted.values()))
+    return inserted
     
+def process_pdf_pages(pages: list[tuple[int, str]], actname: str, source: str | None = None) -> int:
+    """
+    將 PDF 逐頁擷取的文字切塊、編碼並寫入資料庫，回傳寫入筆數。
+    每頁寫入一筆不含向量的整頁內容，各 chunk 帶有頁碼；chunk_index 在整份 PDF 內連續編號。
+    與 process_df 相同以頁為單位分批寫入檢查點；已完成的批次仍會切塊以延續 chunk_index，但不再編碼。
+    """
+    if not _model or not _conn or not _text_splitter:
+        _init_resources()
+    source = source or actname
+    done = completed_batches(_conn, _table, source)
+    inserted = 0
+    chunk_index = 0
+    for batch_no, start in enumerate(range(0, len(pages), INGEST_BATCH_ROWS)):
+        rows = []
+        chunks = []
+        with _metrics.stage("split"):
+            for page_no, text in pages[start:start + INGEST_BATCH_ROWS]:
+                if not text.strip():
+                    continue
+                rows.append((actname, None, None, None, None, page_no, text, None))
+                for chunk in _text_splitter.split_text(text):
+                    rows.append((actname, None, None, None, chunk_index, page_no, chunk, len(chunks)))
+                    chunks.append(chunk)
+                    chunk_index += 1
+        if batch_no in done:
+            _metrics.add("batches_skipped")
+            continue
+        _metrics.add("chunks_split", len(chunks))
+        inserted += _write_batch(rows, chunks, source, batch_no)
+    return inserted
+
+def _law_name(item: str) -> str:
+    return item.split('_')[0]
+
+def delete_laws(conn, table: str, items: set[str]) -> int:
+    """刪除這些 CSV 對應法規的資料列與檢查點 (重新匯入前)，回傳刪除筆數。"""
+    with conn.cursor() as cur:
+        cur.execute(
+            sql.SQL("DELETE FROM {} WHERE law_name = ANY(%s)").format(sql.Identifier(table)),
+            (sorted({_law_name(item) for item in items}),),
+        )
+        deleted = cur.rowcount
+        cur.execute(
+            "DELETE FROM ingest_checkpoints WHERE target_table = %s AND source = ANY(%s)",
+            (table, sorted(items)),
+        )
+    conn.commit()
+    return deleted
+
+def copy_unchanged_laws(conn, source_table: str, target_table: str, items: set[str]) -> int:
+    """
+    把 source_table 中不在 items (有變動的 CSV) 的法規資料列複製到新版本，連同已匯入的 PDF 紀錄，
+    以 copy:<source_table> 的檢查點記錄筆數 (接續匯入時不重複複製)。回傳複製的筆數。
+    """
+    copy_source = f"copy:{source_table}"
+    # 複製只有一個批次，與批次大小無關
+    if completed_batches(conn, target_table, copy_source, batch_rows=None):
+        return 0
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = %s ORDER BY ordinal_position",
+            (target_table,),
+        )
+        columns = sql.SQL(", ").join(sql.Identifier(row[0]) for row in cur.fetchall())
+        cur.execute(
+            sql.SQL("INSERT INTO {} ({}) SELECT {} FROM {} WHERE law_name <> ALL(%s) ON CONFLICT (id) DO NOTHING").format(
+                sql.Identifier(target_table), columns, columns, sql.Identifier(source_table)
+            ),
+            (sorted({_law_name(item) for item in items}),),
+        )
+        copied = cur.rowcount
+        cur.execute(
+            "INSERT INTO ingested_files (sha256, target_table, filename, kind) "
+            "SELECT sha256, %s, filename, kind FROM ingested_files WHERE target_table = %s "
+            "ON CONFLICT (sha256, target_table) DO NOTHING",
+            (target_table, source_table),
+        )
+        record_batch(cur, target_table, copy_source, 0, copied, batch_rows=None)
+    conn.commit()
+    print(f"Copied {copied} rows of unchanged laws from {source_table}")
+    return copied
+
+def ingest_sources(pdf_workers: int = PDF_WORKERS, only: set[str] | None = None) -> int:
+    """
+    匯入 web_crawl/laws 的 CSV 與 web_crawl/pdfs 的 PDF 到目前的目標資料表，回傳寫入筆數。
+    only 指定時只匯入這些 CSV (待匯入清單)；PDF 依 ingested_files 略過已匯入的檔案。
+    """
+    if not _model or not _conn or not _text_splitter:
+        _init_resources()
+    conn = _conn
+    inserted = 0
+    # 每部法規以 CSV 檔名為準 (待匯入清單與檢查點都用它)，有同名的 Parquet 時讀 Parquet
+    items = sorted(item for item in os.listdir(LAWS_DIR) if item.endswith(".csv"))
+    if only is not None:
+        items = [item for item in items if item in only]
+    for item in tqdm(items, desc="Processing files"):
+        with _metrics.stage("read"):
+            df = read_law_file(os.path.join(LAWS_DIR, item))
+        inserted += process_df(df, lawname=_law_name(item), source=item)
+        _metrics.add("files")
+
+    pdf_dir = os.path.join(os.path.dirname(__file__),"..","web_crawl","pdfs")
+    with ProcessPoolExecutor(max_workers=pdf_workers) as executor:
+        # 先把所有尚未匯入的 PDF 送進行程池擷取，讓擷取與 embedding 同時進行
+        pending = []
+        for item in sorted(os.listdir(pdf_dir)):
+            pdf_file = os.path.join(pdf_dir, item)
+            file_hash = file_sha256(pdf_file)
+            if is_file_ingested(conn, file_hash, _table):
+                print(f"Skipping already ingested PDF: {item}")
+                continue
+            futures = submit_pdf(executor, pdf_file)
+            if futures is None:
+                # 損毀的 PDF 不中止整個匯入，也不記為已匯入
+                _metrics.add("files_failed")
+                continue
+            pending.append((item, file_hash, futures))
+
+        for item, file_hash, futures in tqdm(pending, desc="Processing PDF files"):
+            with _metrics.stage("extract"):
+                try:
+                    pages = collect_pages(futures)
+                except Exception as e:
+                    print(f"Error extracting {item}: {e}")
+                    _metrics.add("files_failed")
+                    continue
+            _metrics.add("pdf_pages", len(pages))
+            inserted += process_pdf_pages(pages, actname=item.replace(".pdf", ""), source=item)
+            mark_file_ingested(conn, file_hash, item, "pdf", _table)
+            _metrics.add("files")
+    return inserted
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split, embed and insert crawled laws into law_chunks")
+    parser.add_argument("--in-place", action="store_true", help="insert into the active table instead of building a new corpus version")
+    parser.add_argument("--index-workers", type=int, default=MAINTENANCE_WORKERS)
+    parser.add_argument("--maintenance-work-mem", default=MAINTENANCE_WORK_MEM)
+    parser.add_argument("--pdf-workers", type=int, default=PDF_WORKERS)
+    parser.add_argument("--min-row-ratio", type=float, default=MIN_ROW_RATIO, help="new version must have at least this share of the active version's rows")
+    parser.add_argument("--keep-versions", type=int, default=KEEP_VERSIONS)
+    parser.add_argument("--fresh", action="store_true", help="abandon an unfinished version instead of resuming it")
+    parser.add_argument("--report", default=None, help="path of the JSON run report (default: runs/ingest_<time>.json)")
+    parser.add_argument("--changed", nargs="?", const=CHANGED_LAWS, default=None, metavar="LIST",
+                        help="only re-split and re-embed the laws in this list (default: web_crawl/changed_laws.txt); "
+                             "other laws are kept from the active table")
+    args = parser.parse_args()
+
     _init_resources()
     model = _model
     text_splitter = _text_splitter
@@ -156,23 +550,56 @@ if __name__ == "__main__":
     # for doc, embedding in zip(documents, document_embeddings):
     #     print(f"Document: {doc}\nEmbedding: {embedding[:5]}... (dim: {len(embedding)})\n")
 
+    changed = None
+    if args.changed:
+        changed = read_changed_laws(args.changed)
+        print(f"{len(changed)} new or amended laws in {args.changed}")
 
-    for item in tqdm(os.listdir(os.path.join(os.path.dirname(__file__),"..","web_crawl","laws")), desc="Processing files"):
-        # csv files
-        df = pd.read_csv(os.path.join(os.path.dirname(__file__),"..","web_crawl","laws", item))
-        process_df(df, lawname=item.split('_')[0])
-
-    for item in tqdm(os.listdir(os.path.join(os.path.dirname(__file__),"..","web_crawl","pdfs")), desc="Processing PDF files"):
-        pdf_file = os.path.join(os.path.dirname(__file__),"..","web_crawl","pdfs", item)
-        loader = PyPDFLoader(pdf_file)
-        data = loader.load()
-        texts = text_splitter.split_documents(data)
-        documents = [t.page_content for t in texts]
-        actname = item.replace(".pdf", "")
-        chapter = None
-        title = None
-        subsection_no = None
-        insert_chunk_and_commit(conn, actname, chapter, title, subsection_no, None, "".join(documents), None)
-        document_embeddings = model.encode(["passage: " + document for document in documents])
-        for i, vec in enumerate(document_embeddings):
-            insert_chunk_and_commit(conn, actname, chapter, title, subsection_no, i, documents[i], vec)
+    if args.in_place:
+        if changed is not None:
+            print(f"Deleted {delete_laws(conn, _table, changed)} rows of amended laws from {_table}")
+        ingest_sources(args.pdf_workers, only=changed)
+        # 更新檢索用的 materialized view (law_search)：匯入期間 view 不變，這裡移除其索引、重新整理後平行重建
+        with _metrics.stage("index"):
+            build_search_table(conn, _table, workers=args.index_workers, maintenance_work_mem=args.maintenance_work_mem)
+        _metrics.write(args.report, mode="in-place", table=_table, dedup=dedup_stats(conn, _table))
+        if changed:
+            remove_changed_laws(changed, args.changed)
+    else:
+        # 寫入新的版本資料表 (尚無索引)，建好檢索用的 law_search_v<N> 與其索引、檢查筆數後再切換上線。
+        # 完整的版本資料表不建向量索引，檢索只查 law_search_v<N>。
+        # 上次未完成的版本 (例如中途 OOM 或資料庫重啟) 會依檢查點接續匯入。
+        unfinished = building_version(conn)
+        if unfinished and not args.fresh:
+            version, table = unfinished
+            print(f"Resuming unfinished version {version} ({table})")
+        else:
+            if unfinished:
+                mark_failed(conn, unfinished[0], "abandoned by --fresh")
+            version, table = create_version(conn)
+        previous = active_table(conn)
+        set_target_table(table)
+        try:
+            if changed is not None:
+                # 沒有變動的法規直接從目前的版本複製，只有清單中的法規重新切塊、編碼
+                with _metrics.stage("copy"):
+                    _metrics.add("rows_copied", copy_unchanged_laws(conn, previous, table, changed))
+            ingest_sources(args.pdf_workers, only=changed)
+        except BaseException:
+            _metrics.write(args.report, mode="version", version=version, table=table, status="interrupted")
+            print(f"Ingestion interrupted, rerun create_vector.py to resume version {version}")
+            raise
+        try:
+            with _metrics.stage("index"):
+                build_search_table(conn, table, workers=args.index_workers, maintenance_work_mem=args.maintenance_work_mem)
+            with _metrics.stage("validate"):
+                validate_version(conn, version, journal_rows(conn, table), args.min_row_ratio)
+        except BaseException as e:
+            mark_failed(conn, version, f"{type(e).__name__}: {e}")
+            _metrics.write(args.report, mode="version", version=version, table=table, status="failed")
+            raise
+        activate_version(conn, version)
+        prune_versions(conn, args.keep_versions)
+        _metrics.write(args.report, mode="version", version=version, table=table, status="active", dedup=dedup_stats(conn, table))
+        if changed:
+            remove_changed_laws(changed, args.changed)
@@ -15,7 +15,10 @@ PG_CONN_STRING = (
 )
 
 # ------------------ Load Embedding Model ------------------
-MODEL_NAME = "intfloat/multilingual-e5-large"
+try:
+    from .embedding_models import MODEL_NAME
+except ImportError:
+    from embedding_models import MODEL_NAME
 model = None
 
 # ------------------ Query Function ------------------
@@ -33,14 +36,20 @@ def query_top_k_law_chunks(query: str, top_k: int = 5):
 
     # pgvector similarity search using L2 (Euclidean distance)
     sql = """
-    SELECT id, law_name, chapter, article_no, subsection_no, chunk_index, content, embedding
-    FROM law_chunks
-    WHERE chunk_index IS NOT NULL
-      AND content <> '（刪除）'
-    ORDER BY embedding <-> %s::vector
-    LIMIT %s;
+    WITH hits AS (
+        SELECT content_hash, embedding, embedding <-> %s::vector AS distance
+        FROM law_search_active
+        ORDER BY embedding <-> %s::vector
+        LIMIT %s
+    )
+    SELECT c.id, c.law_name, c.chapter, c.article_no, c.subsection_no, c.chunk_index, c.content, h.embedding
+    FROM hits h
+    JOIN law_chunks_active c ON c.content_hash = h.content_hash
+    WHERE c.chunk_index IS NOT NULL
+      AND c.content <> '（刪除）'
+    ORDER BY h.distance;
     """
-    cur.execute(sql, (embedding_str, top_k))
+    cur.execute(sql, (embedding_str, embedding_str, top_k))
     results = cur.fetchall()
 
     cur.close()
@@ -0,0 +1,302 @@
+"""
+Embedding 模型登錄與背景重新編碼
+
+- MODEL_NAME 為主要模型 (multilingual-e5-large)，向量存在 chunk_texts.embedding；
+  其他模型 (例如在 CPU 上較快的 e5-base / e5-small) 各自有一張 chunk_vectors_<模型> 表，
+  與主要模型的向量並存，維度依模型而定。
+- embedding_models 資料表記錄每個模型的維度、向量表、指紋 (fingerprint) 與狀態；
+  每一列向量也記錄產生它的模型指紋，模型權重更新後可以找出需要重新編碼的列。
+- reembed 以固定速率在背景把上線語料的文字編碼到新模型，可隨時中斷、重新執行會接續；
+  全部涵蓋後建立 HNSW 索引，並可切換成 SimilaritySearch 使用的模型 (serve)。
+
+    python embedding_models.py status
+    python embedding_models.py register e5-small
+    python embedding_models.py reembed e5-small --rate 20 --threads 2 --serve
+    python embedding_models.py serve e5-large
+"""
+import argparse
+import hashlib
+import os
+import re
+import time
+
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+try:
+    from .vector_index import build_vector_index
+except ImportError:
+    from vector_index import build_vector_index
+
+PG_HOST = os.environ.get("PG_HOST", "localhost")
+PG_PORT = os.environ.get("PG_PORT", "5432")
+PG_DATABASE = os.environ.get("PG_DATABASE", "lawdb")
+PG_USER = os.environ.get("PG_USER", "postgres")
+PG_PASSWORD = os.environ.get("PG_PASSWORD", "postgres")
+
+PG_CONN_STRING = (
+    f"dbname={PG_DATABASE} user={PG_USER} password={PG_PASSWORD} "
+    f"host={PG_HOST} port={PG_PORT}"
+)
+
+# 主要模型：create_vector 以它編碼，向量存在 chunk_texts
+MODEL_NAME = "intfloat/multilingual-e5-large"
+PRIMARY_VECTOR_TABLE = "chunk_texts"
+
+# 別名 → (模型名稱, 維度)；e5 系列共用 "query: " / "passage: " 前綴
+EMBEDDING_MODELS = {
+    "e5-large": ("intfloat/multilingual-e5-large", 1024),
+    "e5-base": ("intfloat/multilingual-e5-base", 768),
+    "e5-small": ("intfloat/multilingual-e5-small", 384),
+}
+
+# 背景重新編碼的預設速率 (每秒文字數) 與批次大小
+REEMBED_RATE = float(os.environ.get("REEMBED_RATE", "20"))
+REEMBED_BATCH = int(os.environ.get("REEMBED_BATCH", "32"))
+
+# 需要向量的文字：上線語料中可檢索的 chunk (與 vector_index.SEARCH_QUERY 相同條件)
+_NEEDED_HASHES = """
+SELECT DISTINCT content_hash FROM law_chunks_active
+WHERE chunk_index IS NOT NULL AND content <> '（刪除）' AND content_hash IS NOT NULL
+"""
+
+
+def resolve_model(name: str) -> tuple[str, int]:
+    """接受別名 (e5-small) 或完整名稱，回傳 (模型名稱, 維度)。"""
+    if name in EMBEDDING_MODELS:
+        return EMBEDDING_MODELS[name]
+    for model_name, dim in EMBEDDING_MODELS.values():
+        if model_name == name:
+            return model_name, dim
+    raise ValueError(f"Unknown embedding model {name}, expected one of {', '.join(EMBEDDING_MODELS)}")
+
+
+def vector_table(model_name: str) -> str:
+    if model_name == MODEL_NAME:
+        return PRIMARY_VECTOR_TABLE
+    return "chunk_vectors_" + re.sub(r"\W+", "_", model_name.split("/")[-1]).lower()
+
+
+def load_model(model_name: str = MODEL_NAME):
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name, tokenizer_kwargs={"padding_side": "left"})
+
+
+def model_fingerprint(model_name: str, model) -> str:
+    """
+    模型的指紋：名稱、維度、最大長度與最後一個參數張量的內容。
+    同名模型換了權重 (例如重新下載到不同 revision) 指紋就會不同。
+    """
+    h = hashlib.sha256()
+    h.update(model_name.encode("utf-8"))
+    h.update(str(model.get_sentence_embedding_dimension()).encode("utf-8"))
+    h.update(str(model.max_seq_length).encode("utf-8"))
+    last_parameter = list(model.parameters())[-1]
+    h.update(last_parameter.detach().cpu().float().numpy().tobytes())
+    return h.hexdigest()
+
+
+def record_fingerprint(conn, model_name: str, fingerprint: str):
+    """記錄模型指紋；與登錄的不同時印出警告 (既有向量需要重新編碼)。"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT fingerprint FROM embedding_models WHERE name = %s", (model_name,))
+        row = cur.fetchone()
+        if row and row[0] and row[0] != fingerprint:
+            print(
+                f"[embedding_models] Warning: {model_name} fingerprint changed, existing vectors were made by another build "
+                "and are re-encoded when their texts are ingested again"
+            )
+        cur.execute("UPDATE embedding_models SET fingerprint = %s WHERE name = %s", (fingerprint, model_name))
+    conn.commit()
+
+
+def register_model(conn, name: str) -> str:
+    """登錄模型並建立它的向量表 (尚無索引)，回傳模型名稱。"""
+    model_name, dim = resolve_model(name)
+    table = vector_table(model_name)
+    with conn.cursor() as cur:
+        if table != PRIMARY_VECTOR_TABLE:
+            cur.execute(
+                sql.SQL(
+                    "CREATE TABLE IF NOT EXISTS {} ("
+                    "content_hash CHAR(64) PRIMARY KEY, "
+                    "embedding VECTOR({}) NOT NULL, "
+                    "fingerprint CHAR(64) NOT NULL, "
+                    "embedded_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+                ).format(sql.Identifier(table), sql.Literal(dim))
+            )
+        cur.execute(
+            "INSERT INTO embedding_models (name, dim, vector_table) VALUES (%s, %s, %s) ON CONFLICT (name) DO NOTHING",
+            (model_name, dim, table),
+        )
+    conn.commit()
+    print(f"[embedding_models] Registered {model_name} ({dim} dims) in {table}")
+    return model_name
+
+
+def _model_row(conn, model_name: str) -> tuple[int, str, str | None, str]:
+    with conn.cursor() as cur:
+        cur.execute("SELECT dim, vector_table, fingerprint, status FROM embedding_models WHERE name = %s", (model_name,))
+        row = cur.fetchone()
+    conn.commit()
+    if row is None:
+        raise ValueError(f"{model_name} is not registered, run: python embedding_models.py register {model_name}")
+    return row
+
+
+def coverage(conn, model_name: str) -> tuple[int, int]:
+    """回傳 (已有目前指紋向量的文字數, 上線語料需要的文字數)。主要模型的向量由 create_vector 寫入，一律完整。"""
+    _, table, fingerprint, _ = _model_row(conn, model_name)
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("SELECT count(*) FROM ({}) needed").format(sql.SQL(_NEEDED_HASHES)))
+        needed = cur.fetchone()[0]
+        if table == PRIMARY_VECTOR_TABLE:
+            covered = needed
+        else:
+            cur.execute(
+                sql.SQL(
+                    "SELECT count(*) FROM {} v WHERE v.fingerprint = %s AND v.content_hash IN ({})"
+                ).format(sql.Identifier(table), sql.SQL(_NEEDED_HASHES)),
+                (fingerprint,),
+            )
+            covered = cur.fetchone()[0]
+    conn.commit()
+    return covered, needed
+
+
+def serving_model(conn) -> tuple[str, str]:
+    """SimilaritySearch 使用的 (模型名稱, 向量表)；沒有設定時為主要模型。"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT name, vector_table FROM embedding_models WHERE status = 'serving'")
+        row = cur.fetchone()
+    conn.commit()
+    return row if row else (MODEL_NAME, PRIMARY_VECTOR_TABLE)
+
+
+def set_serving(conn, name: str):
+    """切換 SimilaritySearch 使用的模型；新模型必須已涵蓋全部上線語料並建好索引。"""
+    model_name, _ = resolve_model(name)
+    _, _, _, status = _model_row(conn, model_name)
+    covered, needed = coverage(conn, model_name)
+    if covered < needed or (model_name != MODEL_NAME and status not in ("complete", "serving")):
+        raise ValueError(f"{model_name} covers {covered}/{needed} texts, run reembed first")
+    with conn.cursor() as cur:
+        cur.execute("UPDATE embedding_models SET status = 'complete' WHERE status = 'serving'")
+        cur.execute("UPDATE embedding_models SET status = 'serving' WHERE name = %s", (model_name,))
+    conn.commit()
+    print(f"[embedding_models] SimilaritySearch now uses {model_name} (restart running services to pick it up)")
+
+
+def reembed(conn, name: str, rate: float = REEMBED_RATE, batch_size: int = REEMBED_BATCH, threads: int | None = None, serve: bool = False):
+    """
+    把上線語料中還沒有目前指紋向量的文字編碼到模型 name，每批提交一次，依 rate (每秒文字數) 限速，
+    讓服務中的查詢與資料庫不被搶走資源；中斷後重新執行會從剩下的文字接續。
+    """
+    model_name, _ = resolve_model(name)
+    if model_name == MODEL_NAME:
+        raise ValueError(f"{MODEL_NAME} vectors are written by create_vector")
+    register_model(conn, model_name)
+    if threads:
+        import torch
+
+        torch.set_num_threads(threads)
+    model = load_model(model_name)
+    fingerprint = model_fingerprint(model_name, model)
+    record_fingerprint(conn, model_name, fingerprint)
+    table = vector_table(model_name)
+
+    pending_sql = sql.SQL(
+        "SELECT t.content_hash, t.content FROM chunk_texts t "
+        "WHERE t.content_hash IN ({}) "
+        "AND NOT EXISTS (SELECT 1 FROM {} v WHERE v.content_hash = t.content_hash AND v.fingerprint = %s) "
+        "LIMIT %s"
+    ).format(sql.SQL(_NEEDED_HASHES), sql.Identifier(table))
+    upsert_sql = sql.SQL(
+        "INSERT INTO {} (content_hash, embedding, fingerprint) VALUES %s "
+        "ON CONFLICT (content_hash) DO UPDATE SET embedding = EXCLUDED.embedding, "
+        "fingerprint = EXCLUDED.fingerprint, embedded_at = now()"
+    ).format(sql.Identifier(table)).as_string(conn)
+
+    covered, needed = coverage(conn, model_name)
+    print(f"[embedding_models] {model_name}: {covered}/{needed} texts already embedded")
+    done = 0
+    start = time.perf_counter()
+    while True:
+        batch_start = time.perf_counter()
+        with conn.cursor() as cur:
+            cur.execute(pending_sql, (fingerprint, batch_size))
+            rows = cur.fetchall()
+        conn.commit()
+        if not rows:
+            break
+        embeddings = model.encode(["passage: " + content for _, content in rows])
+        with conn.cursor() as cur:
+            execute_values(
+                cur,
+                upsert_sql,
+                [(content_hash, str(embedding.tolist()), fingerprint) for (content_hash, _), embedding in zip(rows, embeddings)],
+                template="(%s, %s::VECTOR, %s)",
+            )
+        conn.commit()
+        done += len(rows)
+        elapsed = time.perf_counter() - start
+        print(f"[embedding_models] {covered + done}/{needed} texts ({done / elapsed:.1f} texts/s)")
+        # 限速：每批至少花 len(rows) / rate 秒
+        if rate > 0:
+            time.sleep(max(0.0, len(rows) / rate - (time.perf_counter() - batch_start)))
+
+    build_vector_index(conn, table)
+    with conn.cursor() as cur:
+        cur.execute(
+            "UPDATE embedding_models SET status = 'complete', completed_at = now() WHERE name = %s AND status = 'registered'",
+            (model_name,),
+        )
+    conn.commit()
+    print(f"[embedding_models] {model_name} covers all {needed} texts")
+    if serve:
+        set_serving(conn, model_name)
+
+
+def print_status(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT name, dim, vector_table, status, fingerprint FROM embedding_models ORDER BY name")
+        rows = cur.fetchall()
+    conn.commit()
+    for name, dim, table, status, fingerprint in rows:
+        covered, needed = coverage(conn, name)
+        print(
+            f"{name:<36} {status:<10} dim={dim:<5} {table:<36} "
+            f"coverage={covered}/{needed} fingerprint={(fingerprint or '-')[:12]}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedding model registry and background re-embedding")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status")
+    register_parser = subparsers.add_parser("register")
+    register_parser.add_argument("model", help=f"alias ({', '.join(EMBEDDING_MODELS)}) or model name")
+    reembed_parser = subparsers.add_parser("reembed")
+    reembed_parser.add_argument("model")
+    reembed_parser.add_argument("--rate", type=float, default=REEMBED_RATE, help="texts per second, 0 for no limit")
+    reembed_parser.add_argument("--batch-size", type=int, default=REEMBED_BATCH)
+    reembed_parser.add_argument("--threads", type=int, default=None, help="torch CPU threads")
+    reembed_parser.add_argument("--serve", action="store_true", help="switch SimilaritySearch to the model when done")
+    serve_parser = subparsers.add_parser("serve")
+    serve_parser.add_argument("model")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(PG_CONN_STRING)
+    try:
+        if args.command == "status":
+            print_status(conn)
+        elif args.command == "register":
+            register_model(conn, args.model)
+        elif args.command == "reembed":
+            reembed(conn, args.model, args.rate, args.batch_size, args.threads, args.serve)
+        else:
+            set_serving(conn, args.model)
+    finally:
+        conn.close()
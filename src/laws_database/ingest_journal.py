@@ -0,0 +1,124 @@
+"""
+匯入檢查點與執行報告
+
+- ingest_checkpoints 資料表記錄每個來源檔案 (CSV / PDF) 的每個批次是否已寫入；
+  批次的資料列與檢查點在同一個交易中提交，重新執行 create_vector 時會略過已完成的批次。
+  批次的範圍由 INGEST_BATCH_ROWS 決定，檢查點一併記下批次大小 (batch_rows)，大小不同時拒絕接續匯入。
+- IngestMetrics 統計各階段的筆數與秒數，最後寫成 JSON 執行報告。
+- dedup_stats 統計資料表中 chunk 出現次數與不重複文字數 (見 chunk_texts)。
+"""
+import json
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from psycopg2 import sql
+
+# 每個批次包含的來源列數 (CSV 的列 / PDF 的頁)
+INGEST_BATCH_ROWS = int(os.environ.get("INGEST_BATCH_ROWS", "32"))
+RUNS_DIR = os.path.join(os.path.dirname(__file__), "runs")
+
+
+def completed_batches(conn, table: str, source: str, batch_rows: int | None = INGEST_BATCH_ROWS) -> set[int]:
+    """
+    source 已完成的批次編號。檢查點的批次大小與 batch_rows 不同時 (換了 INGEST_BATCH_ROWS，
+    批次的範圍不同，接續會漏掉或重複寫入資料列) 丟出 ValueError；batch_rows 為 None 時不檢查。
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT batch_no, batch_rows FROM ingest_checkpoints WHERE target_table = %s AND source = %s",
+            (table, source),
+        )
+        rows = cur.fetchall()
+    if batch_rows is not None:
+        sizes = {row[1] for row in rows if row[1] != batch_rows}
+        if sizes:
+            raise ValueError(
+                f"{source} in {table} was checkpointed with batches of {', '.join(str(size) for size in sizes)} rows, "
+                f"not INGEST_BATCH_ROWS={batch_rows}; rerun with the same INGEST_BATCH_ROWS or start over with --fresh"
+            )
+    return {row[0] for row in rows}
+
+
+def record_batch(cur, table: str, source: str, batch_no: int, row_count: int, batch_rows: int | None = INGEST_BATCH_ROWS):
+    """在呼叫端的交易中記錄批次完成 (與批次大小)；由呼叫端與資料列一起 commit。"""
+    cur.execute(
+        "INSERT INTO ingest_checkpoints (target_table, source, batch_no, row_count, batch_rows) "
+        "VALUES (%s, %s, %s, %s, %s) ON CONFLICT (target_table, source, batch_no) DO NOTHING",
+        (table, source, batch_no, row_count, batch_rows),
+    )
+
+
+def journal_rows(conn, table: str) -> int:
+    """所有已完成批次寫入的總筆數 (跨多次執行累計)。"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT COALESCE(SUM(row_count), 0) FROM ingest_checkpoints WHERE target_table = %s", (table,))
+        return int(cur.fetchone()[0])
+
+
+def dedup_stats(conn, table: str) -> dict:
+    """資料表中 chunk 的出現次數、不重複文字數與兩者的比例 (越大代表重複越多)。"""
+    with conn.cursor() as cur:
+        cur.execute(
+            sql.SQL(
+                "SELECT count(*), count(DISTINCT content_hash) FROM {} WHERE content_hash IS NOT NULL"
+            ).format(sql.Identifier(table))
+        )
+        occurrences, unique_texts = cur.fetchone()
+    conn.commit()
+    return {
+        "occurrences": occurrences,
+        "unique_texts": unique_texts,
+        "dedup_ratio": round(occurrences / unique_texts, 3) if unique_texts else None,
+    }
+
+
+class IngestMetrics:
+    """各階段的計數與耗時。stage() 可重複進入，秒數會累加。"""
+
+    def __init__(self):
+        self.started_at = datetime.now(timezone.utc)
+        self.counters = defaultdict(int)
+        self.seconds = defaultdict(float)
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+
+    def add(self, name: str, n: int = 1):
+        self.counters[name] += n
+
+    def report(self, **extra) -> dict:
+        encode_seconds = self.seconds.get("encode", 0.0)
+        write_seconds = self.seconds.get("write", 0.0)
+        chunks = self.counters["chunks_encoded"] + self.counters["chunks_deduplicated"]
+        return {
+            "started_at": self.started_at.isoformat(),
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            **extra,
+            "counters": dict(self.counters),
+            "seconds": {name: round(value, 3) for name, value in self.seconds.items()},
+            "throughput": {
+                "chunks_encoded_per_s": round(self.counters["chunks_encoded"] / encode_seconds, 2) if encode_seconds else None,
+                "rows_written_per_s": round(self.counters["rows_written"] / write_seconds, 2) if write_seconds else None,
+            },
+            # 本次執行中不需重新編碼 (文字已存在) 的 chunk 比例
+            "skipped_encode_ratio": round(self.counters["chunks_deduplicated"] / chunks, 3) if chunks else None,
+        }
+
+    def write(self, path: str | None = None, **extra) -> str:
+        if path is None:
+            os.makedirs(RUNS_DIR, exist_ok=True)
+            path = os.path.join(RUNS_DIR, f"ingest_{self.started_at:%Y%m%d_%H%M%S}.json")
+        report = self.report(**extra)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"[ingest] counters={report['counters']} seconds={report['seconds']}")
+        print(f"[ingest] Run report saved to {path}")
+        return path
@@ -1,5 +1,7 @@
 -- init.sql
 -- 這個腳本會在 PostgreSQL 容器啟動時自動執行。
+-- 這裡只放冪等、不掃描資料的 DDL，create_vector.ensure_schema 每次匯入都會執行；
+-- 會掃描整個資料表的補資料與 HNSW 索引放在 init_migrate.sql，只執行一次 (以 schema_migrations 記錄)。
 
 -- 1. 啟用 pgvector 擴展
 -- 這是讓 PostgreSQL 支援 VECTOR 資料類型和向量運算子的關鍵。
@@ -25,6 +27,9 @@ CREATE TABLE IF NOT EXISTS law_chunks (
 
     -- 片段索引 (如果一條法規被分成多個 Chunk)
     chunk_index INT,
+
+    -- PDF 來源的頁碼 (CSV 來源為 NULL)
+    page_no INT,
     
     -- 實際的法條文本內容 (Text)
     content TEXT NOT NULL,
@@ -34,10 +39,100 @@ CREATE TABLE IF NOT EXISTS law_chunks (
     embedding VECTOR(1024)
 );
 
--- 3. (選做) 建立索引
--- 為了高效的向量相似度搜尋 (k-Nearest Neighbors)，建議在 embedding 欄位上建立索引。
--- HNSW 索引適用於大多數 RAG 應用，提供最佳的性能-準確性權衡。
--- M=16, ef_construction=64 是一組常見的參數。
-CREATE INDEX ON law_chunks USING hnsw (embedding vector_l2_ops) WITH (m = 16, ef_construction = 64);
+-- 舊資料庫 (例如由 law_chunks_backup.sql 還原) 補上新增的欄位
+ALTER TABLE law_chunks ADD COLUMN IF NOT EXISTS page_no INT;
+
+-- 向量只存在 chunk_texts，新寫入的資料列 embedding 為 NULL，檢索只查 law_search 與它的 HNSW 索引；
+-- law_chunks.embedding 上舊的 HNSW 索引已無用途，只會拖慢寫入
+DROP INDEX IF EXISTS law_chunks_embedding_idx;
+
+-- 已匯入的來源檔案 (以內容 SHA-256 辨識)，重複執行 create_vector 時略過
+-- target_table 為寫入的資料表，每個語料版本各自記錄
+CREATE TABLE IF NOT EXISTS ingested_files (
+    sha256 CHAR(64) NOT NULL,
+    target_table TEXT NOT NULL DEFAULT 'law_chunks',
+    filename TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    ingested_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    CONSTRAINT ingested_files_pk PRIMARY KEY (sha256, target_table)
+);
+ALTER TABLE ingested_files ADD COLUMN IF NOT EXISTS target_table TEXT NOT NULL DEFAULT 'law_chunks';
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'ingested_files_pk') THEN
+        ALTER TABLE ingested_files DROP CONSTRAINT IF EXISTS ingested_files_pkey;
+        ALTER TABLE ingested_files ADD CONSTRAINT ingested_files_pk PRIMARY KEY (sha256, target_table);
+    END IF;
+END $$;
+
+-- 匯入檢查點：每個來源檔案的每個批次寫入後記錄一筆 (與資料列同一交易)，
+-- create_vector 中斷後重新執行會略過已完成的批次 (見 ingest_journal.py)
+CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+    target_table TEXT NOT NULL,
+    source TEXT NOT NULL,
+    batch_no INT NOT NULL,
+    row_count INT NOT NULL,
+    completed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (target_table, source, batch_no)
+);
+-- 寫入時的批次大小 (INGEST_BATCH_ROWS)，不同時不能接續；舊的檢查點為 NULL
+ALTER TABLE ingest_checkpoints ADD COLUMN IF NOT EXISTS batch_rows INT;
+
+-- 不重複的 chunk 文字與向量：許多法規有相同的條文 (施行日期、相同的定義)，
+-- 相同文字只編碼、儲存一次；law_chunks 的每一列以 content_hash 對應 (每個出現位置一列)。
+CREATE TABLE IF NOT EXISTS chunk_texts (
+    content_hash CHAR(64) PRIMARY KEY,  -- sha256(content)
+    content TEXT NOT NULL,
+    embedding VECTOR(1024) NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+ALTER TABLE law_chunks ADD COLUMN IF NOT EXISTS content_hash CHAR(64);
+CREATE INDEX IF NOT EXISTS law_chunks_content_hash_idx ON law_chunks (content_hash);
 
--- 或者，如果您擔心建表速度，可以先不建索引，在資料匯入完成後手動建立。
+-- Embedding 模型登錄 (見 embedding_models.py)：主要模型的向量存在 chunk_texts，
+-- 其他模型各自有 chunk_vectors_<模型> 表 (維度依模型而定)；status 為 serving 的模型供 SimilaritySearch 使用
+CREATE TABLE IF NOT EXISTS embedding_models (
+    name TEXT PRIMARY KEY,
+    dim INT NOT NULL,
+    vector_table TEXT NOT NULL UNIQUE,
+    fingerprint CHAR(64),
+    -- registered / complete / serving
+    status TEXT NOT NULL DEFAULT 'registered',
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    completed_at TIMESTAMPTZ
+);
+CREATE UNIQUE INDEX IF NOT EXISTS embedding_models_one_serving ON embedding_models ((true)) WHERE status = 'serving';
+INSERT INTO embedding_models (name, dim, vector_table, status)
+    VALUES ('intfloat/multilingual-e5-large', 1024, 'chunk_texts', 'serving')
+    ON CONFLICT (name) DO NOTHING;
+-- 每一列向量由哪個模型指紋產生 (舊資料為 NULL)
+ALTER TABLE chunk_texts ADD COLUMN IF NOT EXISTS fingerprint CHAR(64);
+
+-- 法規名稱與編號，檢索用的 materialized view 以 law_id 陣列記錄每段文字出現在哪些法規
+CREATE TABLE IF NOT EXISTS laws (
+    law_id SERIAL PRIMARY KEY,
+    law_name TEXT NOT NULL UNIQUE
+);
+
+-- 3. 語料版本 (blue/green)
+-- create_vector 每次重建都寫入新的 law_chunks_v<N> 資料表，建好索引、檢查筆數後
+-- 才把 law_chunks_active 視圖切換過去；舊版本保留，可立即 rollback (見 corpus_versions.py)。
+CREATE TABLE IF NOT EXISTS corpus_versions (
+    version SERIAL PRIMARY KEY,
+    table_name TEXT NOT NULL UNIQUE,
+    -- building / ready / active / failed / dropped
+    status TEXT NOT NULL DEFAULT 'building',
+    row_count INT,
+    note TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    activated_at TIMESTAMPTZ
+);
+
+-- 同一時間只會有一個 active 版本
+CREATE UNIQUE INDEX IF NOT EXISTS corpus_versions_one_active ON corpus_versions ((true)) WHERE status = 'active';
+
+-- 已執行的一次性遷移 (init_migrate.sql 為第 1 版)
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT PRIMARY KEY,
+    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
@@ -0,0 +1,63 @@
+-- init_migrate.sql
+-- 一次性的資料遷移：在 init.sql (只有建立資料表、欄位等 DDL) 之後執行。
+-- 容器第一次啟動時由 docker-entrypoint-initdb.d 執行 (排在 init.sql 之後)；
+-- 既有資料庫 (例如由 law_chunks_backup.sql 還原) 由 create_vector.ensure_schema 在
+-- schema_migrations 沒有第 1 版的紀錄時執行一次。這些語句會掃描整個 law_chunks 或建立 HNSW 索引，
+-- 所以不放在每次匯入都執行的 init.sql。
+
+-- 舊資料 (例如由 law_chunks_backup.sql 還原) 的向量存在每一列中：補上 content_hash 並複製到 chunk_texts
+UPDATE law_chunks SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex')
+    WHERE content_hash IS NULL AND chunk_index IS NOT NULL AND embedding IS NOT NULL;
+INSERT INTO chunk_texts (content_hash, content, embedding)
+    SELECT DISTINCT ON (content_hash) content_hash, content, embedding FROM law_chunks
+    WHERE content_hash IS NOT NULL AND embedding IS NOT NULL
+    ON CONFLICT (content_hash) DO NOTHING;
+
+-- 既有法規的名稱與編號
+INSERT INTO laws (law_name) SELECT DISTINCT law_name FROM law_chunks ON CONFLICT (law_name) DO NOTHING;
+
+-- 檢索用的 materialized view：每段可檢索的不重複文字一列 (排除整條的父資料列與已刪除條文)，
+-- 並有自己的 HNSW 索引；檢索條件不必再過濾，索引掃描的候選全部有效，
+-- 查到的 content_hash 再對應回 law_chunks 中所有的出現位置。
+-- 只放 HNSW 掃描需要的窄欄位 (content_hash、embedding、law_ids)，條文內容只在取回 top-k 時讀取；
+-- 向量以 PLAIN 儲存 (不放到 TOAST)。
+-- create_vector 匯入後會更新 (見 vector_index.build_search_table)。
+DO $$
+BEGIN
+    -- 舊格式 (每個出現位置一列，或含有 content) 的 law_search 需要重建
+    IF to_regclass('law_search') IS NOT NULL AND NOT EXISTS (
+        SELECT 1 FROM pg_attribute WHERE attrelid = to_regclass('law_search') AND attname = 'law_ids'
+    ) THEN
+        DROP MATERIALIZED VIEW law_search CASCADE;
+    END IF;
+    IF to_regclass('law_search') IS NULL THEN
+        CREATE MATERIALIZED VIEW law_search AS
+            SELECT t.content_hash, t.embedding, o.law_ids
+            FROM chunk_texts t
+            JOIN (
+                SELECT c.content_hash, array_agg(DISTINCT l.law_id) AS law_ids
+                FROM law_chunks c JOIN laws l ON l.law_name = c.law_name
+                WHERE c.chunk_index IS NOT NULL AND c.content <> '（刪除）'
+                GROUP BY c.content_hash
+            ) o ON o.content_hash = t.content_hash
+            WITH NO DATA;
+        ALTER MATERIALIZED VIEW law_search ALTER COLUMN embedding SET STORAGE PLAIN;
+        REFRESH MATERIALIZED VIEW law_search;
+    END IF;
+END $$;
+CREATE UNIQUE INDEX IF NOT EXISTS law_search_content_hash_idx ON law_search (content_hash);
+CREATE INDEX IF NOT EXISTS law_search_law_ids_idx ON law_search USING gin (law_ids);
+CREATE INDEX IF NOT EXISTS law_search_embedding_idx ON law_search USING hnsw (embedding vector_l2_ops) WITH (m = 16, ef_construction = 64);
+
+-- 尚未建立任何版本時，law_chunks_active / law_search_active 指向原本的 law_chunks / law_search
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM corpus_versions WHERE status = 'active') THEN
+        DROP VIEW IF EXISTS law_chunks_active;
+        CREATE VIEW law_chunks_active AS SELECT * FROM law_chunks;
+        DROP VIEW IF EXISTS law_search_active;
+        CREATE VIEW law_search_active AS SELECT * FROM law_search;
+    END IF;
+END $$;
+
+INSERT INTO schema_migrations (version) VALUES (1) ON CONFLICT (version) DO NOTHING;
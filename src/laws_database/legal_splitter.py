@@ -0,0 +1,60 @@
+"""
+法條切塊器
+
+- build_char_splitter(): 原本以字元計算長度的切塊器 (500 字、重疊 200 字)
+- build_legal_splitter(): 以 e5 tokenizer 計算長度、依 款/目 結構切分、只保留少量重疊
+
+crawler.crawl_questions 已經把每一「項」存成獨立的一列 (subsection)，
+所以切塊只會發生在同一項之內；法條切塊器優先在「款」(一、二、…)
+與「目」(（一）（二）…) 的換行處切開，盡量不把一款拆成兩半。
+"""
+import re
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+CHAR_SEPARATORS = [
+    "\n\n",           # 1. 結構性分隔 (多於一個換行符)
+    "\n",             # 2. 單行換行符 (段落內換行)
+    "；", ";",          # 3. 分號 (較長的語義單元)
+    "。", "！", "？",  # 4. 中文句尾標點 (降級，除非段落過長才使用)
+    ".\n", "!\n", "?\n",
+    ". ", "! ", "? ", # 5. 英文句尾標點 (注意後接空格)
+    "，", ",",          # 6. 逗號
+    "、",              # 7. 頓號
+    " ",               # 8. 空格
+    ""                 # 9. 最差情況：強制字元切分
+]
+
+_CHINESE_NUMERALS = "一二三四五六七八九十百"
+
+LEGAL_SEPARATORS = [
+    rf"\n(?=[{_CHINESE_NUMERALS}]+、)",               # 款：一、二、…
+    rf"\n(?=[（(][{_CHINESE_NUMERALS}]+[）)])",       # 目：（一）（二）…
+    rf"\n(?=\d+\.)",                                   # 目以下的阿拉伯數字編號
+] + [re.escape(separator) for separator in CHAR_SEPARATORS]
+
+# multilingual-e5 最多 512 個 token，保留 "passage: " 前綴與特殊 token 的空間
+LEGAL_CHUNK_TOKENS = 480
+LEGAL_CHUNK_OVERLAP = 16
+
+
+def build_char_splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        separators=CHAR_SEPARATORS,
+        chunk_size=500, chunk_overlap=200
+    )
+
+
+def build_legal_splitter(
+    tokenizer,
+    chunk_size: int = LEGAL_CHUNK_TOKENS,
+    chunk_overlap: int = LEGAL_CHUNK_OVERLAP,
+) -> RecursiveCharacterTextSplitter:
+    """tokenizer 傳入 embedding 模型的 tokenizer (例如 SentenceTransformer(...).tokenizer)。"""
+    return RecursiveCharacterTextSplitter.from_huggingface_tokenizer(
+        tokenizer,
+        separators=LEGAL_SEPARATORS,
+        is_separator_regex=True,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+    )
@@ -0,0 +1,63 @@
+"""
+PDF 逐頁平行擷取
+
+PDF 以頁為單位切成多個工作，交給 ProcessPoolExecutor 平行擷取文字，
+每頁保留頁碼，讓後續切出的 chunk 能帶著頁碼寫入資料庫。
+這個模組只依賴 pypdf，子行程載入時不會連帶載入 embedding 模型。
+"""
+import hashlib
+import os
+from concurrent.futures import Executor
+
+from pypdf import PdfReader
+
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", os.cpu_count() or 1))
+# 每個工作負責的頁數；太小會讓每個子行程重複解析 PDF 結構的成本變高
+PAGES_PER_TASK = int(os.environ.get("PDF_PAGES_PER_TASK", "8"))
+
+
+def file_sha256(path: str) -> str:
+    """計算檔案內容的 SHA-256，用來判斷 PDF 是否已經匯入過。"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _extract_page_range(path: str, start: int, stop: int) -> list[tuple[int, str]]:
+    """擷取 [start, stop) 頁的文字，回傳 (頁碼, 文字)，頁碼從 1 開始。"""
+    reader = PdfReader(path)
+    pages = []
+    for i in range(start, stop):
+        try:
+            text = reader.pages[i].extract_text() or ""
+        except Exception as e:
+            print(f"Error extracting page {i + 1} of {path}: {e}")
+            text = ""
+        pages.append((i + 1, text))
+    return pages
+
+
+def submit_pdf(executor: Executor, path: str, pages_per_task: int = PAGES_PER_TASK) -> list | None:
+    """
+    把一份 PDF 依頁數切成多個工作送進 executor，回傳 futures（依頁序排列）；
+    無法開啟 (例如檔案損毀) 時印出錯誤並回傳 None，由呼叫端略過這個檔案。
+    """
+    try:
+        number_of_pages = len(PdfReader(path).pages)
+    except Exception as e:
+        print(f"Error reading {path}: {e}")
+        return None
+    return [
+        executor.submit(_extract_page_range, path, start, min(start + pages_per_task, number_of_pages))
+        for start in range(0, number_of_pages, pages_per_task)
+    ]
+
+
+def collect_pages(futures: list) -> list[tuple[int, str]]:
+    """等待 submit_pdf 的結果並依頁序合併。"""
+    pages = []
+    for future in futures:
+        pages.extend(future.result())
+    return pages
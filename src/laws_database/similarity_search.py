@@ -27,25 +27,103 @@ PG_CONN_STRING = (
 LLM_MODEL = os.environ.get("LLM_MODEL", "gpt-oss:20b")
 
 # ------------------ Load Embedding Model ------------------
-MODEL_NAME = "intfloat/multilingual-e5-large"
+try:
+    from .embedding_models import (MODEL_NAME, PRIMARY_VECTOR_TABLE, coverage, resolve_model, serving_model,
+                                   vector_table)
+except ImportError:
+    from embedding_models import (MODEL_NAME, PRIMARY_VECTOR_TABLE, coverage, resolve_model, serving_model,
+                                  vector_table)
+
+# 指定時強制使用該模型 (別名如 e5-small 或完整名稱)；否則使用 embedding_models 中 serving 的模型
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL")
 
 AUTO_ADD_LAW = False if os.environ.get("AUTO_ADD_LAW", "0") == "0" else True
 
+# 設定快照目錄 (見 snapshot.py) 時，改用記憶體索引檢索，不連線 PostgreSQL
+LAW_SNAPSHOT = os.environ.get("LAW_SNAPSHOT")
+
 if AUTO_ADD_LAW:
     from .add_single_law import add_single_law
 
 class SimilaritySearch:
-    def __init__(self):
+    def __init__(self, snapshot_dir: str | None = LAW_SNAPSHOT, model_name: str | None = EMBEDDING_MODEL):
+        self.memory_index = None
+        self.table = None
+        if snapshot_dir:
+            # 快照只含主要模型的向量
+            self.model_name, self.vector_table = MODEL_NAME, PRIMARY_VECTOR_TABLE
+        elif model_name:
+            self.model_name = resolve_model(model_name)[0]
+            self.vector_table = vector_table(self.model_name)
+        else:
+            self.model_name, self.vector_table = self._serving_model()
         self.model = SentenceTransformer(
-            MODEL_NAME,
+            self.model_name,
             tokenizer_kwargs={"padding_side": "left"},
         )
+        if snapshot_dir:
+            try:
+                from .snapshot import InMemoryIndex
+            except ImportError:
+                from snapshot import InMemoryIndex
+            self.memory_index = InMemoryIndex.load(snapshot_dir)
+            print(f"[SimilaritySearch] Loaded in-memory index from {snapshot_dir} ({len(self.memory_index.metadata)} chunks)")
     
+    @staticmethod
+    def _serving_model() -> tuple[str, str]:
+        """
+        embedding_models 中 serving 的模型；其向量尚未涵蓋目前上線的語料
+        (例如剛切換了新版本、還沒重新執行 reembed) 或資料庫無法連線時使用主要模型。
+        """
+        try:
+            conn = psycopg2.connect(PG_CONN_STRING)
+        except psycopg2.Error as e:
+            print(f"[SimilaritySearch] Cannot read embedding_models ({e}), using {MODEL_NAME}")
+            return MODEL_NAME, PRIMARY_VECTOR_TABLE
+        try:
+            model_name, table = serving_model(conn)
+            if table != PRIMARY_VECTOR_TABLE:
+                covered, needed = coverage(conn, model_name)
+                if covered < needed:
+                    print(f"[SimilaritySearch] {model_name} covers {covered}/{needed} texts, using {MODEL_NAME}")
+                    return MODEL_NAME, PRIMARY_VECTOR_TABLE
+            return model_name, table
+        except psycopg2.Error as e:
+            print(f"[SimilaritySearch] Cannot read embedding_models ({e}), using {MODEL_NAME}")
+            return MODEL_NAME, PRIMARY_VECTOR_TABLE
+        finally:
+            conn.close()
+
+    def _search_table(self, cur) -> str:
+        """
+        檢索的資料表：law_search_active 視圖指向目前上線語料版本的檢索用 materialized view，
+        其中每段可檢索的不重複文字一列 (見 vector_index.build_search_table)，不需再加過濾條件。
+        只由 law_chunks_backup.sql 還原、尚未執行 init_migrate.sql 的資料庫則直接查 law_chunks 並過濾。
+        """
+        if self.table is None:
+            cur.execute("SELECT to_regclass('law_search_active') IS NOT NULL")
+            self.table = "law_search_active" if cur.fetchone()[0] else "law_chunks"
+        return self.table
+
     # ------------------ Query Function ------------------
     def query_top_k_law_chunks(self, query: str, top_k: int = 5, law_name_filter: str | None = None) -> list[tuple]:
-        """Return top-k most relevant law chunks, optionally filtered by an exact law_name."""
+        """
+        Return the top-k most relevant law chunks, optionally filtered by an exact law_name.
+        Identical chunk text is searched once, and every occurrence of a matching text is returned,
+        so the result can hold more than top_k rows.
+        """
         # Compute embedding of the query
-        query_embedding = self.model.encode(["query: "+query])[0]
+        query_embedding = self.encode_queries([query])[0]
+        return self.query_by_embedding(query_embedding, top_k, law_name_filter)
+
+    def encode_queries(self, queries: list[str], batch_size: int = 32):
+        """一次編碼多個查詢 (加上 e5 的 "query: " 前綴)。"""
+        return self.model.encode(["query: " + query for query in queries], batch_size=batch_size)
+
+    def query_by_embedding(self, query_embedding, top_k: int = 5, law_name_filter: str | None = None) -> list[tuple]:
+        """與 query_top_k_law_chunks 相同，但使用已編碼的查詢向量 (批次編碼時使用)。"""
+        if self.memory_index is not None:
+            return self.memory_index.query(query_embedding, top_k, law_name_filter)
         embedding_str = str(query_embedding.tolist())  # convert to PostgreSQL array format
 
         # Connect to PostgreSQL
@@ -54,24 +132,63 @@ class SimilaritySearch:
 
         # pgvector similarity search
         # --- 動態建立 SQL ---
-        base_sql = """
-        SELECT id, law_name, chapter, article_no, subsection_no, chunk_index, content, embedding
-        FROM law_chunks
-        WHERE chunk_index IS NOT NULL
-        AND content <> '（刪除）'
-        """
-        
         # 使用參數化查詢來避免 SQL 注入
-        params = []
-        
-        if law_name_filter:
-            base_sql += " AND law_name = %s"
-            params.append(law_name_filter)
-            # params.append(f"%{law_name_filter}%")  # 法規名稱過濾改成模糊比對（避免 0 筆結果）
-            # print(f"[SimilaritySearch] Applying filter: law_name = {law_name_filter}")
-
-        base_sql += " ORDER BY embedding <-> %s::vector LIMIT %s;"
-        params.extend([embedding_str, top_k])
+        if self._search_table(cur) == "law_chunks":
+            base_sql = """
+            SELECT id, law_name, chapter, article_no, subsection_no, chunk_index, content, embedding
+            FROM law_chunks
+            WHERE chunk_index IS NOT NULL
+            AND content <> '（刪除）'
+            """
+            params = []
+            if law_name_filter:
+                base_sql += " AND law_name = %s"
+                params.append(law_name_filter)
+            base_sql += " ORDER BY embedding <-> %s::vector LIMIT %s;"
+            params.extend([embedding_str, top_k])
+        else:
+            # 先在不重複的文字中找出 top-k，再對應回所有出現位置。
+            # 其他模型的向量表可能含有已下線版本的文字：在取 top-k 之前就只留目前可檢索的文字，
+            # 否則對應出現位置時被排除，回傳的文字會少於 top_k。
+            vectors = "law_search_active" if self.vector_table == PRIMARY_VECTOR_TABLE else self.vector_table
+            hits_filter = ""
+            occurrence_filter = ""
+            params = [embedding_str]
+            if law_name_filter and vectors == "law_search_active":
+                # law_ids 在窄的檢索 view 中，不需再讀 law_chunks
+                hits_filter = "WHERE law_ids @> ARRAY[(SELECT law_id FROM laws WHERE law_name = %s)]"
+                params.append(law_name_filter)
+            elif law_name_filter:
+                hits_filter = """WHERE content_hash IN (
+                    SELECT content_hash FROM law_chunks_active
+                    WHERE law_name = %s AND chunk_index IS NOT NULL AND content <> '（刪除）'
+                )"""
+                params.append(law_name_filter)
+            elif vectors != "law_search_active":
+                # law_search_active 只有目前版本可檢索的文字 (content_hash 有唯一索引)
+                hits_filter = "WHERE content_hash IN (SELECT content_hash FROM law_search_active)"
+            params.extend([embedding_str, top_k])
+            if law_name_filter:
+                occurrence_filter = "AND c.law_name = %s"
+                params.append(law_name_filter)
+                # params.append(f"%{law_name_filter}%")  # 法規名稱過濾改成模糊比對（避免 0 筆結果）
+                # print(f"[SimilaritySearch] Applying filter: law_name = {law_name_filter}")
+            base_sql = f"""
+            WITH hits AS (
+                SELECT content_hash, embedding, embedding <-> %s::vector AS distance
+                FROM {vectors}
+                {hits_filter}
+                ORDER BY embedding <-> %s::vector
+                LIMIT %s
+            )
+            SELECT c.id, c.law_name, c.chapter, c.article_no, c.subsection_no, c.chunk_index, c.content, h.embedding
+            FROM hits h
+            JOIN law_chunks_active c ON c.content_hash = h.content_hash
+            WHERE c.chunk_index IS NOT NULL
+            AND c.content <> '（刪除）'
+            {occurrence_filter}
+            ORDER BY h.distance, c.law_name, c.id;
+            """
         
         cur.execute(base_sql, tuple(params)) # 確保 params 是 tuple
         # --- SQL 建立結束 ---
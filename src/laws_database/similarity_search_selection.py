@@ -27,7 +27,10 @@ PG_CONN_STRING = (
 LLM_MODEL = os.environ.get("LLM_MODEL", "gpt-oss:20b")
 
 # ------------------ Load Embedding Model ------------------
-MODEL_NAME = "intfloat/multilingual-e5-large"
+try:
+    from .embedding_models import MODEL_NAME
+except ImportError:
+    from embedding_models import MODEL_NAME
 
 AUTO_ADD_LAW = False if os.environ.get("AUTO_ADD_LAW", "0") == "0" else True
 
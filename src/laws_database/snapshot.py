@@ -0,0 +1,302 @@
+"""
+law_chunks 快照匯出 / 匯入
+
+pg_dump 產生的 law_chunks_backup.sql 以 SQL 文字重播，還原慢、也難以比對差異。
+快照改存成：
+
+    <dir>/metadata.parquet   除了向量以外的所有欄位，vector_row 指向 vectors.npy 的列 (無向量為 null)；
+                             相同文字 (content_hash) 的列共用同一個 vector_row
+    <dir>/vectors.npy        float16 的向量陣列，形狀 (不重複文字數, 維度)
+    <dir>/manifest.json      模型名稱、維度、列數與各檔案的 SHA-256
+
+用法：
+
+    python snapshot.py export ./snapshot                              # 匯出 law_chunks_active
+    python snapshot.py import ./snapshot                              # 匯入成新的語料版本並切換上線
+    python snapshot.py import ./snapshot --table law_chunks --truncate  # 匯入指定資料表 (先清空)
+
+或在程式中以 InMemoryIndex.load("./snapshot") 直接載入成記憶體索引，不需要 Postgres。
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import psycopg2
+from psycopg2 import sql
+
+try:
+    from .corpus_versions import ACTIVE_VIEW, activate_version, create_version, mark_failed, prune_versions, validate_version
+    from .create_vector import MODEL_NAME, PG_CONN_STRING, ensure_schema
+    from .vector_index import build_search_table, drop_vector_index
+except ImportError:
+    from corpus_versions import ACTIVE_VIEW, activate_version, create_version, mark_failed, prune_versions, validate_version
+    from create_vector import MODEL_NAME, PG_CONN_STRING, ensure_schema
+    from vector_index import build_search_table, drop_vector_index
+
+METADATA_COLUMNS = ["id", "law_name", "chapter", "article_no", "subsection_no", "chunk_index", "page_no", "content", "content_hash"]
+# 2：加入 content_hash，相同文字共用向量；仍可讀取 1 版的快照
+SNAPSHOT_FORMAT_VERSION = 2
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def export_snapshot(conn, out_dir: str, table: str = ACTIVE_VIEW, batch_size: int = 5000) -> dict:
+    """
+    以 server-side cursor 串流讀出 table，寫成 Parquet + .npy + manifest，回傳 manifest。
+    向量來自 chunk_texts (以 content_hash 對應)；舊資料列中的向量也會一併匯出。
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+    ensure_schema(conn)
+
+    records = []
+    vectors = []
+    vector_rows = {}  # content_hash -> vector_row
+    with conn.cursor(name="snapshot_export") as cur:
+        cur.itersize = batch_size
+        cur.execute(
+            sql.SQL(
+                "SELECT {}, COALESCE(c.embedding, t.embedding)::real[] FROM {} t "
+                "LEFT JOIN chunk_texts c ON c.content_hash = t.content_hash ORDER BY t.id"
+            ).format(
+                sql.SQL(", ").join(sql.Identifier("t", column) for column in METADATA_COLUMNS),
+                sql.Identifier(table),
+            )
+        )
+        for row in cur:
+            record = dict(zip(METADATA_COLUMNS, row[:-1]))
+            embedding = row[-1]
+            if embedding is None:
+                record["vector_row"] = None
+            elif record["content_hash"] in vector_rows:
+                record["vector_row"] = vector_rows[record["content_hash"]]
+            else:
+                record["vector_row"] = len(vectors)
+                if record["content_hash"]:
+                    vector_rows[record["content_hash"]] = len(vectors)
+                vectors.append(np.asarray(embedding, dtype=np.float16))
+            records.append(record)
+    conn.commit()
+
+    metadata = pd.DataFrame.from_records(records, columns=METADATA_COLUMNS + ["vector_row"])
+    for column in ["subsection_no", "chunk_index", "page_no", "vector_row"]:
+        metadata[column] = metadata[column].astype("Int32")
+    metadata["id"] = metadata["id"].str.strip()
+    metadata["content_hash"] = metadata["content_hash"].str.strip()
+
+    dim = len(vectors[0]) if vectors else 0
+    vector_array = np.vstack(vectors) if vectors else np.zeros((0, dim), dtype=np.float16)
+
+    metadata_path = os.path.join(out_dir, "metadata.parquet")
+    vectors_path = os.path.join(out_dir, "vectors.npy")
+    metadata.to_parquet(metadata_path, index=False)
+    np.save(vectors_path, vector_array)
+
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "model_name": MODEL_NAME,
+        "dim": dim,
+        "dtype": "float16",
+        "rows": len(metadata),
+        "vectors": len(vector_array),
+        "source_table": table,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "files": {
+            "metadata.parquet": _sha256(metadata_path),
+            "vectors.npy": _sha256(vectors_path),
+        },
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    print(f"[snapshot] Exported {manifest['rows']} rows ({manifest['vectors']} vectors) to {out_dir} in {time.perf_counter() - start:.1f}s")
+    return manifest
+
+
+def read_snapshot(snapshot_dir: str, verify: bool = True, expected_model: str | None = MODEL_NAME) -> tuple[dict, pd.DataFrame, np.ndarray]:
+    """讀取快照並檢查 checksum 與模型名稱，回傳 (manifest, metadata, vectors)。"""
+    with open(os.path.join(snapshot_dir, "manifest.json"), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") not in (1, SNAPSHOT_FORMAT_VERSION):
+        raise ValueError(f"Unsupported snapshot format: {manifest.get('format_version')}")
+    if expected_model and manifest["model_name"] != expected_model:
+        raise ValueError(f"Snapshot was embedded with {manifest['model_name']}, expected {expected_model}")
+    if verify:
+        for filename, checksum in manifest["files"].items():
+            if _sha256(os.path.join(snapshot_dir, filename)) != checksum:
+                raise ValueError(f"Checksum mismatch for {filename}")
+
+    metadata = pd.read_parquet(os.path.join(snapshot_dir, "metadata.parquet"))
+    vectors = np.load(os.path.join(snapshot_dir, "vectors.npy"))
+    if len(metadata) != manifest["rows"] or len(vectors) != manifest["vectors"]:
+        raise ValueError("Snapshot row counts do not match the manifest")
+    if "content_hash" not in metadata.columns:
+        # 1 版的快照：每個有向量的列各自一個 vector_row
+        metadata["content_hash"] = [
+            hashlib.sha256(content.encode("utf-8")).hexdigest() if pd.notna(vector_row) else None
+            for content, vector_row in zip(metadata["content"], metadata["vector_row"])
+        ]
+    return manifest, metadata, vectors
+
+
+def _format_vector(vector: np.ndarray) -> str:
+    return "[" + ",".join(map(repr, vector.astype(np.float32).tolist())) + "]"
+
+
+def import_snapshot(conn, snapshot_dir: str, table: str | None = None, truncate: bool = False, batch_size: int = 5000, verify: bool = True):
+    """
+    以 COPY 將快照批次寫入 table (向量寫入 chunk_texts)，匯入期間先移除 HNSW 索引，
+    寫完後建立 / 更新檢索用的 materialized view 與其索引 (見 vector_index.py)。
+    未指定 table 時建立新的語料版本，檢查筆數後切換上線 (見 corpus_versions.py)。
+    """
+    manifest, metadata, vectors = read_snapshot(snapshot_dir, verify=verify)
+    ensure_schema(conn)
+    if table is None:
+        version, table = create_version(conn, note=f"snapshot {snapshot_dir}")
+        try:
+            _copy_snapshot(conn, table, manifest, metadata, vectors, batch_size)
+            build_search_table(conn, table)
+            validate_version(conn, version, manifest["rows"])
+        except BaseException as e:
+            mark_failed(conn, version, f"{type(e).__name__}: {e}")
+            raise
+        activate_version(conn, version)
+        prune_versions(conn)
+        return
+
+    drop_vector_index(conn, table)
+    if truncate:
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("TRUNCATE {}").format(sql.Identifier(table)))
+        conn.commit()
+    _copy_snapshot(conn, table, manifest, metadata, vectors, batch_size)
+    build_search_table(conn, table)
+
+
+def _copy_rows(cur, copy_sql, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for values in rows:
+        # COPY csv 格式中未加引號的空欄位代表 NULL
+        writer.writerow(["" if v is None else v for v in values])
+    buffer.seek(0)
+    cur.copy_expert(copy_sql, buffer)
+
+
+def _copy_snapshot(conn, table: str, manifest: dict, metadata: pd.DataFrame, vectors: np.ndarray, batch_size: int):
+    start = time.perf_counter()
+    copy_sql = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL (content))").format(
+        sql.Identifier(table),
+        sql.SQL(", ").join(map(sql.Identifier, METADATA_COLUMNS)),
+    )
+    # 不重複的文字與向量先寫入暫存表，再併入 chunk_texts (已存在的 content_hash 略過)
+    texts = metadata[metadata["vector_row"].notna()].drop_duplicates("content_hash")
+    with conn.cursor() as cur:
+        for offset in range(0, len(metadata), batch_size):
+            _copy_rows(cur, copy_sql, (
+                [None if pd.isna(getattr(record, c)) else getattr(record, c) for c in METADATA_COLUMNS]
+                for record in metadata.iloc[offset:offset + batch_size].itertuples(index=False)
+            ))
+        cur.execute("CREATE TEMP TABLE snapshot_texts (LIKE chunk_texts INCLUDING DEFAULTS) ON COMMIT DROP")
+        texts_copy_sql = "COPY snapshot_texts (content_hash, content, embedding) FROM STDIN WITH (FORMAT csv)"
+        for offset in range(0, len(texts), batch_size):
+            _copy_rows(cur, texts_copy_sql, (
+                [record.content_hash, record.content, _format_vector(vectors[int(record.vector_row)])]
+                for record in texts.iloc[offset:offset + batch_size].itertuples(index=False)
+            ))
+        cur.execute(
+            "INSERT INTO chunk_texts (content_hash, content, embedding) "
+            "SELECT content_hash, content, embedding FROM snapshot_texts ON CONFLICT (content_hash) DO NOTHING"
+        )
+    conn.commit()
+    print(
+        f"[snapshot] Copied {manifest['rows']} rows ({len(texts)} unique texts) into {table} "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+
+
+class InMemoryIndex:
+    """
+    將快照載入記憶體的精確 (暴力) L2 搜尋索引。
+    query() 回傳的 tuple 與 SimilaritySearch.query_top_k_law_chunks 相同：
+    (id, law_name, chapter, article_no, subsection_no, chunk_index, content, embedding)
+    """
+
+    def __init__(self, metadata: pd.DataFrame, vectors: np.ndarray):
+        # 與資料庫查詢相同的條件：只搜尋有向量的 chunk，排除已刪除條文
+        searchable = metadata[
+            metadata["vector_row"].notna() & metadata["chunk_index"].notna() & (metadata["content"] != "（刪除）")
+        ]
+        self.metadata = searchable.reset_index(drop=True)
+        # 相同文字共用 vector_row，每個不重複的向量只計算一次距離
+        self.vector_rows = np.unique(self.metadata["vector_row"].astype(int).to_numpy())
+        self.vectors = vectors[self.vector_rows].astype(np.float32)
+        self._sq_norms = (self.vectors ** 2).sum(axis=1)
+        # metadata 每一列對應到 self.vectors 的位置
+        self._row_vector = np.searchsorted(self.vector_rows, self.metadata["vector_row"].astype(int).to_numpy())
+
+    @classmethod
+    def load(cls, snapshot_dir: str, verify: bool = True) -> "InMemoryIndex":
+        _, metadata, vectors = read_snapshot(snapshot_dir, verify=verify)
+        return cls(metadata, vectors)
+
+    def query(self, query_embedding: np.ndarray, top_k: int = 5, law_name_filter: str | None = None) -> list[tuple]:
+        """找出最接近的 top_k 個不重複文字，回傳它們的所有出現位置 (可能多於 top_k 列)。"""
+        rows = np.arange(len(self.metadata))
+        if law_name_filter:
+            rows = rows[(self.metadata["law_name"] == law_name_filter).to_numpy()]
+        candidates = np.unique(self._row_vector[rows])
+        if len(candidates) == 0:
+            return []
+        query_embedding = np.asarray(query_embedding, dtype=np.float32)
+        distances = self._sq_norms[candidates] - 2 * self.vectors[candidates] @ query_embedding
+        k = min(top_k, len(candidates))
+        nearest = np.argpartition(distances, k)[:k] if k < len(candidates) else np.arange(k)
+        top = candidates[nearest[np.argsort(distances[nearest])]]
+
+        # 依距離排序，同一段文字的出現位置依 metadata 原本的順序 (匯出時依 id 排序)
+        rank = np.full(len(self.vectors), len(top))
+        rank[top] = np.arange(len(top))
+        rows = rows[rank[self._row_vector[rows]] < len(top)]
+        hits = rows[np.argsort(rank[self._row_vector[rows]], kind="stable")]
+        results = []
+        for i in hits:
+            row = self.metadata.iloc[i]
+            values = []
+            for c in ["id", "law_name", "chapter", "article_no", "subsection_no", "chunk_index", "content"]:
+                value = row[c]
+                values.append(None if pd.isna(value) else (value.item() if hasattr(value, "item") else value))
+            results.append(tuple(values) + (self.vectors[self._row_vector[i]],))
+        return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export / import law_chunks as Parquet + float16 .npy snapshots")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("directory")
+    parser.add_argument("--table", default=None, help=f"export: defaults to {ACTIVE_VIEW}; import: defaults to a new corpus version")
+    parser.add_argument("--truncate", action="store_true", help="import with --table: empty the table first")
+    parser.add_argument("--no-verify", action="store_true", help="import: skip checksum verification")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(PG_CONN_STRING)
+    try:
+        if args.command == "export":
+            export_snapshot(conn, args.directory, args.table or ACTIVE_VIEW)
+        else:
+            import_snapshot(conn, args.directory, args.table, truncate=args.truncate, verify=not args.no_verify)
+    finally:
+        conn.close()
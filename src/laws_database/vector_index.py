@@ -0,0 +1,273 @@
+"""
+HNSW 向量索引管理
+
+大量匯入時，每插入一筆資料都要同步維護 HNSW 索引，速度很慢。
+這裡提供「先移除索引、匯入完再重建」所需的函式，以及隨時重建索引的 CLI：
+
+    python vector_index.py build      # 索引不存在時建立
+    python vector_index.py rebuild    # 移除後重新建立
+    python vector_index.py drop       # 僅移除
+    python vector_index.py search --table law_chunks_v3   # 建立 / 更新檢索用的 law_search_v3
+    python vector_index.py refresh --table law_chunks_v3  # 不移除索引，以 REFRESH CONCURRENTLY 更新 law_search_v3
+
+檢索時的條件 chunk_index IS NOT NULL AND content <> '（刪除）' 無法由 HNSW 索引使用，
+索引掃描找到的候選常常是整條的父資料列或已刪除條文，被過濾後剩下不到 top_k 筆。
+因此另外建立只含可檢索 chunk 的 materialized view (law_chunks → law_search、
+law_chunks_v<N> → law_search_v<N>)，並在其上建立自己的 HNSW 索引。
+
+相同文字的 chunk 只在 chunk_texts 存一份向量，materialized view 也以 content_hash
+為單位 (每段不重複的文字一列)，檢索後再以 content_hash 對應回所有出現位置。
+
+materialized view 只放 HNSW 掃描需要的欄位 (content_hash、embedding、出現的法規 law_ids)，
+條文內容與其他元數據留在 law_chunks_v<N>，只在取回最後 top-k 時讀取；
+向量以 PLAIN 儲存，避免每個候選都要多讀一次 TOAST。效果可用 bench_storage.py 比較。
+"""
+import argparse
+import os
+import time
+
+import psycopg2
+from psycopg2 import sql
+
+PG_HOST = os.environ.get("PG_HOST", "localhost")
+PG_PORT = os.environ.get("PG_PORT", "5432")
+PG_DATABASE = os.environ.get("PG_DATABASE", "lawdb")
+PG_USER = os.environ.get("PG_USER", "postgres")
+PG_PASSWORD = os.environ.get("PG_PASSWORD", "postgres")
+
+PG_CONN_STRING = (
+    f"dbname={PG_DATABASE} user={PG_USER} password={PG_PASSWORD} "
+    f"host={PG_HOST} port={PG_PORT}"
+)
+
+# 與 init_migrate.sql 中的索引設定一致
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 64
+
+# 建索引時使用的平行 worker 數與記憶體 (pgvector >= 0.6 支援平行建立 HNSW)
+# maintenance_work_mem 需大於索引大小，否則建到一半會退回較慢的磁碟模式
+MAINTENANCE_WORKERS = int(os.environ.get("PG_MAINTENANCE_WORKERS", "4"))
+MAINTENANCE_WORK_MEM = os.environ.get("PG_MAINTENANCE_WORK_MEM", "1GB")
+
+
+# 可檢索的文字：至少有一處出現位置是 chunk (不是整條的父資料列) 且不是已刪除條文；
+# law_ids 為這段文字出現過的法規 (laws.law_id)，供 law_name 過濾使用
+SEARCH_QUERY = """
+SELECT t.content_hash, t.embedding, o.law_ids
+FROM chunk_texts t
+JOIN (
+    SELECT c.content_hash, array_agg(DISTINCT l.law_id) AS law_ids
+    FROM {} c JOIN laws l ON l.law_name = c.law_name
+    WHERE c.chunk_index IS NOT NULL AND c.content <> '（刪除）'
+    GROUP BY c.content_hash
+) o ON o.content_hash = t.content_hash
+"""
+
+# 舊資料表 (例如由 law_chunks_backup.sql 還原) 的向量存在每一列中：
+# 補上 content_hash，並把向量複製到 chunk_texts (與 init_migrate.sql 對 law_chunks 做的相同)
+BACKFILL_STATEMENTS = [
+    "ALTER TABLE {} ADD COLUMN IF NOT EXISTS content_hash CHAR(64)",
+    "UPDATE {} SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex') "
+    "WHERE content_hash IS NULL AND chunk_index IS NOT NULL AND embedding IS NOT NULL",
+    "INSERT INTO chunk_texts (content_hash, content, embedding) "
+    "SELECT DISTINCT ON (content_hash) content_hash, content, embedding FROM {} "
+    "WHERE content_hash IS NOT NULL AND embedding IS NOT NULL "
+    "ON CONFLICT (content_hash) DO NOTHING",
+    "INSERT INTO laws (law_name) SELECT DISTINCT law_name FROM {} ON CONFLICT (law_name) DO NOTHING",
+]
+
+
+def search_table(table: str = "law_chunks") -> str:
+    """資料表對應的檢索用 materialized view 名稱：law_chunks_v3 → law_search_v3"""
+    return table.replace("law_chunks", "law_search", 1)
+
+
+def has_search_table(conn, table: str = "law_chunks") -> bool:
+    """table 的檢索用 materialized view 是否存在且為目前的格式 (以 content_hash 為單位、只含 law_ids 等窄欄位)。"""
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_attribute WHERE attrelid = to_regclass(%s) AND attname = 'law_ids')",
+            (search_table(table),),
+        )
+        exists = cur.fetchone()[0]
+    conn.commit()
+    return exists
+
+
+def backfill_content_hash(conn, table: str = "law_chunks"):
+    with conn.cursor() as cur:
+        for statement in BACKFILL_STATEMENTS:
+            cur.execute(sql.SQL(statement).format(sql.Identifier(table)))
+        cur.execute(
+            sql.SQL("CREATE INDEX IF NOT EXISTS {} ON {} (content_hash)").format(
+                sql.Identifier(f"{table}_content_hash_idx"), sql.Identifier(table)
+            )
+        )
+    conn.commit()
+
+
+def index_name(table: str = "law_chunks") -> str:
+    """PostgreSQL 預設的索引命名方式：<table>_<column>_idx"""
+    return f"{table}_embedding_idx"
+
+
+def drop_vector_index(conn, table: str = "law_chunks"):
+    """移除 embedding 欄位上的 HNSW 索引（不存在時略過）。"""
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("DROP INDEX IF EXISTS {}").format(sql.Identifier(index_name(table))))
+    conn.commit()
+    print(f"[vector_index] Dropped index {index_name(table)}")
+
+
+def build_vector_index(
+    conn,
+    table: str = "law_chunks",
+    workers: int = MAINTENANCE_WORKERS,
+    maintenance_work_mem: str = MAINTENANCE_WORK_MEM,
+) -> float:
+    """
+    在 embedding 欄位上建立 HNSW 索引，回傳建立所花的秒數。
+
+    SET LOCAL 只影響這個交易，不會改到連線之後的設定。
+    """
+    start = time.perf_counter()
+    with conn.cursor() as cur:
+        cur.execute("SET LOCAL maintenance_work_mem = %s", (maintenance_work_mem,))
+        cur.execute("SET LOCAL max_parallel_maintenance_workers = %s", (workers,))
+        cur.execute(
+            sql.SQL(
+                "CREATE INDEX IF NOT EXISTS {} ON {} USING hnsw (embedding vector_l2_ops) "
+                "WITH (m = {}, ef_construction = {})"
+            ).format(
+                sql.Identifier(index_name(table)),
+                sql.Identifier(table),
+                sql.Literal(HNSW_M),
+                sql.Literal(HNSW_EF_CONSTRUCTION),
+            )
+        )
+        cur.execute("SELECT pg_size_pretty(pg_relation_size(%s::regclass))", (index_name(table),))
+        size = cur.fetchone()[0]
+    conn.commit()
+    elapsed = time.perf_counter() - start
+    print(
+        f"[vector_index] Built {index_name(table)} in {elapsed:.1f}s "
+        f"(workers={workers}, maintenance_work_mem={maintenance_work_mem}, size={size})"
+    )
+    return elapsed
+
+
+def rebuild_vector_index(
+    conn,
+    table: str = "law_chunks",
+    workers: int = MAINTENANCE_WORKERS,
+    maintenance_work_mem: str = MAINTENANCE_WORK_MEM,
+) -> float:
+    drop_vector_index(conn, table)
+    return build_vector_index(conn, table, workers, maintenance_work_mem)
+
+
+def build_search_table(
+    conn,
+    table: str = "law_chunks",
+    workers: int = MAINTENANCE_WORKERS,
+    maintenance_work_mem: str = MAINTENANCE_WORK_MEM,
+) -> float:
+    """
+    建立 (或重新整理) table 的檢索用 materialized view 並建立其 HNSW 索引，回傳所花的秒數。
+    已存在時 (例如 law_search_active 視圖正指向它) 以 REFRESH 更新，先移除索引以便之後平行重建；
+    舊格式 (每個出現位置一列、或含有條文內容) 的 materialized view 會先刪除再重建。
+    """
+    start = time.perf_counter()
+    search = search_table(table)
+    backfill_content_hash(conn, table)
+    exists = has_search_table(conn, table)
+    if exists:
+        drop_vector_index(conn, search)
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("REFRESH MATERIALIZED VIEW {}").format(sql.Identifier(search)))
+    else:
+        with conn.cursor() as cur:
+            # CASCADE：指向舊格式的 law_search_active 視圖會在 activate_version 時重建
+            cur.execute(sql.SQL("DROP MATERIALIZED VIEW IF EXISTS {} CASCADE").format(sql.Identifier(search)))
+            # 先建立空的 view 設定向量的儲存方式，再 REFRESH 寫入資料
+            cur.execute(
+                sql.SQL("CREATE MATERIALIZED VIEW {} AS " + SEARCH_QUERY + " WITH NO DATA").format(
+                    sql.Identifier(search), sql.Identifier(table)
+                )
+            )
+            cur.execute(
+                sql.SQL("ALTER MATERIALIZED VIEW {} ALTER COLUMN embedding SET STORAGE PLAIN").format(
+                    sql.Identifier(search)
+                )
+            )
+            cur.execute(sql.SQL("REFRESH MATERIALIZED VIEW {}").format(sql.Identifier(search)))
+            cur.execute(
+                sql.SQL("CREATE UNIQUE INDEX {} ON {} (content_hash)").format(
+                    sql.Identifier(f"{search}_content_hash_idx"), sql.Identifier(search)
+                )
+            )
+            cur.execute(
+                sql.SQL("CREATE INDEX {} ON {} USING gin (law_ids)").format(
+                    sql.Identifier(f"{search}_law_ids_idx"), sql.Identifier(search)
+                )
+            )
+    conn.commit()
+    build_vector_index(conn, search, workers, maintenance_work_mem)
+    elapsed = time.perf_counter() - start
+    print(f"[vector_index] {'Refreshed' if exists else 'Created'} {search} from {table} in {elapsed:.1f}s")
+    return elapsed
+
+
+def refresh_search_table(conn, table: str = "law_chunks", law_names: list[str] | None = None) -> float:
+    """
+    少量新增 (例如 add_single_law) 後更新 table 的檢索用 materialized view，回傳所花的秒數。
+    以 REFRESH ... CONCURRENTLY (依 content_hash 唯一索引比對差異) 更新：過程中檢索照常讀取，
+    HNSW 索引保留並只加入有變動的列。大量匯入仍用 build_search_table (移除索引、重新整理後平行重建)。
+    law_names 為新增的法規 (加入 laws 才會出現在 law_ids)，None 時取 table 中所有的法規。
+    view 不存在或為舊格式時改用 build_search_table 建立。
+    """
+    if not has_search_table(conn, table):
+        return build_search_table(conn, table)
+    start = time.perf_counter()
+    search = search_table(table)
+    with conn.cursor() as cur:
+        if law_names is None:
+            cur.execute(
+                sql.SQL("INSERT INTO laws (law_name) SELECT DISTINCT law_name FROM {} ON CONFLICT (law_name) DO NOTHING").format(
+                    sql.Identifier(table)
+                )
+            )
+        else:
+            cur.execute(
+                "INSERT INTO laws (law_name) SELECT unnest(%s::text[]) ON CONFLICT (law_name) DO NOTHING",
+                (list(law_names),),
+            )
+        cur.execute(sql.SQL("REFRESH MATERIALIZED VIEW CONCURRENTLY {}").format(sql.Identifier(search)))
+    conn.commit()
+    elapsed = time.perf_counter() - start
+    print(f"[vector_index] Refreshed {search} concurrently in {elapsed:.1f}s")
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the HNSW index on law_chunks.embedding")
+    parser.add_argument("command", choices=["build", "rebuild", "drop", "search", "refresh"])
+    parser.add_argument("--table", default="law_chunks")
+    parser.add_argument("--workers", type=int, default=MAINTENANCE_WORKERS)
+    parser.add_argument("--maintenance-work-mem", default=MAINTENANCE_WORK_MEM)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(PG_CONN_STRING)
+    try:
+        if args.command == "drop":
+            drop_vector_index(conn, args.table)
+        elif args.command == "search":
+            build_search_table(conn, args.table, args.workers, args.maintenance_work_mem)
+        elif args.command == "refresh":
+            refresh_search_table(conn, args.table)
+        elif args.command == "build":
+            build_vector_index(conn, args.table, args.workers, args.maintenance_work_mem)
+        else:
+            rebuild_vector_index(conn, args.table, args.workers, args.maintenance_work_mem)
+    finally:
+        conn.close()
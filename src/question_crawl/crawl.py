@@ -1,46 +1,147 @@
-from pypdf import PdfReader
-import re
+"""
+考古題 PDF (pdfs/) 轉 CSV (csvs/)，並重建合併的題庫 question_bank.parquet
+
+- 只轉換 CSV 不存在或比 PDF 舊的檔案 (--force 全部重新轉換)
+- 擷取文字以 process pool 並行：每個 PDF 切成數段頁面 (--pages-per-task)，各段在不同行程擷取，
+  再依頁序合併後以題目的正規表示式解析 (正規表示式只編譯一次)
+- 轉換完後把所有 CSV 合併成 question_bank.parquet，評估程式直接載入 (question_bank.py)
+
+    python crawl.py --workers 8
+"""
+import argparse
 import os
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
+from pypdf import PdfReader
+
+try:
+    from .question_bank import CSV_DIR, build_question_bank
+except ImportError:
+    from question_bank import CSV_DIR, build_question_bank
+
+PDF_DIR = os.path.join(os.path.dirname(__file__), "pdfs")
+PAGES_PER_TASK = 8
+
+_PAGE_FOOTER = re.compile(r'Page\\s*\\d+\\s+of\\s+\\d+', re.IGNORECASE)
+_SPACES = re.compile(r'[ \\t]{2,}')
+_BLANK_LINES = re.compile(r'\\n{2,}')
+# 題號. (答案) 題目，到下一個「題號. (」為止
+QUESTION_PATTERN = re.compile(r'(\d+)\.\s*\((\d+)\)\s*(.+?)(?=\d+\.\s*\(|$)', re.DOTALL)
+
+
+def csv_path_of(pdf_path, csv_dir=CSV_DIR):
+    return os.path.join(csv_dir, os.path.basename(pdf_path).replace('.pdf', '.csv'))
+
+
+def needs_conversion(pdf_path, csv_dir=CSV_DIR):
+    """CSV 不存在或比 PDF 舊。"""
+    csv_path = csv_path_of(pdf_path, csv_dir)
+    return not os.path.exists(csv_path) or os.path.getmtime(csv_path) < os.path.getmtime(pdf_path)
 
-def pdf_to_csv(pdf_path):
-    all_text = []
+
+def page_count(pdf_path):
     try:
-        reader = PdfReader(pdf_path)
-        number_of_pages = len(reader.pages)
-        print(f"  頁數: {number_of_pages}")
-        for i in range(number_of_pages):
-            page = reader.pages[i]
-            text = page.extract_text()
-            if text is None:
-                print(f"  第{i+1}頁無法擷取文字")
-                continue
-            text = re.sub(r'Page\\s*\\d+\\s+of\\s+\\d+', '', text, flags=re.IGNORECASE)
-            text = re.sub(r'[ \\t]{2,}', ' ', text)
-            text = re.sub(r'\\n{2,}', '\\n\\n', text)
-            text = text.strip()
-            all_text.append(text)
-
-        content = '\n'.join(all_text)
-        # 正則解析
-        pattern = re.compile(r'(\d+)\.\s*\((\d+)\)\s*(.+?)(?=\d+\.\s*\(|$)', re.DOTALL) 
-        results = []
-        for match in pattern.finditer(content):
-            number = match.group(1)
-            answer = match.group(2)
-            question = match.group(3).replace('\n', ' ').strip()
-            results.append({'number': number, 'answer': answer, 'question': question})
-
-        df = pd.DataFrame(results)
-        if not os.path.exists("csvs"):
-            os.makedirs("csvs")
-        df.to_csv(os.path.join("csvs", os.path.basename(pdf_path).replace('.pdf', '.csv')), index=False, encoding='utf-8-sig')
+        return len(PdfReader(pdf_path).pages)
     except Exception as e:
-        print(f"  讀取失敗: {e}")
+        print(f"  {os.path.basename(pdf_path)} 讀取失敗: {e}")
+        return None
+
+
+def clean_page_text(text):
+    text = _PAGE_FOOTER.sub('', text)
+    text = _SPACES.sub(' ', text)
+    text = _BLANK_LINES.sub('\\n\\n', text)
+    return text.strip()
+
+
+def extract_pages(pdf_path, start, stop):
+    """在工作行程中擷取 [start, stop) 頁的文字，回傳 (pdf_path, start, [文字或 None])。"""
+    reader = PdfReader(pdf_path)
+    texts = []
+    for i in range(start, stop):
+        text = reader.pages[i].extract_text()
+        texts.append(None if text is None else clean_page_text(text))
+    return pdf_path, start, texts
+
+
+def parse_questions(content):
+    results = []
+    for match in QUESTION_PATTERN.finditer(content):
+        number = match.group(1)
+        answer = match.group(2)
+        question = match.group(3).replace('\n', ' ').strip()
+        results.append({'number': number, 'answer': answer, 'question': question})
+    return pd.DataFrame(results)
+
+
+def write_csv(pdf_path, page_texts, csv_dir=CSV_DIR):
+    for i, text in enumerate(page_texts):
+        if text is None:
+            print(f"  {os.path.basename(pdf_path)} 第{i+1}頁無法擷取文字")
+    content = '\n'.join(text for text in page_texts if text is not None)
+    df = parse_questions(content)
+    os.makedirs(csv_dir, exist_ok=True)
+    df.to_csv(csv_path_of(pdf_path, csv_dir), index=False, encoding='utf-8-sig')
+    return len(df)
+
+
+def convert_pdfs(pdf_paths, csv_dir=CSV_DIR, workers=None, pages_per_task=PAGES_PER_TASK):
+    """並行轉換 pdf_paths，回傳 {pdf_path: 題數 (失敗時為 None)}。"""
+    counts = {}
+    pages = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for pdf_path, count in zip(pdf_paths, pool.map(page_count, pdf_paths)):
+            if count is None:
+                counts[pdf_path] = None
+            else:
+                pages[pdf_path] = count
+        tasks = [
+            (pdf_path, start, min(start + pages_per_task, count))
+            for pdf_path, count in pages.items()
+            for start in range(0, count, pages_per_task)
+        ]
+        print(f"{len(pdf_paths)} 個 PDF，共 {sum(pages.values())} 頁，{len(tasks)} 個工作")
+        texts = defaultdict(dict)
+        futures = [pool.submit(extract_pages, *task) for task in tasks]
+        for future in futures:
+            try:
+                pdf_path, start, page_texts = future.result()
+            except Exception as e:
+                print(f"  讀取失敗: {e}")
+                continue
+            texts[pdf_path][start] = page_texts
+    for pdf_path, count in pages.items():
+        chunks = texts.get(pdf_path, {})
+        if len(chunks) != len(range(0, count, pages_per_task)):
+            print(f"  {os.path.basename(pdf_path)} 讀取失敗，跳過")
+            counts[pdf_path] = None
+            continue
+        page_texts = [text for start in sorted(chunks) for text in chunks[start]]
+        counts[pdf_path] = write_csv(pdf_path, page_texts, csv_dir)
+        print(f"  {os.path.basename(pdf_path)}: {count} 頁，{counts[pdf_path]} 題")
+    return counts
+
 
-pdf_dir = "pdfs"
-pdf_files = [os.path.join(pdf_dir, f) for f in os.listdir(pdf_dir) if f.lower().endswith('.pdf')]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the exam PDFs to CSV and rebuild the question bank")
+    parser.add_argument("--pdf-dir", default=PDF_DIR)
+    parser.add_argument("--csv-dir", default=CSV_DIR)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: number of CPUs)")
+    parser.add_argument("--pages-per-task", type=int, default=PAGES_PER_TASK)
+    parser.add_argument("--force", action="store_true", help="convert every PDF again")
+    args = parser.parse_args()
 
-for pdf_path in pdf_files:
-    print(f"正在處理: {pdf_path}")
-    pdf_to_csv(pdf_path)
+    pdf_files = sorted(
+        os.path.join(args.pdf_dir, f) for f in os.listdir(args.pdf_dir) if f.lower().endswith('.pdf')
+    )
+    todo = [p for p in pdf_files if args.force or needs_conversion(p, args.csv_dir)]
+    print(f"共 {len(pdf_files)} 個 PDF，{len(pdf_files) - len(todo)} 個已轉換，跳過")
+    start = time.perf_counter()
+    if todo:
+        convert_pdfs(todo, args.csv_dir, args.workers, args.pages_per_task)
+        print(f"轉換完成，耗時 {time.perf_counter() - start:.1f}s")
+    build_question_bank(args.csv_dir)
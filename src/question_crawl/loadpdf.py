@@ -1,42 +1,184 @@
-import requests
-from bs4 import BeautifulSoup
+"""
+下載考古題 PDF (https://www.osh-soeasy.com/exam.html)
+
+- 題目頁經過 web_crawl 的磁碟快取 (fetch_one)；PDF 以共用連線池並行下載 (--concurrency)，
+  分塊串流寫入 pdfs/ (不把整份檔案放在記憶體)，第一塊就檢查 %PDF- 檔頭，不是 PDF 的錯誤頁立刻中止
+- pdfs/downloads.json 記錄每個檔案的網址、大小、SHA-256 與 ETag / Last-Modified；
+  檔案還在且大小與 SHA-256 相符就跳過，--revalidate 時改送條件式請求，伺服器回 304 才跳過
+- 結束時印出下載、跳過、失敗的檔案數與 MB/s
+
+從 src/ 執行：
+    python -m question_crawl.loadpdf --concurrency 8
+"""
+import argparse
+import asyncio
+import hashlib
+import json
 import os
+import time
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+# 下載經過 web_crawl 的 async_fetch (連線池、每個主機限速、重試)；CRAWL_REPLAY_URL 時改向重播 server
+try:
+    from ..web_crawl.async_fetch import CRAWL_CONCURRENCY, CRAWL_RATE_PER_HOST, AsyncFetcher, fetch_one, run_sync
+except ImportError:
+    from web_crawl.async_fetch import CRAWL_CONCURRENCY, CRAWL_RATE_PER_HOST, AsyncFetcher, fetch_one, run_sync
 
-# 1. 取得網頁所有 PDF 連結
-url = "https://www.osh-soeasy.com/exam.html"
-headers = {
+EXAM_URL = "https://www.osh-soeasy.com/exam.html"
+HEADERS = {
     "User-Agent": "Mozilla/5.0",
-    "Referer": url
+    "Referer": EXAM_URL
 }
-response = requests.get(url, headers=headers)
-soup = BeautifulSoup(response.text, "html.parser")
-pdf_links = [a['href'] for a in soup.find_all('a', href=True) if a['href'].lower().endswith('.pdf')]
-
-print(f"共找到 {len(pdf_links)} 個 PDF 連結")
-
-# 2. 下載 PDF，並檢查是否為真正的 PDF
-os.makedirs("pdfs", exist_ok=True)
-for link in pdf_links:
-    filename = os.path.join("pdfs", os.path.basename(link))
-    pdf_url = link if link.startswith("http") else requests.compat.urljoin(url, link)
-    r = requests.get(pdf_url, headers=headers)
-    with open(filename, "wb") as f:
-        f.write(r.content)
-    # 檢查檔案開頭
-    with open(filename, "rb") as f:
-        head = f.read(5)
-        if head != b"%PDF-":
-            print(f"刪除非 PDF 檔案: {filename}")
-            os.remove(filename)
-
-# 3. 處理 PDF（以 pypdf 為例）
-from pypdf import PdfReader
-for pdf_file in os.listdir("pdfs"):
-    if pdf_file.endswith(".pdf"):
-        path = os.path.join("pdfs", pdf_file)
+PDF_DIR = os.path.join(os.path.dirname(__file__), "pdfs")
+PDF_MAGIC = b"%PDF-"
+
+
+def pdf_links(url=EXAM_URL):
+    """題目頁上所有 PDF 的完整網址 (依頁面順序，不重複)。"""
+    response = fetch_one(url, headers=HEADERS)
+    if not response.ok:
+        raise RuntimeError(f"無法下載 {url}: {response.error or response.status}")
+    soup = BeautifulSoup(response.text, "html.parser")
+    links = [a['href'] for a in soup.find_all('a', href=True) if a['href'].lower().endswith('.pdf')]
+    return list(dict.fromkeys(link if link.startswith("http") else urljoin(url, link) for link in links))
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _load_index(pdf_dir):
+    try:
+        with open(os.path.join(pdf_dir, "downloads.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_index(pdf_dir, index):
+    path = os.path.join(pdf_dir, "downloads.json")
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+def is_current(path, entry):
+    """檔案還在，且大小與 SHA-256 與上次下載相符。"""
+    if entry is None or not os.path.exists(path) or os.path.getsize(path) != entry["size"]:
+        return False
+    return file_sha256(path) == entry["sha256"]
+
+
+def _adopt_existing(path, url):
+    """舊版下載的檔案 (沒有紀錄)：確認是 PDF 後補上紀錄。"""
+    with open(path, "rb") as f:
+        if f.read(len(PDF_MAGIC)) != PDF_MAGIC:
+            return None
+    return {"url": url, "size": os.path.getsize(path), "sha256": file_sha256(path), "etag": None, "last_modified": None}
+
+
+async def download_pdfs(links, pdf_dir=PDF_DIR, concurrency=CRAWL_CONCURRENCY, rate_per_host=CRAWL_RATE_PER_HOST,
+                        revalidate=False, force=False):
+    """
+    並行下載 links 到 pdf_dir，回傳 {"downloaded": [...], "skipped": [...], "failed": [(檔名, 錯誤)], "bytes", "seconds"}。
+    """
+    os.makedirs(pdf_dir, exist_ok=True)
+    index = _load_index(pdf_dir)
+    report = {"downloaded": [], "skipped": [], "failed": [], "bytes": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+    start = time.perf_counter()
+
+    async def run(fetcher, url):
+        name = os.path.basename(url)
+        path = os.path.join(pdf_dir, name)
+        entry = index.get(name)
+        if not force:
+            if entry is None and os.path.exists(path):
+                entry = await asyncio.to_thread(_adopt_existing, path, url)
+                if entry is not None:
+                    index[name] = entry
+            if not revalidate and await asyncio.to_thread(is_current, path, entry):
+                report["skipped"].append(name)
+                return
+        headers = {}
+        if revalidate and not force and entry and os.path.exists(path):
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        async with semaphore:
+            result = await fetcher.download(url, path, headers=headers or None, magic=PDF_MAGIC)
+            if result.not_modified:
+                if await asyncio.to_thread(is_current, path, entry):
+                    report["skipped"].append(name)
+                    return
+                # 伺服器沒變但本機檔案被改過，重新下載
+                result = await fetcher.download(url, path, magic=PDF_MAGIC)
+        if result.ok:
+            index[name] = {
+                "url": url,
+                "size": result.size,
+                "sha256": result.sha256,
+                "etag": result.headers.get("etag"),
+                "last_modified": result.headers.get("last-modified"),
+            }
+            report["downloaded"].append(name)
+            report["bytes"] += result.size
+        else:
+            report["failed"].append((name, result.error or f"HTTP {result.status}"))
+
+    try:
+        async with AsyncFetcher(concurrency=concurrency, rate_per_host=rate_per_host, cache=False, headers=HEADERS) as fetcher:
+            await asyncio.gather(*(run(fetcher, url) for url in links))
+    finally:
+        _save_index(pdf_dir, index)
+    report["seconds"] = time.perf_counter() - start
+    return report
+
+
+def print_report(report):
+    seconds = report["seconds"]
+    mb = report["bytes"] / 2**20
+    print(
+        f"下載 {len(report['downloaded'])} 個、跳過 {len(report['skipped'])} 個、失敗 {len(report['failed'])} 個，"
+        f"{mb:.1f} MB / {seconds:.1f}s ({mb / seconds if seconds else 0:.2f} MB/s, "
+        f"{len(report['downloaded']) / seconds if seconds else 0:.1f} 檔/s)"
+    )
+    for name, error in report["failed"]:
+        print(f"  無法下載 {name}: {error}")
+
+
+def check_pdfs(pdf_dir, names):
+    """以 pypdf 開啟下載的檔案，確認可以讀取。"""
+    from pypdf import PdfReader
+    for pdf_file in names:
+        path = os.path.join(pdf_dir, pdf_file)
         try:
             reader = PdfReader(path)
             print(f"成功讀取: {pdf_file}，頁數: {len(reader.pages)}")
-            # 你的處理邏輯
         except Exception as e:
             print(f"無法讀取 {pdf_file}: {e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download the exam PDFs linked from osh-soeasy.com")
+    parser.add_argument("--pdf-dir", default=PDF_DIR)
+    parser.add_argument("--concurrency", type=int, default=CRAWL_CONCURRENCY, help="downloads in flight")
+    parser.add_argument("--rate", type=float, default=CRAWL_RATE_PER_HOST, help="requests per second per host (0 = unlimited)")
+    parser.add_argument("--revalidate", action="store_true", help="ask the server (ETag / Last-Modified) instead of trusting local files")
+    parser.add_argument("--force", action="store_true", help="download every file again")
+    parser.add_argument("--check", action="store_true", help="open every downloaded file with pypdf")
+    args = parser.parse_args()
+
+    links = pdf_links()
+    print(f"共找到 {len(links)} 個 PDF 連結")
+    report = run_sync(download_pdfs(links, args.pdf_dir, args.concurrency, args.rate, args.revalidate, args.force))
+    print_report(report)
+    if args.check:
+        check_pdfs(args.pdf_dir, report["downloaded"])
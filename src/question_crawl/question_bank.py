@@ -0,0 +1,72 @@
+"""
+考古題題庫 (question_bank.parquet)：csvs/ 下所有 CSV 合併成一個欄式檔案
+
+每一列為 (file, number, answer, question)，file 為原本的 CSV 檔名 (評估結果的 file 欄位)。
+crawl.py 轉換完後重建；評估程式 (evaluation/main.py、repeat.py) 以 load_question_bank() 一次讀入，
+不再逐一 pd.read_csv。題庫比 CSV 舊或不存在時改讀 CSV (並重建)。
+"""
+import os
+import sys
+
+import pandas as pd
+from pandas.errors import EmptyDataError
+
+CSV_DIR = os.path.join(os.path.dirname(__file__), "csvs")
+QUESTION_BANK = os.path.join(os.path.dirname(__file__), "question_bank.parquet")
+COLUMNS = ["file", "number", "answer", "question"]
+
+
+def _read_csv(path: str) -> pd.DataFrame:
+    try:
+        return pd.read_csv(path)
+    except EmptyDataError:
+        print(f"The file at {path} is empty.", file=sys.stderr)
+    except Exception as e:
+        print(f"Error reading {path}: {e}", file=sys.stderr)
+    return pd.DataFrame(columns=COLUMNS[1:])
+
+
+def _csv_files(csv_dir: str) -> list[str]:
+    return sorted(f for f in os.listdir(csv_dir) if f.lower().endswith(".csv"))
+
+
+def build_question_bank(csv_dir: str = CSV_DIR, path: str = QUESTION_BANK) -> pd.DataFrame:
+    """讀入 csv_dir 下所有 CSV，寫成 Parquet (number 為可為空的整數，其餘為字串)。"""
+    frames = []
+    for f in _csv_files(csv_dir):
+        df = _read_csv(os.path.join(csv_dir, f))
+        if not df.empty:
+            frames.append(df.assign(file=f))
+    bank = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=COLUMNS)
+    bank = bank[COLUMNS].astype({
+        "file": "string",
+        "number": "Int64",
+        "answer": "string",
+        "question": "string",
+    })
+    tmp = f"{path}.tmp"
+    bank.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    print(f"題庫已更新: {len(bank)} 題，{bank['file'].nunique()} 個檔案 -> {path}")
+    return bank
+
+
+def is_stale(csv_dir: str = CSV_DIR, path: str = QUESTION_BANK) -> bool:
+    """題庫不存在，或有 CSV 比題庫新 (或 CSV 被刪除、新增) 時為 True。"""
+    if not os.path.exists(path):
+        return True
+    mtime = os.path.getmtime(path)
+    return os.path.getmtime(csv_dir) > mtime or any(
+        os.path.getmtime(os.path.join(csv_dir, f)) > mtime for f in _csv_files(csv_dir)
+    )
+
+
+def load_question_bank(csv_dir: str = CSV_DIR, path: str = QUESTION_BANK) -> pd.DataFrame:
+    """題庫 (依檔名排序，檔案內維持題號順序)；題庫過期時先由 CSV 重建。"""
+    if os.path.isdir(csv_dir) and is_stale(csv_dir, path):
+        return build_question_bank(csv_dir, path)
+    return pd.read_parquet(path)
+
+
+if __name__ == "__main__":
+    build_question_bank()
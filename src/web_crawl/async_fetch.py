@@ -0,0 +1,384 @@
+"""
+非同步下載器
+
+- 共用一個 httpx.AsyncClient (連線池、keep-alive)，同時進行的請求數由 concurrency 控制
+- 每個主機各自限速 (每秒最多 rate_per_host 個請求)，避免對全國法規資料庫造成負擔
+- 逾時、連線錯誤、429 與 5xx 以指數退避重試 (429 / 503 優先使用 Retry-After)
+- 回應存進磁碟快取 (http_cache.py)，之後以 ETag / Last-Modified 送出條件式請求，沒變的頁面只花一個 304；
+  offline=True 時只讀快取
+- 設定 CRAWL_REPLAY_URL 時改向本機的重播 server 下載錄製好的回應 (replay.py)
+- 大檔案以 download() 分塊串流寫入磁碟 (不經過快取、不整份放在記憶體)，第一塊就檢查檔頭
+- 結束時印出下載摘要 (成功 / 失敗筆數、304 / 快取命中數、重試次數、位元組數、耗時)
+
+在一般程式中用 run_sync(...) 執行；已經在事件迴圈中 (例如 FastAPI) 時會改在另一個執行緒執行。
+
+    results, summary = run_sync(fetch_all(urls, handler=save))
+    result = fetch_one(url)
+    result = await fetcher.download(url, path, magic=b"%PDF-")
+"""
+import asyncio
+import hashlib
+import os
+import random
+import threading
+import time
+from collections import Counter
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+import httpx
+
+try:
+    from .http_cache import CRAWL_CACHE, CRAWL_OFFLINE, HttpCache
+except ImportError:
+    from http_cache import CRAWL_CACHE, CRAWL_OFFLINE, HttpCache
+
+CRAWL_CONCURRENCY = int(os.environ.get("CRAWL_CONCURRENCY", "8"))
+# 每個主機每秒最多幾個請求
+CRAWL_RATE_PER_HOST = float(os.environ.get("CRAWL_RATE_PER_HOST", "2"))
+CRAWL_RETRIES = int(os.environ.get("CRAWL_RETRIES", "4"))
+CRAWL_TIMEOUT = float(os.environ.get("CRAWL_TIMEOUT", "30"))
+# 第 n 次重試前等待 CRAWL_BACKOFF * 2**(n-1) 秒 (加上隨機抖動)
+CRAWL_BACKOFF = float(os.environ.get("CRAWL_BACKOFF", "1"))
+# 設定時所有請求改送到本機的重播 server (見 replay.py)
+CRAWL_REPLAY_URL = os.environ.get("CRAWL_REPLAY_URL") or None
+# 快取在幾秒內不重新驗證 (0 表示每次都送條件式請求)
+CRAWL_CACHE_MAX_AGE = float(os.environ.get("CRAWL_CACHE_MAX_AGE", "0"))
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept-Language": "zh-TW,zh;q=0.9",
+}
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status: int | None = None
+    content: bytes = b""
+    headers: dict = field(default_factory=dict)
+    encoding: str | None = None
+    attempts: int = 0
+    elapsed: float = 0.0
+    error: str | None = None
+    final_url: str | None = None
+    # from_cache：內容來自快取 (304、max_age 內或離線)；not_modified：伺服器回 304
+    from_cache: bool = False
+    not_modified: bool = False
+    # download()：寫入的檔案、大小與 SHA-256 (content 為空)
+    path: str | None = None
+    size: int = 0
+    sha256: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status == 200
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+
+@dataclass
+class CrawlSummary:
+    started: float = field(default_factory=time.perf_counter)
+    ok: int = 0
+    failed: int = 0
+    retries: int = 0
+    not_modified: int = 0
+    cached: int = 0
+    bytes: int = 0
+    statuses: Counter = field(default_factory=Counter)
+    failures: list = field(default_factory=list)
+
+    def add(self, result: FetchResult):
+        self.retries += max(result.attempts - 1, 0)
+        self.not_modified += result.not_modified
+        self.cached += result.from_cache and not result.not_modified
+        if not result.from_cache:
+            self.bytes += len(result.content) or result.size
+        self.statuses[result.status or "error"] += 1
+        if result.ok:
+            self.ok += 1
+        else:
+            self.failed += 1
+            self.failures.append((result.url, result.error or f"HTTP {result.status}"))
+
+    def print(self):
+        elapsed = time.perf_counter() - self.started
+        print(
+            f"[crawl] {self.ok} ok, {self.failed} failed, {self.not_modified} not modified, "
+            f"{self.cached} from cache, {self.retries} retries, "
+            f"{self.bytes / 2**20:.1f} MB in {elapsed:.1f}s, statuses={dict(self.statuses)}"
+        )
+        for url, error in self.failures:
+            print(f"[crawl]   failed {url}: {error}")
+
+
+class HostRateLimiter:
+    """每個主機的請求間隔至少 1 / rate 秒。"""
+
+    def __init__(self, rate: float = CRAWL_RATE_PER_HOST):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = {}
+        self._locks = {}
+
+    async def wait(self, url: str):
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            start = max(now, self._next.get(host, now))
+            self._next[host] = start + self.interval
+        await asyncio.sleep(start - now)
+
+
+def _retry_after(response: httpx.Response) -> float | None:
+    value = response.headers.get("Retry-After")
+    if value and value.isdigit():
+        return float(value)
+    return None
+
+
+class AsyncFetcher:
+    def __init__(
+        self,
+        concurrency: int = CRAWL_CONCURRENCY,
+        rate_per_host: float = CRAWL_RATE_PER_HOST,
+        retries: int = CRAWL_RETRIES,
+        timeout: float = CRAWL_TIMEOUT,
+        backoff: float = CRAWL_BACKOFF,
+        cache: HttpCache | bool = CRAWL_CACHE,
+        offline: bool = CRAWL_OFFLINE,
+        headers: dict | None = None,
+        replay_url: str | None = CRAWL_REPLAY_URL,
+    ):
+        self.concurrency = concurrency
+        self.replay_url = replay_url.rstrip("/") if replay_url else None
+        self.retries = retries
+        self.backoff = backoff
+        self.limiter = HostRateLimiter(rate_per_host)
+        # cache=True 使用預設目錄的快取，False 不使用
+        self.cache = HttpCache() if cache is True else (cache or None)
+        self.offline = offline
+        if offline and self.cache is None:
+            raise ValueError("offline mode needs the HTTP cache")
+        self.client = httpx.AsyncClient(
+            headers={**HEADERS, **(headers or {})},
+            timeout=timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        )
+        self.summary = CrawlSummary()
+
+    async def __aenter__(self) -> "AsyncFetcher":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.client.aclose()
+
+    def _target(self, url: str) -> str:
+        if self.replay_url:
+            # https://host/path?query → <replay_url>/host/path?query；result.url 仍是原本的網址
+            parts = urlsplit(url)
+            return f"{self.replay_url}/{parts.netloc}{parts.path}" + (f"?{parts.query}" if parts.query else "")
+        return url
+
+    async def fetch(
+        self,
+        url: str,
+        params: dict | None = None,
+        headers: dict | None = None,
+        max_age: float = CRAWL_CACHE_MAX_AGE,
+    ) -> FetchResult:
+        result = FetchResult(url=url)
+        start = time.perf_counter()
+        url = self._target(url)
+        key = str(httpx.URL(url, params=params)) if params else url
+        cached = self.cache.get(key) if self.cache else None
+
+        if self.offline or (cached and max_age and cached[0].age() < max_age):
+            if cached:
+                _from_cache(result, *cached)
+            else:
+                result.error = "not in cache (offline)"
+            result.elapsed = time.perf_counter() - start
+            self.summary.add(result)
+            return result
+        if cached:
+            headers = {**cached[0].validators(), **(headers or {})}
+
+        for attempt in range(1, self.retries + 2):
+            result.attempts = attempt
+            await self.limiter.wait(url)
+            delay = self.backoff * 2 ** (attempt - 1) * (1 + random.random() / 2)
+            try:
+                response = await self.client.get(url, params=params, headers=headers)
+            except httpx.HTTPError as e:
+                result.error = f"{type(e).__name__}: {e}"
+            else:
+                result.error = None
+                if response.status_code == 304 and cached:
+                    _from_cache(result, *cached)
+                    result.not_modified = True
+                    self.cache.touch(key, cached[0])
+                    break
+                result.status = response.status_code
+                result.content = response.content
+                result.headers = dict(response.headers)
+                result.encoding = response.encoding
+                result.final_url = str(response.url)
+                if response.status_code == 200 and self.cache:
+                    self.cache.put(key, 200, result.headers, result.content, result.encoding, result.final_url)
+                if response.status_code not in RETRY_STATUS:
+                    break
+                delay = _retry_after(response) or delay
+            if attempt <= self.retries:
+                await asyncio.sleep(delay)
+        result.elapsed = time.perf_counter() - start
+        self.summary.add(result)
+        return result
+
+
+    async def download(
+        self,
+        url: str,
+        path: str,
+        headers: dict | None = None,
+        magic: bytes | None = None,
+        chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+    ) -> FetchResult:
+        """
+        以串流分塊下載到 path (先寫 path.part，完成後才改名)，同時計算 SHA-256。
+        magic 不為 None 時，內容開頭不符就中止下載、不重試 (例如錯誤頁不是 PDF)。
+        headers 可帶 If-None-Match / If-Modified-Since，伺服器回 304 時 not_modified=True、不寫檔。
+        """
+        result = FetchResult(url=url)
+        start = time.perf_counter()
+        target = self._target(url)
+        tmp = f"{path}.part"
+        for attempt in range(1, self.retries + 2):
+            result.attempts = attempt
+            await self.limiter.wait(target)
+            delay = self.backoff * 2 ** (attempt - 1) * (1 + random.random() / 2)
+            result.error = None
+            result.status = None
+            try:
+                async with self.client.stream("GET", target, headers=headers) as response:
+                    result.status = response.status_code
+                    result.headers = dict(response.headers)
+                    result.final_url = str(response.url)
+                    if response.status_code == 304:
+                        result.not_modified = True
+                        break
+                    if response.status_code != 200:
+                        if response.status_code not in RETRY_STATUS:
+                            break
+                        delay = _retry_after(response) or delay
+                    else:
+                        digest = hashlib.sha256()
+                        size = 0
+                        head = b""
+                        with open(tmp, "wb") as f:
+                            async for chunk in response.aiter_bytes(chunk_size):
+                                if magic and len(head) < len(magic):
+                                    head += chunk[:len(magic) - len(head)]
+                                    if not magic.startswith(head):
+                                        break
+                                digest.update(chunk)
+                                size += len(chunk)
+                                f.write(chunk)
+                        if magic and head != magic:
+                            os.remove(tmp)
+                            result.error = f"unexpected content {head!r}, expected {magic!r}"
+                            break
+                        os.replace(tmp, path)
+                        result.path, result.size, result.sha256 = path, size, digest.hexdigest()
+                        break
+            except httpx.HTTPError as e:
+                result.error = f"{type(e).__name__}: {e}"
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            if attempt <= self.retries:
+                await asyncio.sleep(delay)
+        result.elapsed = time.perf_counter() - start
+        self.summary.add(result)
+        return result
+
+
+def _from_cache(result: FetchResult, entry, body: bytes):
+    result.status = entry.status
+    result.content = body
+    result.encoding = entry.encoding
+    result.final_url = entry.final_url
+    result.headers = {"content-type": entry.content_type} if entry.content_type else {}
+    result.from_cache = True
+
+
+async def fetch_all(
+    urls: Iterable[str],
+    handler: Callable[[FetchResult], object] | None = None,
+    fetcher: AsyncFetcher | None = None,
+    **fetcher_kwargs,
+) -> tuple[list, CrawlSummary]:
+    """
+    下載所有 urls，每筆完成後在執行緒中呼叫 handler(result) (解析、存檔等 CPU / 磁碟工作不會卡住事件迴圈)。
+    回傳 (依 urls 順序的 handler 回傳值或 FetchResult, 下載摘要)。
+    """
+    own_fetcher = fetcher is None
+    fetcher = fetcher or AsyncFetcher(**fetcher_kwargs)
+    semaphore = asyncio.Semaphore(fetcher.concurrency)
+
+    async def run(url: str):
+        async with semaphore:
+            result = await fetcher.fetch(url)
+        if handler is None:
+            return result
+        return await asyncio.to_thread(handler, result)
+
+    try:
+        results = await asyncio.gather(*(run(url) for url in urls))
+    finally:
+        if own_fetcher:
+            await fetcher.client.aclose()
+    fetcher.summary.print()
+    return list(results), fetcher.summary
+
+
+def run_sync(coro: Awaitable):
+    """執行 coroutine 並回傳結果；呼叫端已在事件迴圈中時改在新的執行緒執行。"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    outcome = {}
+
+    def target():
+        try:
+            outcome["value"] = asyncio.run(coro)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["value"]
+
+
+def fetch_one(url: str, params: dict | None = None, max_age: float = CRAWL_CACHE_MAX_AGE, **fetcher_kwargs) -> FetchResult:
+    """同步下載單一網址 (含快取、重試與逾時)。"""
+
+    async def run() -> FetchResult:
+        async with AsyncFetcher(**fetcher_kwargs) as fetcher:
+            return await fetcher.fetch(url, params=params, max_age=max_age)
+
+    return run_sync(run())
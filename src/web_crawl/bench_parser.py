@@ -0,0 +1,140 @@
+"""
+條文頁解析速度比較 (使用存下來的頁面，不連網)
+
+    python bench_parser.py --save 20          # 先從 links.txt 下載 20 頁到 pages/
+    python bench_parser.py --repeat 3         # 比較舊的解析方式與 law_parser (html.parser / lxml)
+
+舊的方式：整頁解析兩次 (一次取法規名稱、一次取條文)，每一項以單列 DataFrame pd.concat。
+"""
+import argparse
+import os
+import re
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+import requests
+from bs4 import BeautifulSoup
+
+try:
+    from .law_parser import parse_law_page
+except ImportError:
+    from law_parser import parse_law_page
+
+PAGES_DIR = os.path.join(os.path.dirname(__file__), "pages")
+LEGACY_COLUMNS = ["actname", "chapter", "title", "subsection", "article"]
+
+
+def legacy_parse(html: str) -> tuple[str, pd.DataFrame]:
+    """原本 crawler.process_url + crawl_questions 的解析方式 (只保留解析的部分)。"""
+    filename = BeautifulSoup(html, "html.parser").find("table").find("a").text
+    soup = BeautifulSoup(html, "html.parser")
+    lawbase = pd.DataFrame([], columns=LEGACY_COLUMNS)
+    current_chapter = ""
+    for element in soup.find_all("div", class_=["row", "char-2"]):
+        if "char-2" in element.get("class", []):
+            chapter_text = element.text.strip()
+            cleaned = re.sub(r"第\s*(.*?)\s*章", lambda m: "第" + m.group(1).replace(" ", "") + "章", chapter_text, count=1)
+            current_chapter = re.sub(r"\s+", " ", cleaned)
+        elif "row" in element.get("class", []):
+            title_div = element.find("div", class_="col-no")
+            article_div = element.find("div", class_="law-article")
+            if title_div and article_div:
+                current_subsection_id = 0
+                current_section = None
+                sections = []
+                for line in article_div.find_all("div", recursive=False):
+                    line_classes = line.get("class", [])
+                    if "line-0000" in line_classes and "show-number" in line_classes:
+                        if current_section is not None:
+                            sections.append((current_subsection_id, current_section))
+                            current_section = None
+                        current_subsection_id += 1
+                    current_section = line.text.strip() if current_section is None else current_section + "\n" + line.text.strip()
+                if current_section is not None:
+                    sections.append((current_subsection_id, current_section))
+                title_text = title_div.text.replace("本條文有附件", "").replace(" ", "").strip()
+                for subsection_id, section in sections:
+                    exports = pd.DataFrame({
+                        "actname": [filename],
+                        "chapter": [current_chapter],
+                        "title": [title_text],
+                        "subsection": [subsection_id if subsection_id != 0 else np.nan],
+                        "article": [section],
+                    })
+                    lawbase = pd.concat([lawbase, exports], ignore_index=True)
+    return filename, lawbase
+
+
+def save_pages(n: int, pages_dir: str = PAGES_DIR):
+    os.makedirs(pages_dir, exist_ok=True)
+    with open(os.path.join(os.path.dirname(__file__), "links.txt"), "r") as file:
+        urls = [line.strip() for line in file if "LawAll.aspx" in line][:n]
+    for url in urls:
+        response = requests.get(url, timeout=30)
+        path = os.path.join(pages_dir, url.rsplit("=", 1)[-1] + ".html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(response.text)
+        print("Saved", path)
+
+
+def _time(func, pages: list[str], repeat: int) -> tuple[float, int]:
+    """回傳 (每頁的中位數毫秒, 總列數)。"""
+    per_page = []
+    rows = 0
+    for html in pages:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            _, df = func(html)
+            samples.append((time.perf_counter() - start) * 1000)
+        per_page.append(statistics.median(samples))
+        rows += len(df)
+    return statistics.median(per_page), rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark law page parsing on saved pages")
+    parser.add_argument("--pages-dir", default=PAGES_DIR)
+    parser.add_argument("--save", type=int, default=0, help="download this many pages from links.txt first")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.save:
+        save_pages(args.save, args.pages_dir)
+    pages = []
+    for item in sorted(os.listdir(args.pages_dir)):
+        with open(os.path.join(args.pages_dir, item), "r", encoding="utf-8") as f:
+            pages.append(f.read())
+    print(f"{len(pages)} pages")
+
+    candidates = [("legacy (2x html.parser + concat)", legacy_parse),
+                  ("law_parser html.parser", lambda html: parse_law_page(html, parser="html.parser"))]
+    try:
+        import lxml  # noqa: F401
+        candidates.append(("law_parser lxml", lambda html: parse_law_page(html, parser="lxml")))
+    except ImportError:
+        print("lxml is not installed, skipping the lxml parser")
+
+    baseline = None
+    for name, func in candidates:
+        median_ms, rows = _time(func, pages, args.repeat)
+        baseline = baseline or median_ms
+        print(f"{name:<36} {median_ms:>9.1f} ms/page  rows={rows}  speedup={baseline / median_ms:.2f}x")
+
+    # 確認新舊解析結果相同 (舊的方式把 text-pre 表格當成條文文字，有表格的頁面不比較)
+    for html in pages:
+        if "text-pre" in html:
+            continue
+        _, old = legacy_parse(html)
+        _, new = parse_law_page(html)
+        new = new[LEGACY_COLUMNS]
+        # 沒有章的條文新版為 NA，舊版為空字串
+        new["chapter"] = new["chapter"].fillna("")
+        pd.testing.assert_frame_equal(
+            old.astype(str).reset_index(drop=True),
+            new.astype(object).where(new.notna(), np.nan).astype(str).reset_index(drop=True),
+            check_dtype=False,
+        )
+    print("Parsed rows match the legacy parser")
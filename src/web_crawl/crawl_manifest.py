@@ -0,0 +1,281 @@
+"""
+爬取紀錄 (crawl_manifest.db，SQLite) 與待匯入的法規清單 (changed_laws.txt)
+
+manifest 以網址為主鍵，記錄 pcode、法規名稱、修正日期、CSV 檔名、內容的 SHA-256、狀態 (pending / ok / failed)、
+錯誤訊息、嘗試次數與最後爬取時間。取代原本每加一個網址就整份重寫的 links.txt：
+links.txt 與 039 版的 crawl_manifest.json 只在第一次開啟時匯入，新網址以 add_urls() 加入。
+
+- 每次寫入都是單列的 upsert，各自提交；WAL 模式加上 busy timeout，爬蟲的多個執行緒與
+  add_single_law (例如 API server) 等其他行程可以同時更新
+- crawler.py 預設只爬 due() 的網址：還沒爬過、上次失敗，或超過 stale_days 天沒爬的
+- 再次爬取時修正日期沒變 (頁面沒有日期時改比對 CSV 內容) 且 CSV 還在的法規不重寫 CSV；
+  新的或有修正的法規在同一個 upsert 中標記 needs_ingest，save() (以及下次開啟時) 把標記的 CSV 檔名加進
+  changed_laws.txt 後才清除標記，爬到一半被中止也不會遺失。create_vector.py --changed 只重新切塊、編碼這些法規，
+  匯入成功後從清單移除 (remove_changed_laws)。清單跨多次爬取累積，沒匯入前不會遺失。
+- 讀取、修改、寫回 changed_laws.txt 時持有 changed_laws.txt.lock 的 fcntl 排他鎖，
+  爬蟲併入清單與 create_vector.py 移除已匯入的法規同時進行時不會互相覆蓋
+
+    python crawl_manifest.py status
+    python crawl_manifest.py add https://law.moj.gov.tw/LawClass/LawAll.aspx?pcode=N0030001
+    python crawl_manifest.py import links.txt
+"""
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+CRAWL_MANIFEST = os.path.join(os.path.dirname(__file__), "crawl_manifest.db")
+CHANGED_LAWS = os.path.join(os.path.dirname(__file__), "changed_laws.txt")
+LINKS_FILE = os.path.join(os.path.dirname(__file__), "links.txt")
+# 039 版的 JSON manifest，第一次開啟時匯入
+LEGACY_MANIFEST = os.path.join(os.path.dirname(__file__), "crawl_manifest.json")
+# 超過幾天沒爬的網址視為過期
+STALE_DAYS = float(os.environ.get("CRAWL_STALE_DAYS", "7"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawl_manifest (
+    url TEXT PRIMARY KEY,
+    pcode TEXT,
+    law_name TEXT,
+    amended_on TEXT,
+    csv TEXT,
+    sha256 TEXT,
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'ok', 'failed')),
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    crawled_at TEXT,
+    added_at TEXT NOT NULL,
+    -- 新的或有修正、還沒寫進 changed_laws.txt 的法規
+    needs_ingest INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS crawl_manifest_status_idx ON crawl_manifest (status, crawled_at);
+"""
+
+_PCODE = re.compile(r"pcode=([A-Za-z0-9]+)", re.IGNORECASE)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def pcode_of(url: str) -> str | None:
+    match = _PCODE.search(url)
+    return match.group(1) if match else None
+
+
+class CrawlManifest:
+    def __init__(self, path: str = CRAWL_MANIFEST, links_file: str = LINKS_FILE, changed_path: str = CHANGED_LAWS):
+        self.path = path
+        self.changed_path = changed_path
+        # 同一個連線由爬蟲的多個執行緒共用，寫入以 lock 串行；其他行程由 SQLite 的鎖與 busy timeout 協調
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(SCHEMA)
+            columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(crawl_manifest)")}
+            if "needs_ingest" not in columns:
+                self.conn.execute("ALTER TABLE crawl_manifest ADD COLUMN needs_ingest INTEGER NOT NULL DEFAULT 0")
+            empty = self.conn.execute("SELECT count(*) FROM crawl_manifest").fetchone()[0] == 0
+        if empty:
+            self._import_legacy(links_file)
+        # 上次爬取中途被中止時標記但還沒寫進清單的法規
+        self.flush_changed()
+
+    def _import_legacy(self, links_file: str):
+        if os.path.exists(links_file):
+            print(f"[manifest] Imported {self.import_links(links_file)} URLs from {os.path.basename(links_file)}")
+        if os.path.exists(LEGACY_MANIFEST):
+            with open(LEGACY_MANIFEST, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            with self._lock:
+                self.conn.execute("BEGIN IMMEDIATE")
+                for url, entry in entries.items():
+                    self.conn.execute(
+                        "INSERT INTO crawl_manifest (url, pcode, law_name, amended_on, csv, sha256, status, crawled_at, added_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, 'ok', ?, ?) "
+                        "ON CONFLICT (url) DO UPDATE SET law_name = excluded.law_name, amended_on = excluded.amended_on, "
+                        "csv = excluded.csv, sha256 = excluded.sha256, status = 'ok', crawled_at = excluded.crawled_at",
+                        (url, pcode_of(url), entry.get("law_name"), entry.get("amended_on"), entry.get("csv"),
+                         entry.get("sha256"), entry.get("crawled_at"), _now()),
+                    )
+                self.conn.execute("COMMIT")
+            print(f"[manifest] Imported {len(entries)} entries from {os.path.basename(LEGACY_MANIFEST)}")
+
+    def close(self):
+        self.conn.close()
+
+    def add_urls(self, urls: list[str]) -> int:
+        """加入新的網址 (已存在的不變)，回傳新增的筆數。"""
+        added = 0
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            for url in urls:
+                url = url.strip()
+                if url:
+                    cur = self.conn.execute(
+                        "INSERT INTO crawl_manifest (url, pcode, added_at) VALUES (?, ?, ?) ON CONFLICT (url) DO NOTHING",
+                        (url, pcode_of(url), _now()),
+                    )
+                    added += cur.rowcount
+            self.conn.execute("COMMIT")
+        return added
+
+    def import_links(self, path: str = LINKS_FILE) -> int:
+        with open(path, "r", encoding="utf-8") as f:
+            return self.add_urls(f.read().splitlines())
+
+    def get(self, url: str) -> dict | None:
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM crawl_manifest WHERE url = ?", (url,)).fetchone()
+        return dict(row) if row else None
+
+    def entries(self) -> dict[str, dict]:
+        with self._lock:
+            return {row["url"]: dict(row) for row in self.conn.execute("SELECT * FROM crawl_manifest ORDER BY url")}
+
+    def due(self, stale_days: float | None = STALE_DAYS, statuses: tuple[str, ...] = ("pending", "failed")) -> list[str]:
+        """
+        需要爬的網址：狀態在 statuses 中的 (預設為還沒爬過與上次失敗)，
+        加上超過 stale_days 天沒爬的 (stale_days=None 時不含)。
+        """
+        query = f"SELECT url FROM crawl_manifest WHERE status IN ({', '.join('?' * len(statuses))})"
+        params = list(statuses)
+        if stale_days is not None:
+            query += " OR crawled_at IS NULL OR crawled_at < ?"
+            params.append((datetime.now(timezone.utc) - timedelta(days=stale_days)).isoformat(timespec="seconds"))
+        with self._lock:
+            return [row[0] for row in self.conn.execute(query + " ORDER BY url", params)]
+
+    def unchanged(self, url: str, amended_on: str | None, csv_path: str, csv_sha256: str) -> bool:
+        """與上次爬取相比法規沒有修正，且 CSV 仍在 (不需要重寫)。"""
+        entry = self.get(url)
+        if entry is None or entry["status"] != "ok" or not os.path.exists(csv_path):
+            return False
+        if amended_on and entry["amended_on"]:
+            return amended_on == entry["amended_on"]
+        return csv_sha256 == entry["sha256"]
+
+    def _upsert(self, url: str, **values):
+        values = {"pcode": pcode_of(url), "crawled_at": _now(), **values}
+        columns = ", ".join(values)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in values)
+        with self._lock:
+            self.conn.execute(
+                f"INSERT INTO crawl_manifest (url, added_at, attempts, {columns}) "
+                f"VALUES (?, ?, 1, {', '.join('?' * len(values))}) "
+                f"ON CONFLICT (url) DO UPDATE SET {updates}, attempts = crawl_manifest.attempts + 1",
+                (url, _now(), *values.values()),
+            )
+
+    def record(self, url: str, law_name: str, amended_on: str | None, csv_path: str, csv_sha256: str, changed: bool):
+        # 修正日期與待匯入標記在同一列一起提交；沒有變動時保留原本的標記
+        flags = {"needs_ingest": 1} if changed else {}
+        self._upsert(url, law_name=law_name, amended_on=amended_on, csv=os.path.basename(csv_path),
+                     sha256=csv_sha256, status="ok", error=None, **flags)
+
+    def record_file(self, url: str, sha256: str):
+        """不是條文頁的檔案 (例如附件 PDF) 下載成功。"""
+        self._upsert(url, sha256=sha256, status="ok", error=None)
+
+    def record_failure(self, url: str, error: str):
+        self._upsert(url, status="failed", error=error)
+
+    def flush_changed(self, changed_path: str | None = None) -> int:
+        """
+        把標記 needs_ingest 的 CSV 併入 changed_laws.txt，寫入後才清除標記，回傳筆數。
+        寫完清單、清除標記前中止時下次會再併入一次 (清單為集合，不會重複)。
+        """
+        with self._lock:
+            rows = self.conn.execute("SELECT url, csv FROM crawl_manifest WHERE needs_ingest = 1").fetchall()
+            if not rows:
+                return 0
+            changed_path = changed_path or self.changed_path
+            with changed_laws_lock(changed_path):
+                pending = read_changed_laws(changed_path)
+                pending.update(row["csv"] for row in rows if row["csv"])
+                _write_changed_laws(pending, changed_path)
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.executemany(
+                "UPDATE crawl_manifest SET needs_ingest = 0 WHERE url = ?", [(row["url"],) for row in rows]
+            )
+            self.conn.execute("COMMIT")
+            return len(rows)
+
+    def save(self, changed_path: str | None = None):
+        """把有變動的 CSV 併入 changed_laws.txt (manifest 每次寫入時已提交)。"""
+        flushed = self.flush_changed(changed_path)
+        with self._lock:
+            counts = dict(self.conn.execute("SELECT status, count(*) FROM crawl_manifest GROUP BY status").fetchall())
+        print(f"[manifest] {flushed} new or amended laws, status={counts}")
+
+
+def csv_sha256(csv_text: str) -> str:
+    return hashlib.sha256(csv_text.encode("utf-8")).hexdigest()
+
+
+def read_changed_laws(path: str = CHANGED_LAWS) -> set[str]:
+    """待匯入的 CSV 檔名 (laws/ 下)。"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return {line.strip() for line in f if line.strip()}
+    except FileNotFoundError:
+        return set()
+
+
+@contextmanager
+def changed_laws_lock(path: str = CHANGED_LAWS):
+    """
+    changed_laws.txt 的行程間排他鎖。清單以暫存檔取代寫回 (inode 會換掉)，所以鎖在旁邊的 <path>.lock 上。
+    """
+    with open(f"{path}.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _write_changed_laws(names: set[str], path: str):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.writelines(name + "\n" for name in sorted(names))
+    os.replace(tmp, path)
+
+
+def remove_changed_laws(done: set[str], path: str = CHANGED_LAWS):
+    """從待匯入清單移除已匯入的 CSV (匯入期間新爬到的仍保留)。"""
+    with changed_laws_lock(path):
+        _write_changed_laws(read_changed_laws(path) - done, path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect and edit the crawl manifest")
+    parser.add_argument("--db", default=CRAWL_MANIFEST)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="count entries per status and list failures")
+    add_parser = sub.add_parser("add", help="add URLs")
+    add_parser.add_argument("urls", nargs="+")
+    import_parser = sub.add_parser("import", help="add every URL of a file (one per line)")
+    import_parser.add_argument("path")
+    args = parser.parse_args()
+
+    manifest = CrawlManifest(args.db)
+    if args.command == "status":
+        for status, count in manifest.conn.execute("SELECT status, count(*) FROM crawl_manifest GROUP BY status"):
+            print(f"{status:<8} {count}")
+        print(f"due      {len(manifest.due())} (pending, failed or older than {STALE_DAYS:g} days)")
+        for row in manifest.conn.execute("SELECT url, attempts, error FROM crawl_manifest WHERE status = 'failed'"):
+            print(f"failed   {row['url']} (attempts={row['attempts']}): {row['error']}")
+    elif args.command == "add":
+        print(f"Added {manifest.add_urls(args.urls)} URLs")
+    else:
+        print(f"Added {manifest.import_links(args.path)} URLs")
+    manifest.close()
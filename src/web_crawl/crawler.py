@@ -1,146 +1,205 @@
+import argparse
+import hashlib
+import json
 import time
-import requests
-from bs4 import BeautifulSoup
 from urllib.parse import unquote
 import pandas as pd
-import numpy as np
-database=pd.DataFrame([],columns=["actname","chapter","title","article"])
 import os
-import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    from .async_fetch import CRAWL_CONCURRENCY, CRAWL_RATE_PER_HOST, FetchResult, fetch_all, fetch_one, run_sync
+    from .crawl_manifest import STALE_DAYS, CrawlManifest, csv_sha256
+    from .http_cache import CRAWL_CACHE, CRAWL_OFFLINE
+    from .law_parser import DTYPES, parse_law, parse_law_page
+except ImportError:
+    from async_fetch import CRAWL_CONCURRENCY, CRAWL_RATE_PER_HOST, FetchResult, fetch_all, fetch_one, run_sync
+    from crawl_manifest import STALE_DAYS, CrawlManifest, csv_sha256
+    from http_cache import CRAWL_CACHE, CRAWL_OFFLINE
+    from law_parser import DTYPES, parse_law, parse_law_page
 
 #%%第二段
 #urls=[]
 # url = input('請輸入全國法規資料庫網址：')
 
-#urls=urls[0:6] 
+#urls=urls[0:6]
 #start_time=time.time()
 #print(start_time)
 
-def crawl_questions(url, filename):
-    web = requests.get(url)
-    soup = BeautifulSoup(web.text, "html.parser")
-    
-    # 找出所有 class='row' 的 div (條文) 和 class='char-2' 的 div (章節標題)
-    major_elements = soup.find_all('div', class_=['row', 'char-2']) 
-    
-    lawbase = pd.DataFrame([], columns=["actname", "chapter", "title", "subsection", "article"])
-    current_chapter = ""  # 初始化章節名稱
-
-    for element in major_elements:
-        
-        # 檢查是否為章節標題容器 (<div class="char-2">)
-        if 'char-2' in element.get('class', []):
-            
-            chapter_text = element.text.strip()
-            
-            # --- 關鍵正規表達式清理步驟 ---
-            # 1. 將 "第" 後面到 "章" 前面的所有空白字元 (\s 是所有空白字元的簡寫) 替換為空字串。
-            # 2. 如果你的空白是 \xa0 (非中斷空格)，\s 也通常能涵蓋。
-            #    如果你想更精確地匹配，可以使用 [\s\xa0]
-            # 模式：(第)(空白字元+)(章) -> 替換成 \1\3 (即：第 + 章)
-            cleaned_chapter_text = re.sub(
-                r"第\s*(.*?)\s*章",                      # 匹配「第 ... 章」
-                lambda m: "第" + m.group(1).replace(" ", "") + "章",  # 去除中間空白
-                chapter_text,
-                count=1                                 # 只處理第一個匹配
-            )
-            # 如果有多個空格，替換成單一空格
-            cleaned_chapter_text = re.sub(r"\s+", " ", cleaned_chapter_text)
-            
-            current_chapter = cleaned_chapter_text
-            
-        # 檢查是否為條文容器 (<div class="row">)
-        elif 'row' in element.get('class', []):
-            
-            title_div = element.find('div', class_='col-no')
-            article_div = element.find('div', class_='law-article')
-            if title_div and article_div:
-                all_lines = article_div.find_all('div', recursive=False)
-                current_subsection_id = 0
-
-                # 1. Prepare for iteration
-                current_section = None
-                for line in all_lines:
-                    line_classes = line.get('class', [])
-                    if 'line-0000' in line_classes and 'show-number' in line_classes:
-                        if current_section is not None:
-                            title_text = title_div.text.replace("本條文有附件", "").replace(" ", "").strip()
-                            exports = pd.DataFrame()
-                            exports["actname"] = [filename]
-                            exports["chapter"] = [current_chapter]
-                            exports["title"] = [title_text]
-                            exports["subsection"] = [current_subsection_id if current_subsection_id != 0 else np.nan]
-                            exports["article"] = [current_section]
-                            lawbase = pd.concat([lawbase, exports], ignore_index=True)
-                            current_section = None
-                        current_subsection_id += 1
-                    
-                    if current_section is None:
-                        current_section = line.text.strip()
-                    else:
-                        current_section += "\n" + line.text.strip()
-                
-                if current_section is not None:
-                    title_text = title_div.text.replace("本條文有附件", "").replace(" ", "").strip()
-                        
-                    exports = pd.DataFrame()
-                    exports["actname"] = [filename]
-                    exports["chapter"] = [current_chapter]
-                    exports["title"] = [title_text]
-                    exports["subsection"] = [current_subsection_id if current_subsection_id != 0 else np.nan]
-                    exports["article"] = [current_section]
-                    lawbase = pd.concat([lawbase, exports], ignore_index=True)
-                    current_section = None
+LAWS_DIR = os.path.join(os.path.dirname(__file__), "laws")
+PDFS_DIR = os.path.join(os.path.dirname(__file__), "pdfs")
+# --json：同一次解析的階層式 JSON (與 json/crawler_json.py 相同格式)
+JSON_DIR = os.path.join(os.path.dirname(__file__), "laws_json")
+
+
+def law_csv_path(filename: str, url: str) -> str:
+    return os.path.join(LAWS_DIR, "{}_{}.csv".format(filename, url.replace(":", "_").replace("/", "_").replace("?", "_")))
+
+
+def law_parquet_path(csv_path: str) -> str:
+    """與 CSV 同名的 Parquet (create_vector 優先讀取)。"""
+    return os.path.splitext(csv_path)[0] + ".parquet"
 
+
+def save_law_parquet(lawbase: pd.DataFrame, csv_path: str) -> str:
+    """以可為空的型別 (law_parser.DTYPES) 存成 Parquet，先寫暫存檔再改名。"""
+    path = law_parquet_path(csv_path)
+    tmp = f"{path}.tmp"
+    lawbase.astype(DTYPES).to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    return path
+
+
+def crawl_questions(url, filename):
+    """下載並解析條文頁，actname 使用 filename。"""
+    web = fetch_one(url)
+    _, lawbase = parse_law_page(web.text, actname=filename)
     return lawbase
 
-def web_crawl(urls: list[str]):
-    if os.path.exists("laws") is False:
-        os.mkdir("laws")
-    def process_url(url):
+
+def process_url(url: str) -> tuple[pd.DataFrame, str]:
+    """下載條文頁一次並解析，回傳 (DataFrame, 法規名稱)。"""
+    web = fetch_one(url)
+    if not web.ok:
+        raise RuntimeError(f"無法下載 {url}: {web.error or web.status}")
+    filename, lawbase = parse_law_page(web.text)
+    return lawbase, filename
+
+
+def _save_file(url: str, content: bytes):
+    # direct download file
+    filename = url.split("/")[-1]
+    os.makedirs(PDFS_DIR, exist_ok=True)
+    with open(os.path.join(PDFS_DIR, unquote(filename)), "wb") as file:
+        file.write(content)
+    print(f"檔案已下載並儲存為: {filename}")
+
+
+def save_law_csv(url: str, filename: str, lawbase: pd.DataFrame, manifest: CrawlManifest | None = None, queue_ingest: bool = True) -> str:
+    """
+    存成 laws/ 下的 CSV 與同名的 Parquet，回傳 CSV 路徑。有 manifest 時修正日期沒變的法規不重寫，
+    新的或有修正的法規記入待匯入清單 (queue_ingest=False 表示呼叫端會自行匯入)。
+    """
+    csv_path = law_csv_path(filename, url)
+    csv_text = lawbase.to_csv(index=False)
+    sha256 = csv_sha256(csv_text)
+    amended_on = lawbase.attrs.get("amended_on")
+    if manifest is not None and manifest.unchanged(url, amended_on, csv_path, sha256):
+        print(f"Unchanged (修正日期 {amended_on}):", csv_path)
+        changed = False
+        if not os.path.exists(law_parquet_path(csv_path)):
+            save_law_parquet(lawbase, csv_path)
+    else:
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            f.write(csv_text)
+        save_law_parquet(lawbase, csv_path)
+        print("Saved:", csv_path)
+        changed = True
+    if manifest is not None:
+        manifest.record(url, filename, amended_on, csv_path, sha256, changed and queue_ingest)
+    return csv_path
+
+
+def save_response(response: FetchResult, manifest: CrawlManifest | None = None, save_json: bool = False) -> bool:
+    """
+    處理下載好的回應：能解析成條文頁就存成 laws/ 下的 CSV (save_json 時同時存 laws_json/ 下的 JSON)，
+    否則 (例如附件 PDF) 直接把同一份回應內容存到 pdfs/，不再重新下載。
+    """
+    url = response.url
+    if response.error:
+        print(f"下載檔案時發生錯誤: {url} ({response.error})")
+        if manifest is not None:
+            manifest.record_failure(url, response.error)
+        return False
+    try:
+        page = parse_law(response.text)
+        save_law_csv(url, page.title, page.to_frame(), manifest)
+        if save_json:
+            os.makedirs(JSON_DIR, exist_ok=True)
+            with open(os.path.join(JSON_DIR, page.title + ".json"), "w", encoding="utf-8") as f:
+                json.dump(page.tree, f, ensure_ascii=False, indent=4)
+        return True
+    except Exception as err:
+        print("Error occurred, saving the response as a file:", url, "({})".format(err))
+        if response.status != 200:
+            print(f"無法下載檔案，HTTP 狀態碼: {response.status}")
+            if manifest is not None:
+                manifest.record_failure(url, f"HTTP {response.status}")
+            return False
         try:
-            database = pd.DataFrame([], columns=["actname", "chapter", "title", "subsection", "article"])
-            print("Crawling URL:", url)
-            web = requests.get(url)
-            soup = BeautifulSoup(web.text, "html.parser")
-            filename = soup.find('table').find('a').text
-            lawbase = crawl_questions(url, filename)
-            database = pd.concat([lawbase, database])
-            csv_path = os.path.join(os.path.dirname(__file__), "laws", "{}_{}.csv".format(filename, url.replace(":", "_").replace("/", "_").replace("?", "_")))
-            database.to_csv(csv_path, index=False)
-            print("Saved:", csv_path)
+            _save_file(url, response.content)
+            if manifest is not None:
+                manifest.record_file(url, hashlib.sha256(response.content).hexdigest())
             return True
-        except Exception as err:
-            # direct download file
-            print("Error occurred, trying to download file directly:", url, "({})".format(err))
-            try:
-                response = requests.get(url)
-                if response.status_code == 200:
-                    filename = url.split("/")[-1]
-                    if os.path.exists(os.path.join(os.path.dirname(__file__),"pdfs")) is False:
-                        os.mkdir("pdfs")
-                    with open(os.path.join(os.path.dirname(__file__), "pdfs", unquote(filename)), "wb") as file:
-                        file.write(response.content)
-                    print(f"檔案已下載並儲存為: {filename}")
-                else:
-                    print(f"無法下載檔案，HTTP 狀態碼: {response.status_code}")
-            except Exception as e:
-                print(f"下載檔案時發生錯誤: {e}")
-
-    # Use ThreadPoolExecutor to run N workers concurrently
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = [executor.submit(process_url, url) for url in urls]
-        for future in as_completed(futures):
-            # You can handle the result here if needed
-            future.result()
+        except Exception as e:
+            print(f"下載檔案時發生錯誤: {e}")
+            if manifest is not None:
+                manifest.record_failure(url, f"{type(e).__name__}: {e}")
+            return False
+
+
+def crawl_and_save(url: str) -> bool:
+    print("Crawling URL:", url)
+    return save_response(fetch_one(url))
+
+
+def web_crawl(
+    urls: list[str] | None = None,
+    concurrency: int = CRAWL_CONCURRENCY,
+    rate_per_host: float = CRAWL_RATE_PER_HOST,
+    cache: bool = CRAWL_CACHE,
+    offline: bool = CRAWL_OFFLINE,
+    save_json: bool = False,
+    stale_days: float | None = STALE_DAYS,
+) -> list[bool]:
+    """
+    以共用連線池非同步下載 urls (限制同時請求數與每個主機的速率)，回傳每個網址是否成功存檔。
+    urls 為 None 時從 crawl_manifest.db 挑出該爬的網址 (還沒爬過、上次失敗或超過 stale_days 天)。
+    有快取時送出條件式請求，offline=True 只使用快取。
+    結果與修正日期記錄在 crawl_manifest.db，沒有修正的法規不重寫 CSV，有變動的記入 changed_laws.txt。
+    """
+    os.makedirs(LAWS_DIR, exist_ok=True)
+    manifest = CrawlManifest()
+    if urls is None:
+        urls = manifest.due(stale_days)
+    else:
+        manifest.add_urls(urls)
+    print(f"Crawling {len(urls)} URLs")
+    try:
+        results, _ = run_sync(fetch_all(
+            urls, handler=lambda response: save_response(response, manifest, save_json),
+            concurrency=concurrency, rate_per_host=rate_per_host, cache=cache, offline=offline,
+        ))
+    finally:
+        manifest.save()
+        manifest.close()
+    return results
 
 
 if __name__ == "__main__":
-    with open(os.path.join(os.path.dirname(__file__),"links.txt"), "r") as file:
-        urls = [line.strip() for line in file.readlines()]
-    if os.path.exists("laws") is False:
-        os.mkdir("laws")
-    web_crawl(urls)
+    parser = argparse.ArgumentParser(description="Crawl the laws in the crawl manifest (links.txt is imported on first run)")
+    parser.add_argument("--concurrency", type=int, default=CRAWL_CONCURRENCY, help="requests in flight")
+    parser.add_argument("--rate", type=float, default=CRAWL_RATE_PER_HOST, help="requests per second per host (0 = unlimited)")
+    parser.add_argument("--offline", action="store_true", default=CRAWL_OFFLINE, help="serve only from the HTTP cache")
+    parser.add_argument("--no-cache", dest="cache", action="store_false", default=CRAWL_CACHE, help="do not read or write the HTTP cache")
+    parser.add_argument("--json", action="store_true", help="also write the hierarchical JSON of each law to laws_json/")
+    selection = parser.add_mutually_exclusive_group()
+    selection.add_argument("--all", action="store_true", help="crawl every URL in the manifest")
+    selection.add_argument("--failed", action="store_true", help="only retry URLs whose last crawl failed")
+    selection.add_argument("--stale-days", type=float, default=STALE_DAYS,
+                           help="besides new and failed URLs, recrawl URLs older than this many days")
+    parser.add_argument("--import-links", default=None, metavar="FILE", help="add the URLs of this file (e.g. links.txt) first")
+    args = parser.parse_args()
+
+    manifest = CrawlManifest()
+    if args.import_links:
+        print(f"Added {manifest.import_links(args.import_links)} URLs from {args.import_links}")
+    if args.all:
+        urls = list(manifest.entries())
+    elif args.failed:
+        urls = manifest.due(stale_days=None, statuses=("failed",))
+    else:
+        urls = manifest.due(args.stale_days)
+    manifest.close()
+    web_crawl(urls, concurrency=args.concurrency, rate_per_host=args.rate, cache=args.cache, offline=args.offline, save_json=args.json)
     #end_time=time.time()
-    #print("花費時間:",end_time-start_time)
\ No newline at end of file
+    #print("花費時間:",end_time-start_time)
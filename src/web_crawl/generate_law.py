@@ -3,12 +3,46 @@
 用途：根據輸入的法規名稱，從全國法規資料庫搜尋並返回該法規的連結
 """
 
-import requests
 from bs4 import BeautifulSoup
 from urllib.parse import quote
 import re
 import os
 
+try:
+    from .async_fetch import fetch_one
+    from .crawl_manifest import CRAWL_MANIFEST, CrawlManifest
+    from .law_catalog import get_catalog
+except ImportError:
+    from async_fetch import fetch_one
+    from crawl_manifest import CRAWL_MANIFEST, CrawlManifest
+    from law_catalog import get_catalog
+
+# 搜尋結果頁沒有 ETag / Last-Modified，一天內的搜尋結果直接使用快取
+SEARCH_CACHE_MAX_AGE = float(os.environ.get("SEARCH_CACHE_MAX_AGE", str(24 * 60 * 60)))
+
+
+def find_law_by_name(law_name):
+    """
+    以本機法規目錄 (law_catalog.py) 查詢法規，不連網；格式與 search_law_by_name 相同。
+    目錄還沒建立時才改用遠端搜尋。
+    """
+    catalog = get_catalog()
+    if catalog is None:
+        print("尚未建立本機法規目錄 (python law_catalog.py refresh)，改用遠端搜尋")
+        return search_law_by_name(law_name)
+    result = catalog.find(law_name)
+    if result is None:
+        print(f"找不到法規「{law_name}」")
+    return result
+
+
+def find_laws(law_name, limit=10):
+    """本機法規目錄中相近的法規 (目錄不存在時改用遠端搜尋)。"""
+    catalog = get_catalog()
+    if catalog is None:
+        return get_law_url_directly(law_name)
+    return catalog.search(law_name, limit)
+
 
 def search_law_by_name(law_name):
     """
@@ -45,21 +79,24 @@ def search_law_by_name(law_name):
     }
     
     try:
-        # 發送搜尋請求
-        response = requests.get(search_url, params=params, headers=headers, timeout=10)
-        response.encoding = 'utf-8'
+        # 發送搜尋請求 (經過快取)
+        response = fetch_one(search_url, params=params, max_age=SEARCH_CACHE_MAX_AGE, headers=headers, timeout=10)
+        if response.error:
+            print(f"網路請求錯誤：{response.error}")
+            return None
+        text = response.content.decode('utf-8', errors='replace')
         
-        if response.status_code != 200:
-            print(f"搜尋請求失敗，狀態碼：{response.status_code}")
+        if response.status != 200:
+            print(f"搜尋請求失敗，狀態碼：{response.status}")
             return None
         
         # 檢查是否為錯誤頁面
-        if 'ErrorPage.aspx' in response.url or '系統發生非預期錯誤' in response.text:
+        if 'ErrorPage.aspx' in (response.final_url or '') or '系統發生非預期錯誤' in text:
             print(f"網站返回錯誤，可能無法處理搜尋請求")
             return None
         
         # 解析 HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = BeautifulSoup(text, 'html.parser')
         
         # 尋找搜尋結果表格
         result_table = soup.find('table', class_='table')
@@ -115,9 +152,6 @@ def search_law_by_name(law_name):
         print(f"找不到法規「{law_name}」")
         return None
         
-    except requests.exceptions.RequestException as e:
-        print(f"網路請求錯誤：{e}")
-        return None
     except Exception as e:
         print(f"發生錯誤：{e}")
         return None
@@ -148,10 +182,9 @@ def get_law_url_directly(law_name):
     }
     
     try:
-        response = requests.get(search_url, params=params, headers=headers, timeout=10)
-        response.encoding = 'utf-8'
+        response = fetch_one(search_url, params=params, max_age=SEARCH_CACHE_MAX_AGE, headers=headers, timeout=10)
         
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = BeautifulSoup(response.content.decode('utf-8', errors='replace'), 'html.parser')
         
         # 尋找所有搜尋結果
         results = []
@@ -185,64 +218,34 @@ def get_law_url_directly(law_name):
         print(f"搜尋發生錯誤：{e}")
         return []
 
-def append_and_sort_file(new_url, filepath=os.path.join(os.path.dirname(__file__), "links.txt")):
+def add_link(new_url, manifest_path=CRAWL_MANIFEST):
     """
-    Appends a new URL to the file, then reads all lines, sorts them,
-    and writes the sorted list back to the file.
+    把網址加入爬取紀錄 (crawl_manifest.db，狀態為 pending，下次執行 crawler.py 時爬取)。
+    單列寫入，不再整份重寫 links.txt；回傳是否為新加入的網址。
     """
-
-    # 1. Read existing content (or start with an empty list if file doesn't exist)
-    lines = []
+    manifest = CrawlManifest(manifest_path)
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-    except FileNotFoundError:
-        # File doesn't exist yet, lines is already []
-        pass
-
-    # Clean up lines: remove trailing newlines and duplicates before adding the new URL
-    cleaned_lines = {line.strip() for line in lines if line.strip()}
-    
-    # Add the new URL (using a set prevents adding duplicates)
-    cleaned_lines.add(new_url.strip())
-
-    # 2. Convert back to a list for sorting
-    sorted_lines_list = list(cleaned_lines)
-    
-    # Sort the lines alphabetically
-    sorted_lines_list.sort() 
+        return manifest.add_urls([new_url]) > 0
+    finally:
+        manifest.close()
 
-    # 3. Write the sorted list back to the file, ensuring each has a newline
-    with open(filepath, 'w', encoding='utf-8') as f:
-        for line in sorted_lines_list:
-            f.write(line + '\n')
 
-def save_to_links_file(url, filename="links.txt"):
+def save_to_links_file(url, manifest_path=CRAWL_MANIFEST):
     """
-    將法規連結保存到 links.txt 檔案
+    將法規連結保存到爬取紀錄 (crawl_manifest.db)
     
     參數:
         url (str): 要保存的法規連結
-        filename (str): 目標檔案名稱，預設為 "links.txt"
+        manifest_path (str): 爬取紀錄的路徑，預設為 web_crawl/crawl_manifest.db
     
     返回:
         bool: 保存成功返回 True，失敗返回 False
     """
     try:
-        # 檢查連結是否已存在
-        if os.path.exists(os.path.join(os.path.dirname(__file__), filename)):
-            with open(os.path.join(os.path.dirname(__file__), filename), 'r', encoding='utf-8') as f:
-                existing_links = f.read().splitlines()
-                if url in existing_links:
-                    print(f"ℹ️  連結已存在於 {filename} 中")
-                    return True
-        
-        # # 將連結追加到檔案末尾
-        # with open(os.path.join(os.path.dirname(__file__), filename), 'a', encoding='utf-8') as f:
-        #     f.write(url + '\n')
-        append_and_sort_file(url, os.path.join(os.path.dirname(__file__), filename))
-        
-        print(f"連結已保存至 {filename}")
+        if add_link(url, manifest_path):
+            print(f"連結已保存至 {os.path.basename(manifest_path)}")
+        else:
+            print(f"ℹ️  連結已存在於 {os.path.basename(manifest_path)} 中")
         return True
         
     except Exception as e:
@@ -250,29 +253,27 @@ def save_to_links_file(url, filename="links.txt"):
         return False
 
 
-def search_and_save(law_name, filename="links.txt"):
+def search_and_save(law_name, manifest_path=CRAWL_MANIFEST):
     """
-    搜尋法規並自動保存到 links.txt
+    搜尋法規並自動保存到爬取紀錄 (crawl_manifest.db)
     
     參數:
         law_name (str): 法規名稱
-        filename (str): 目標檔案名稱，預設為 "links.txt"
+        manifest_path (str): 爬取紀錄的路徑，預設為 web_crawl/crawl_manifest.db
     
     返回:
         dict or None: 成功返回法規資訊字典，失敗返回 None
+        (只接受完全相同或前綴相符的名稱；模糊搜尋的結果可能是另一部法規，只列出供確認，不保存)
     """
-    result = search_law_by_name(law_name)
+    result = find_law_by_name(law_name)
     
     if result:
-        save_to_links_file(result['url'], filename)
+        save_to_links_file(result['url'], manifest_path)
         return result
-    else:
-        # 嘗試備用方法
-        results = get_law_url_directly(law_name)
-        if results:
-            save_to_links_file(results[0]['url'], filename)
-            return results[0]
-    
+
+    candidates = find_laws(law_name)
+    if candidates:
+        print(f"找不到「{law_name}」，相近的法規：{'、'.join(item['name'] for item in candidates)}")
     return None
 
 
@@ -298,8 +299,8 @@ def main():
         
         print(f"\n正在搜尋「{law_name}」...")
         
-        # 嘗試搜尋
-        result = search_law_by_name(law_name)
+        # 嘗試搜尋 (本機法規目錄)
+        result = find_law_by_name(law_name)
         
         if result:
             print("\n" + "=" * 60)
@@ -308,13 +309,13 @@ def main():
             print(f"法規連結：{result['url']}")
             print("=" * 60)
             
-            # 自動保存連結到 links.txt
+            # 自動保存連結到爬取紀錄
             save_to_links_file(result['url'])
             
         else:
             # 如果第一種方法失敗，嘗試第二種方法
             print("嘗試使用其他搜尋方式...")
-            results = get_law_url_directly(law_name)
+            results = find_laws(law_name)
             
             if results:
                 print(f"\n找到 {len(results)} 筆相關法規：")
@@ -327,7 +328,7 @@ def main():
                 
                 # 詢問是否要保存第一筆結果
                 if results:
-                    save_choice = input("\n是否要將第一筆結果保存到 links.txt？(y/n): ").strip().lower()
+                    save_choice = input("\n是否要將第一筆結果加入爬取紀錄？(y/n): ").strip().lower()
                     if save_choice in ['y', 'yes', '是']:
                         save_to_links_file(results[0]['url'])
             else:
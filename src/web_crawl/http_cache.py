@@ -0,0 +1,99 @@
+"""
+下載內容的磁碟快取
+
+每個網址 (含查詢參數) 存成 http_cache/<sha256>.body (原始 HTML / PDF) 與 <sha256>.json
+(網址、狀態碼、ETag、Last-Modified、Content-Type、編碼、下載時間)。
+
+- 線上：有 ETag / Last-Modified 時送出條件式請求 (If-None-Match / If-Modified-Since)，
+        內容沒變時伺服器只回 304，直接使用快取的內容
+- max_age：快取在 max_age 秒內視為新鮮，不發出請求 (用於沒有 ETag 的搜尋結果頁)
+- 離線 (CRAWL_OFFLINE=1 或 --offline)：只使用快取，沒有快取的網址視為失敗
+
+CRAWL_CACHE=0 停用快取，HTTP_CACHE_DIR 指定快取目錄。
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+HTTP_CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", os.path.join(os.path.dirname(__file__), "http_cache"))
+CRAWL_CACHE = os.environ.get("CRAWL_CACHE", "1") != "0"
+CRAWL_OFFLINE = os.environ.get("CRAWL_OFFLINE", "0") == "1"
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    status: int
+    etag: str | None = None
+    last_modified: str | None = None
+    content_type: str | None = None
+    encoding: str | None = None
+    final_url: str | None = None
+    fetched_at: float = 0.0
+
+    def validators(self) -> dict:
+        """條件式請求要帶的標頭。"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+
+class HttpCache:
+    def __init__(self, cache_dir: str = HTTP_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url: str, suffix: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + suffix)
+
+    def get(self, url: str) -> tuple[CacheEntry, bytes] | None:
+        try:
+            with open(self._path(url, ".json"), "r", encoding="utf-8") as f:
+                entry = CacheEntry(**json.load(f))
+            with open(self._path(url, ".body"), "rb") as f:
+                body = f.read()
+        except (FileNotFoundError, json.JSONDecodeError, TypeError):
+            return None
+        return entry, body
+
+    def put(self, url: str, status: int, headers: dict, body: bytes, encoding: str | None = None, final_url: str | None = None):
+        entry = CacheEntry(
+            url=url,
+            status=status,
+            etag=headers.get("etag"),
+            last_modified=headers.get("last-modified"),
+            content_type=headers.get("content-type"),
+            encoding=encoding,
+            final_url=final_url,
+            fetched_at=time.time(),
+        )
+        # 先寫內容再寫 metadata
+        _write_atomic(self._path(url, ".body"), body)
+        _write_atomic(self._path(url, ".json"), _dump(entry))
+        return entry
+
+    def touch(self, url: str, entry: CacheEntry):
+        """304 之後更新下載時間 (內容不變)。"""
+        entry.fetched_at = time.time()
+        _write_atomic(self._path(url, ".json"), _dump(entry))
+
+
+def _dump(entry: CacheEntry) -> bytes:
+    return json.dumps(asdict(entry), ensure_ascii=False).encode("utf-8")
+
+
+def _write_atomic(path: str, data: bytes):
+    """寫到暫存檔再 os.replace，其他行程或執行緒不會讀到寫到一半的檔案。"""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
@@ -6,67 +6,24 @@
 支援處理內嵌表格的複雜結構
 """
 
-import requests
-from bs4 import BeautifulSoup
 import json
-import re
 
-
-def parse_ascii_table(table_string):
-    """
-    解析 text-pre 格式的純文字表格字串，轉換為字典的列表 (List of Dictionaries)。
-    
-    Args:
-        table_string (str): 包含 ASCII 表格的字串
-        
-    Returns:
-        list: 字典列表，每個字典代表表格中的一行資料
-    """
-    lines = table_string.strip().split('\n')
-    
-    # 過濾掉邊框線 (包含─、┌、└、├的行)
-    data_lines = [line for line in lines if '─' not in line and '┌' not in line and '└' not in line]
-    
-    # 至少需要 標頭、次標頭、一筆資料
-    if len(data_lines) < 3:
-        return []
-
-    try:
-        # 處理標頭
-        header_main = data_lines[0].split('│')
-        header_sub = data_lines[1].split('│')
-        
-        # 組合出完整的標頭 ["種類", "垂直方向", "水平方向"]
-        headers = [
-            header_main[1].strip(), 
-            header_sub[1].strip(),
-            header_sub[2].strip()
-        ]
-
-        # 處理資料列
-        parsed_data = []
-        for row_line in data_lines[2:]: # 從第三行開始是資料
-            columns = [col.strip() for col in row_line.split('│')]
-            # 正常資料行分割後會有4個元素(因為前後都有│)，例如 ['', '單管施工架', '五', '五點五']
-            if len(columns) > len(headers):
-                row_data = {
-                    headers[0]: columns[1],
-                    headers[1]: columns[2],
-                    headers[2]: columns[3]
-                }
-                parsed_data.append(row_data)
-                
-        return parsed_data
-    except IndexError:
-        # 如果表格格式不如預期，返回空列表以避免程式崩潰
-        print("警告：解析表格時發生錯誤，可能格式有變。將跳過此表格。")
-        return []
+try:
+    from ..async_fetch import fetch_one
+    from ..law_parser import parse_ascii_table, parse_law  # noqa: F401  (parse_ascii_table 保留給舊的呼叫端)
+except ImportError:
+    # 直接執行 json/crawler_json.py 時從上一層 (web_crawl) 匯入
+    import os
+    import sys
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from async_fetch import fetch_one
+    from law_parser import parse_ascii_table, parse_law  # noqa: F401
 
 
 def scrape_law_data(url):
     """
     爬取指定 URL 的法規資料並轉換為 JSON 格式。
-    此版本能處理內嵌表格，並將其儲存為字典的列表。
+    解析與 crawler.py 共用 law_parser.parse_law (整頁只走訪一次)，內嵌的 text-pre 表格為字典的列表。
     
     Args:
         url (str): 要爬取的法規網址
@@ -77,96 +34,22 @@ def scrape_law_data(url):
     print(f"正在嘗試爬取網址: {url}")
     
     try:
-        # 1. 模擬瀏覽器發送請求
+        # 1. 模擬瀏覽器發送請求 (經過 web_crawl 的快取與重試，CRAWL_REPLAY_URL 時改向重播 server)
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/98.0.4758.102 Safari/537.36'
         }
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-        response.encoding = 'utf-8'
-        print("網頁原始碼獲取成功。")
-
-        # 2. 解析 HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # 3. 獲取法規標題 (修正：法規標題的正確 ID 是 'hlLawName')
-        law_title_element = soup.find('a', id='hlLawName')
-        if not law_title_element:
-            print("錯誤：在 HTML 中找不到法規標題 (id='hlLawName')。")
+        response = fetch_one(url, headers=headers, timeout=15)
+        if not response.ok:
+            print(f"網路連線或請求錯誤: {response.error or f'HTTP {response.status}'}")
             return None
-        law_title = law_title_element.text.strip()
-        print(f"成功找到法規標題: {law_title}")
-
-        # 準備資料結構
-        law_data = {law_title: {}}
-
-        # 4. 查找所有法規內容的父容器 (修正：主要內容區塊的 ID 是 'pnLawFla')
-        content_container = soup.find('div', id='pnLawFla')
-        if not content_container:
-            print("錯誤：找不到主要的法規內容容器 (id='pnLawFla')。")
-            return None
-            
-        # 修正：遍歷內容區塊的所有子元素來區分章節和條文
-        # law-reg-content 是實際包含章節和條文的 div
-        current_chapter_key = ""
-        elements = content_container.find('div', class_='law-reg-content').find_all(recursive=False)
-
-        for element in elements:
-            # 檢查這個元素是不是章節標題 (修正：章節標題的 class 是 'h3 char-2')
-            if 'h3' in element.get('class', []) and 'char-2' in element.get('class', []):
-                chapter_text = element.get_text(strip=True)
-                match = re.match(r'(第\s*\S+\s*章)\s*(.*)', chapter_text)
-                if match:
-                    current_chapter_key = match.group(1).replace(" ", "")
-                    chapter_name = match.group(2)
-                    law_data[law_title][current_chapter_key] = {"name": chapter_name}
-                else: # 處理沒有 "第 X 章" 的情況，例如附則
-                    current_chapter_key = chapter_text
-                    law_data[law_title][current_chapter_key] = {"name": ""}
-                continue
-
-            # 檢查這個元素是不是條文 (修正：每個條文都包在 class 'row' 的 div 中)
-            if 'row' in element.get('class', []):
-                article_no_element = element.find('div', class_='col-no')
-                article_data_element = element.find('div', class_='col-data')
-
-                if article_no_element and article_data_element:
-                    article_no = article_no_element.get_text(strip=True)
-                    
-                    paragraphs = []
-                    law_article_container = article_data_element.find('div', class_='law-article')
-                    if law_article_container:
-                        content_divs = law_article_container.find_all('div', recursive=False)
-                        for content_div in content_divs:
-                            if 'text-pre' in content_div.get('class', []):
-                                table_raw_text = content_div.get_text()
-                                parsed_table = parse_ascii_table(table_raw_text)
-                                
-                                # 直接將解析後的字典列表作為一個元素加入
-                                if parsed_table: # 確保解析成功才加入
-                                    paragraphs.append(parsed_table)
-                            else:
-                                p_text = content_div.get_text(strip=True)
-                                if p_text:
-                                    paragraphs.append(p_text)
-                    else:
-                        # 舊版本相容性：內容被包在多個 div 中，其 class 命名為 "line-xxxx"
-                        content_divs = article_data_element.find_all('div', class_=re.compile(r'line-\d+'))
-                        paragraphs = [div.get_text(strip=True) for div in content_divs if div.get_text(strip=True)]
-                    
-                    if not current_chapter_key:
-                        current_chapter_key = "未分類"
-                        law_data[law_title][current_chapter_key] = {"name": ""}
-
-                    if paragraphs:
-                        law_data[law_title][current_chapter_key][article_no] = paragraphs
+        print("網頁原始碼獲取成功。")
 
-        print("所有法條解析完成。")
-        return law_data
+        # 2. 解析 HTML (章節、條文與表格)
+        page = parse_law(response.content.decode('utf-8', errors='replace'))
+        print(f"成功找到法規標題: {page.title}")
+        print(f"所有法條解析完成，共 {len(page.tables)} 個表格。")
+        return page.tree
 
-    except requests.exceptions.RequestException as e:
-        print(f"網路連線或請求錯誤: {e}")
-        return None
     except Exception as e:
         print(f"處理資料時發生未預期的錯誤: {e}")
         return None
@@ -0,0 +1,212 @@
+"""
+本機法規目錄 (law_catalog.json)：所有法規名稱與 pcode，查詢名稱不需要連網
+
+    python law_catalog.py refresh                  # 下載全國法規資料庫的開放資料 (法律 + 命令) 重建目錄
+    python law_catalog.py refresh --from-manifest  # 不連網：由 crawl_manifest.db 已爬過的法規建立
+    python law_catalog.py find 勞動基準法
+
+載入後建立記憶體索引，依序以
+完全相同 → 開頭相同 (最短的名稱) → 包含 → 模糊比對 (字元 bigram 取候選，再以 difflib 比較相似度)
+找出法規；已廢止的法規排在後面。名稱比對前會去除空白、半形括號轉為全形。
+"""
+import argparse
+import bisect
+import difflib
+import io
+import json
+import os
+import re
+import zipfile
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+try:
+    from .async_fetch import fetch_one
+    from .crawl_manifest import CRAWL_MANIFEST, CrawlManifest
+except ImportError:
+    from async_fetch import fetch_one
+    from crawl_manifest import CRAWL_MANIFEST, CrawlManifest
+
+LAW_CATALOG = os.environ.get("LAW_CATALOG", os.path.join(os.path.dirname(__file__), "law_catalog.json"))
+# 全國法規資料庫開放資料：法律與命令的完整 JSON (zip)
+CATALOG_SOURCES = [
+    "https://law.moj.gov.tw/api/Ch/Law/JSON",
+    "https://law.moj.gov.tw/api/Ch/Order/JSON",
+]
+LAW_URL = "https://law.moj.gov.tw/LawClass/LawAll.aspx?pcode={}"
+# 模糊比對的最低相似度
+FUZZY_CUTOFF = 0.6
+
+_PCODE = re.compile(r"pcode=([A-Za-z0-9]+)", re.IGNORECASE)
+
+
+def normalize_name(name: str) -> str:
+    return re.sub(r"\s+", "", name).replace("(", "（").replace(")", "）")
+
+
+def _bigrams(text: str) -> set[str]:
+    return {text[i:i + 2] for i in range(len(text) - 1)} or {text}
+
+
+class LawCatalog:
+    def __init__(self, laws: list[dict]):
+        # 未廢止的法規在前，同名時以未廢止的為準
+        self.laws = sorted(laws, key=lambda law: (law.get("abandoned", False), law["pcode"]))
+        self.keys = [normalize_name(law["name"]) for law in self.laws]
+        self.exact = {}
+        for i, key in enumerate(self.keys):
+            self.exact.setdefault(key, i)
+        self.sorted_keys = sorted((key, i) for i, key in enumerate(self.keys))
+        self.bigram_index = defaultdict(list)
+        for i, key in enumerate(self.keys):
+            for gram in _bigrams(key):
+                self.bigram_index[gram].append(i)
+
+    @classmethod
+    def load(cls, path: str = LAW_CATALOG) -> "LawCatalog":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f)["laws"])
+
+    def _result(self, i: int) -> dict:
+        law = self.laws[i]
+        return {"name": law["name"], "url": LAW_URL.format(law["pcode"]), "pcode": law["pcode"]}
+
+    def _prefix(self, key: str) -> list[int]:
+        start = bisect.bisect_left(self.sorted_keys, (key,))
+        matches = []
+        for candidate, i in self.sorted_keys[start:]:
+            if not candidate.startswith(key):
+                break
+            matches.append(i)
+        return sorted(matches, key=lambda i: (len(self.keys[i]), i))
+
+    def _fuzzy(self, key: str, limit: int) -> list[int]:
+        overlap = Counter()
+        for gram in _bigrams(key):
+            overlap.update(self.bigram_index.get(gram, ()))
+        scored = []
+        for i, _ in overlap.most_common(50):
+            ratio = difflib.SequenceMatcher(None, key, self.keys[i]).ratio()
+            if ratio >= FUZZY_CUTOFF:
+                scored.append((-ratio, i))
+        return [i for _, i in sorted(scored)[:limit]]
+
+    def search(self, name: str, limit: int = 10) -> list[dict]:
+        """依完全相同、開頭相同、包含、模糊比對的順序回傳最多 limit 筆 (name, url, pcode)。"""
+        key = normalize_name(name)
+        if not key:
+            return []
+        found = []
+        if key in self.exact:
+            found.append(self.exact[key])
+        found += self._prefix(key)
+        if len(found) < limit:
+            found += [i for i, candidate in enumerate(self.keys) if key in candidate]
+        if len(found) < limit:
+            found += self._fuzzy(key, limit)
+        seen = set()
+        results = []
+        for i in found:
+            if i not in seen:
+                seen.add(i)
+                results.append(self._result(i))
+        return results[:limit]
+
+    def find(self, name: str) -> dict | None:
+        """
+        名稱完全相同 (或以 name 開頭中最短) 的一筆，找不到時為 None。
+        不做包含與模糊比對：找到的是另一部法規時 add_single_law 會爬取、匯入錯誤的法規；
+        相近的名稱請用 search() 列出。
+        """
+        key = normalize_name(name)
+        if not key:
+            return None
+        if key in self.exact:
+            return self._result(self.exact[key])
+        prefix = self._prefix(key)
+        return self._result(prefix[0]) if prefix else None
+
+
+_catalog = None
+
+
+def get_catalog(path: str = LAW_CATALOG) -> LawCatalog | None:
+    """載入一次後重複使用；目錄不存在時為 None。"""
+    global _catalog
+    if _catalog is None and os.path.exists(path):
+        _catalog = LawCatalog.load(path)
+    return _catalog
+
+
+def _save(laws: list[dict], source: str, path: str):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"updated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"), "source": source,
+                   "laws": laws}, f, ensure_ascii=False)
+    os.replace(tmp, path)
+    global _catalog
+    _catalog = None
+    print(f"[catalog] {len(laws)} laws saved to {path}")
+
+
+def refresh(path: str = LAW_CATALOG, sources: list[str] = CATALOG_SOURCES):
+    """下載開放資料 (zip 內為 JSON，含 BOM) 重建目錄。"""
+    laws = {}
+    for url in sources:
+        response = fetch_one(url)
+        if not response.ok:
+            raise RuntimeError(f"無法下載 {url}: {response.error or response.status}")
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            member = next(name for name in archive.namelist() if name.lower().endswith(".json"))
+            data = json.loads(archive.read(member).decode("utf-8-sig"))
+        for law in data["Laws"]:
+            match = _PCODE.search(law.get("LawURL", ""))
+            if not match:
+                continue
+            laws[match.group(1)] = {
+                "name": law["LawName"],
+                "pcode": match.group(1),
+                "level": law.get("LawLevel"),
+                "modified": law.get("LawModifiedDate"),
+                "abandoned": bool(law.get("LawAbandonNote")),
+            }
+        print(f"[catalog] {url}: {len(data['Laws'])} laws (updated {data.get('UpdateDate')})")
+    _save(list(laws.values()), "open data", path)
+
+
+def refresh_from_manifest(path: str = LAW_CATALOG, manifest_path: str = CRAWL_MANIFEST):
+    """以已爬過的法規 (crawl_manifest.db 中有法規名稱的網址) 建立目錄，不連網。"""
+    manifest = CrawlManifest(manifest_path)
+    try:
+        entries = manifest.entries()
+    finally:
+        manifest.close()
+    laws = {}
+    for url, entry in entries.items():
+        if entry["pcode"] and entry["law_name"]:
+            laws[entry["pcode"]] = {"name": entry["law_name"], "pcode": entry["pcode"], "modified": entry["amended_on"]}
+    _save(list(laws.values()), "crawl manifest", path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local catalog of law names and pcodes")
+    parser.add_argument("--catalog", default=LAW_CATALOG)
+    sub = parser.add_subparsers(dest="command", required=True)
+    refresh_parser = sub.add_parser("refresh", help="rebuild the catalog")
+    refresh_parser.add_argument("--from-manifest", action="store_true", help="use crawl_manifest.db instead of the open data download")
+    find_parser = sub.add_parser("find", help="look up a law name")
+    find_parser.add_argument("name")
+    find_parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == "refresh":
+        if args.from_manifest:
+            refresh_from_manifest(args.catalog)
+        else:
+            refresh(args.catalog)
+    else:
+        catalog = get_catalog(args.catalog)
+        if catalog is None:
+            parser.error(f"{args.catalog} does not exist, run: python law_catalog.py refresh")
+        for result in catalog.search(args.name, args.limit):
+            print(f"{result['pcode']:<10} {result['name']}  {result['url']}")
@@ -0,0 +1,265 @@
+"""
+全國法規資料庫條文頁 (LawAll.aspx) 解析器
+
+頁面只下載、解析一次：同一份 soup 先取出法規名稱，再依序走訪章節與條文一次，同時產生
+- 扁平的資料列 (法規, 章, 條, 項, 內容, 種類)：crawler.py 存成 CSV 與 Parquet (DTYPES)，供 create_vector.process_df 使用
+- 階層式 JSON {法規: {章: {"name": 章名, 條: [段落...]}}}：json/crawler_json.py 的輸出格式
+- text-pre 純文字表格解析成的結構化資料列：JSON 中為字典的列表；扁平資料列中表格的每一列是一筆
+  kind="table" 的資料列 (「欄位：值；欄位：值」)，與條文分開切塊、編碼，條文 (kind="article") 不含表格框線文字
+
+頁首的修正日期 (從未修正的法規為公發布日) 轉成西元 YYYY-MM-DD，放在 df.attrs["amended_on"]，
+供 crawl_manifest 判斷法規是否有修正。
+
+安裝 lxml 時預設使用較快的 lxml 解析器，也可以用 LAW_HTML_PARSER=html.parser 指定。
+"""
+import os
+import re
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+from bs4 import BeautifulSoup
+
+try:
+    import lxml  # noqa: F401
+    _DEFAULT_PARSER = "lxml"
+except ImportError:
+    _DEFAULT_PARSER = "html.parser"
+
+HTML_PARSER = os.environ.get("LAW_HTML_PARSER", _DEFAULT_PARSER)
+
+COLUMNS = ["actname", "chapter", "title", "subsection", "article", "kind"]
+# 可為空的型別：沒有章的條文 chapter 為 NA，沒有項的條文 subsection 為 NA (Parquet 中為 null)
+DTYPES = {
+    "actname": "string",
+    "chapter": "string",
+    "title": "string",
+    "subsection": "Int64",
+    "article": "string",
+    "kind": "string",
+}
+
+_CHAPTER_NO = re.compile(r"第\s*(.*?)\s*章")
+_JSON_CHAPTER = re.compile(r"(第\s*\S+\s*章)\s*(.*)")
+_LEGACY_LINE = re.compile(r"line-\d+")
+_SPACES = re.compile(r"\s+")
+_ROC_DATE = re.compile(r"民國\s*(\d+)\s*年\s*(\d+)\s*月\s*(\d+)\s*日")
+# 依序尋找的日期欄位
+_DATE_LABELS = (re.compile("修正日期"), re.compile("公發布日"))
+# 表格框線 (含框線字元的行不是資料)
+_TABLE_BORDER = re.compile(r"[─┌└├┬┴┼┐┘┤]")
+
+
+@dataclass
+class LawPage:
+    title: str
+    amended_on: str | None
+    # 扁平資料列 (COLUMNS)
+    rows: list[dict] = field(default_factory=list)
+    # {法規名稱: {章: {"name": 章名, 條號: [段落或表格]}}}
+    tree: dict = field(default_factory=dict)
+    # (條號, 項號, 表格資料列)，依頁面順序
+    tables: list[tuple[str, int | None, list[dict]]] = field(default_factory=list)
+
+    def to_frame(self) -> pd.DataFrame:
+        df = pd.DataFrame(self.rows, columns=COLUMNS).astype(DTYPES)
+        # 項號為整數，沒有項的條文與沒有章的條文為空值 (寫成 CSV 時為 "1" 與 "")
+        df["chapter"] = df["chapter"].mask(df["chapter"] == "")
+        df.attrs["amended_on"] = self.amended_on
+        return df
+
+
+def clean_chapter(chapter_text: str) -> str:
+    """「第 一 章  總則」→「第一章 總則」"""
+    # 模式：(第)(空白字元+)(章) -> 去除「第」與「章」之間的空白，只處理第一個匹配
+    cleaned = _CHAPTER_NO.sub(lambda m: "第" + m.group(1).replace(" ", "") + "章", chapter_text, count=1)
+    # 如果有多個空格，替換成單一空格
+    return _SPACES.sub(" ", cleaned)
+
+
+def law_title(soup: BeautifulSoup) -> str:
+    """頁首表格中的法規名稱 (存檔名稱與 actname 都用它)。"""
+    return soup.find("table").find("a").text
+
+
+def amendment_date(soup: BeautifulSoup) -> str | None:
+    """頁首的修正日期 (沒有時為公發布日)，「民國 113 年 07 月 31 日」→「2024-07-31」，找不到時為 None。"""
+    for label in _DATE_LABELS:
+        node = soup.find(string=label)
+        if node is None:
+            continue
+        container = node.find_parent("tr") or node.parent
+        match = _ROC_DATE.search(container.get_text())
+        if match:
+            year, month, day = (int(x) for x in match.groups())
+            return f"{year + 1911:04d}-{month:02d}-{day:02d}"
+    return None
+
+
+def _table_cells(line: str) -> list[str]:
+    cells = [cell.strip() for cell in line.split("│")[1:]]
+    if line.rstrip().endswith("│"):
+        cells = cells[:-1]
+    return cells
+
+
+def parse_ascii_table(table_string: str) -> list[dict]:
+    """
+    解析 text-pre 格式的純文字表格，回傳字典的列表 (每個字典為一列)。
+
+    第一行為標頭；資料列比第一行多欄時，第二行視為次標頭 (例如「種類│間距」下的「垂直方向│水平方向」)，
+    標頭為第一行的第一欄加上次標頭。第一欄空白的資料列視為上一列的延續 (儲存格內換行)。
+    格式不如預期時回傳空列表。
+    """
+    rows = [_table_cells(line) for line in table_string.strip().split("\n") if not _TABLE_BORDER.search(line)]
+    rows = [row for row in rows if row]
+    # 至少需要 標頭、一筆資料
+    if len(rows) < 2:
+        return []
+    width = max(len(row) for row in rows[1:])
+    if len(rows[0]) == width:
+        headers, data = rows[0], rows[1:]
+    elif len(rows) >= 3 and len(rows[1]) >= width - 1:
+        headers, data = [rows[0][0]] + rows[1][:width - 1], rows[2:]
+    else:
+        # 如果表格格式不如預期，返回空列表以避免程式崩潰
+        print("警告：解析表格時發生錯誤，可能格式有變。將跳過此表格。")
+        return []
+
+    parsed = []
+    for row in data:
+        if len(row) != width:
+            continue
+        if parsed and not row[0]:
+            for header, value in zip(headers, row):
+                if value:
+                    parsed[-1][header] += value
+            continue
+        parsed.append(dict(zip(headers, row)))
+    return parsed
+
+
+def table_row_text(row: dict) -> str:
+    """表格的一列 →「種類：單管施工架；垂直方向：五；水平方向：五點五」"""
+    return "；".join(f"{header}：{value}" for header, value in row.items() if value)
+
+
+def _json_chapter(text: str) -> tuple[str, str]:
+    match = _JSON_CHAPTER.match(text)
+    if match:
+        return match.group(1).replace(" ", ""), match.group(2)
+    # 沒有「第 X 章」的章節 (例如附則) 以整段文字為鍵
+    return text, ""
+
+
+def walk_law_page(soup: BeautifulSoup, actname: str) -> Iterator[tuple[str, object]]:
+    """
+    依頁面順序走訪章節與條文一次，產生 (種類, 內容)：
+    ("chapter", (CSV 章名, JSON 章鍵, JSON 章名))、("row", 扁平資料列)、
+    ("table", (條號, 項號, 表格資料列))、("article", (JSON 條號, 段落列表))。
+    """
+    current_chapter = ""
+    # class='row' 的 div 為條文，class='char-2' 的 div 為章節標題
+    for element in soup.find_all("div", class_=["row", "char-2"]):
+        classes = element.get("class", [])
+        if "char-2" in classes:
+            current_chapter = clean_chapter(element.text.strip())
+            yield "chapter", (current_chapter, *_json_chapter(element.get_text(strip=True)))
+            continue
+
+        title_div = element.find("div", class_="col-no")
+        if not title_div:
+            continue
+        article_div = element.find("div", class_="law-article")
+        if not article_div:
+            # 舊版本相容性：內容被包在多個 class 為 "line-xxxx" 的 div 中 (只有 JSON 使用)
+            data_div = element.find("div", class_="col-data")
+            if data_div:
+                paragraphs = [div.get_text(strip=True) for div in data_div.find_all("div", class_=_LEGACY_LINE)]
+                yield "article", (title_div.get_text(strip=True), [p for p in paragraphs if p])
+            continue
+        title_text = title_div.text.replace("本條文有附件", "").replace(" ", "").strip()
+
+        subsection_id = 0
+        lines = []
+        paragraphs = []
+        tables = []
+        for line in article_div.find_all("div", recursive=False):
+            line_classes = line.get("class", [])
+            if "line-0000" in line_classes and "show-number" in line_classes:
+                if lines:
+                    yield "row", _row(actname, current_chapter, title_text, subsection_id, lines)
+                    lines = []
+                subsection_id += 1
+            if "text-pre" in line_classes:
+                table = parse_ascii_table(line.get_text())
+                if table:
+                    # 表格另外成為 kind="table" 的資料列，不放進條文內容
+                    paragraphs.append(table)
+                    tables.append((subsection_id, table))
+                    continue
+            else:
+                text = line.get_text(strip=True)
+                if text:
+                    paragraphs.append(text)
+            lines.append(line.text.strip())
+        if lines:
+            yield "row", _row(actname, current_chapter, title_text, subsection_id, lines)
+        for table_subsection, table in tables:
+            yield "table", (title_text, table_subsection or None, table)
+            for table_row in table:
+                yield "row", _row(actname, current_chapter, title_text, table_subsection, [table_row_text(table_row)], kind="table")
+        yield "article", (title_div.get_text(strip=True), paragraphs)
+
+
+def iter_law_rows(soup: BeautifulSoup, actname: str) -> Iterator[dict]:
+    """依頁面順序產生每一項條文 (一條中以 show-number 開頭的每一段為一項) 與表格的每一列。"""
+    for kind, value in walk_law_page(soup, actname):
+        if kind == "row":
+            yield value
+
+
+def _row(actname: str, chapter: str, title: str, subsection_id: int, lines: list[str], kind: str = "article") -> dict:
+    return {
+        "actname": actname,
+        "chapter": chapter,
+        "title": title,
+        "subsection": subsection_id if subsection_id != 0 else np.nan,
+        "article": "\n".join(lines),
+        "kind": kind,
+    }
+
+
+def parse_law(html: str, actname: str | None = None, parser: str = HTML_PARSER) -> LawPage:
+    """解析條文頁一次，同時建立扁平資料列、階層式 JSON 與表格。actname 未指定時使用頁面上的法規名稱。"""
+    soup = BeautifulSoup(html, parser)
+    title = law_title(soup)
+    page = LawPage(title=title, amended_on=amendment_date(soup))
+    chapters = page.tree.setdefault(title, {})
+    chapter_key = ""
+    for kind, value in walk_law_page(soup, actname or title):
+        if kind == "row":
+            page.rows.append(value)
+        elif kind == "chapter":
+            _, chapter_key, chapter_name = value
+            chapters[chapter_key] = {"name": chapter_name}
+        elif kind == "table":
+            page.tables.append(value)
+        else:
+            article_no, paragraphs = value
+            if not chapter_key:
+                chapter_key = "未分類"
+                chapters[chapter_key] = {"name": ""}
+            if paragraphs:
+                chapters[chapter_key][article_no] = paragraphs
+    return page
+
+
+def parse_law_page(html: str, actname: str | None = None, parser: str = HTML_PARSER) -> tuple[str, pd.DataFrame]:
+    """
+    解析條文頁，回傳 (法規名稱, DataFrame)。actname 未指定時使用頁面上的法規名稱。
+    df.attrs["amended_on"] 為修正日期 (YYYY-MM-DD 或 None)。
+    """
+    page = parse_law(html, actname, parser)
+    return page.title, page.to_frame()
@@ -0,0 +1,248 @@
+"""
+錄製 / 重播全國法規資料庫的回應，離線測試爬蟲與量測效能
+
+    python replay.py record --urls links.txt            # 下載 links.txt 的網址存成 fixtures/
+    python replay.py record --from-cache                # 或把 http_cache/ 中已下載的回應 (含搜尋結果頁) 轉成 fixtures
+    python replay.py serve --port 8765 --latency 0.05 --error-rate 0.05
+    CRAWL_REPLAY_URL=http://127.0.0.1:8765 python crawler.py --no-cache
+    python replay.py bench --latency 0.05 --concurrency 8   # 內建 server，量測下載量與解析時間
+
+fixtures/index.json 以「主機 + 路徑 + 排序後的查詢參數」為鍵，記錄狀態碼、Content-Type、ETag、Last-Modified
+與內容檔名 (fixtures/<sha256>.body)。設定 CRAWL_REPLAY_URL 後 async_fetch 會把 https://host/path?query
+改送到 <CRAWL_REPLAY_URL>/host/path?query，由這個 server 依鍵找出錄製的回應；沒有錄製的網址回 404。
+延遲 (--latency / --jitter) 與錯誤 (--error-rate 機率回 --error-status) 以 --seed 固定亂數，結果可重現。
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+try:
+    from .async_fetch import AsyncFetcher, fetch_all, run_sync
+    from .http_cache import HTTP_CACHE_DIR
+    from .law_parser import parse_law_page
+except ImportError:
+    from async_fetch import AsyncFetcher, fetch_all, run_sync
+    from http_cache import HTTP_CACHE_DIR
+    from law_parser import parse_law_page
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def fixture_key(url: str) -> str:
+    """主機 + 路徑 + 排序後的查詢參數 (參數名稱不分大小寫，例如 PCODE / pcode)。"""
+    parts = urlsplit(url)
+    query = sorted((k.lower(), v) for k, v in parse_qsl(parts.query, keep_blank_values=True))
+    return parts.netloc.lower() + parts.path + ("?" + urlencode(query) if query else "")
+
+
+class Fixtures:
+    def __init__(self, fixtures_dir: str = FIXTURES_DIR):
+        self.dir = fixtures_dir
+        os.makedirs(fixtures_dir, exist_ok=True)
+        self.index_path = os.path.join(fixtures_dir, "index.json")
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.index = json.load(f)
+        except FileNotFoundError:
+            self.index = {}
+        self._lock = threading.Lock()
+
+    def add(self, url: str, status: int, body: bytes, headers: dict):
+        name = hashlib.sha256(body).hexdigest() + ".body"
+        with open(os.path.join(self.dir, name), "wb") as f:
+            f.write(body)
+        with self._lock:
+            self.index[fixture_key(url)] = {
+                "url": url,
+                "status": status,
+                "file": name,
+                "content_type": headers.get("content-type"),
+                "etag": headers.get("etag"),
+                "last_modified": headers.get("last-modified"),
+            }
+
+    def get(self, key: str) -> tuple[dict, bytes] | None:
+        entry = self.index.get(key)
+        if entry is None:
+            return None
+        with open(os.path.join(self.dir, entry["file"]), "rb") as f:
+            return entry, f.read()
+
+    def urls(self, contains: str = "") -> list[str]:
+        return sorted(entry["url"] for entry in self.index.values() if contains in entry["url"])
+
+    def save(self):
+        with open(self.index_path, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"[replay] {len(self.index)} responses in {self.dir}")
+
+
+def record_urls(fixtures: Fixtures, urls: list[str], **fetcher_kwargs):
+    """下載 urls (不經過快取) 並存成 fixtures。"""
+    def handler(result):
+        if result.status is not None:
+            fixtures.add(result.url, result.status, result.content, result.headers)
+
+    run_sync(fetch_all(urls, handler=handler, cache=False, **fetcher_kwargs))
+    fixtures.save()
+
+
+def record_from_cache(fixtures: Fixtures, cache_dir: str = HTTP_CACHE_DIR):
+    """把 http_cache 中的回應轉成 fixtures (不連網)。"""
+    for item in sorted(os.listdir(cache_dir)):
+        if not item.endswith(".json"):
+            continue
+        with open(os.path.join(cache_dir, item), "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        with open(os.path.join(cache_dir, item[:-len(".json")] + ".body"), "rb") as f:
+            body = f.read()
+        headers = {"content-type": entry.get("content_type"), "etag": entry.get("etag"),
+                   "last-modified": entry.get("last_modified")}
+        fixtures.add(entry["url"], entry["status"], body, headers)
+    fixtures.save()
+
+
+def make_handler(fixtures: Fixtures, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503, seed: int = 0):
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+
+    class ReplayHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            with rng_lock:
+                delay = latency + rng.uniform(0, jitter)
+                fail = rng.random() < error_rate
+            time.sleep(delay)
+            if fail:
+                return self._send(error_status, b"injected error", {"Content-Type": "text/plain"})
+            # /<host>/<path>?<query> → 原本的網址
+            found = fixtures.get(fixture_key("http:/" + self.path))
+            if found is None:
+                return self._send(404, b"not recorded", {"Content-Type": "text/plain"})
+            entry, body = found
+            headers = {"Content-Type": entry["content_type"] or "application/octet-stream"}
+            if entry["etag"]:
+                headers["ETag"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["Last-Modified"] = entry["last_modified"]
+            if entry["etag"] and self.headers.get("If-None-Match") == entry["etag"]:
+                return self._send(304, b"", headers)
+            self._send(entry["status"], body, headers)
+
+        def _send(self, status: int, body: bytes, headers: dict):
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ReplayHandler
+
+
+def start_server(fixtures: Fixtures, host: str = "127.0.0.1", port: int = 0, **handler_kwargs) -> ThreadingHTTPServer:
+    """在背景執行緒啟動重播 server (port=0 時自動選一個)，回傳 server。"""
+    server = ThreadingHTTPServer((host, port), make_handler(fixtures, **handler_kwargs))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def bench(fixtures: Fixtures, concurrency: int, rate_per_host: float, **handler_kwargs) -> dict:
+    """對內建的重播 server 下載所有條文頁並解析，回傳下載量與解析時間。"""
+    urls = fixtures.urls("LawAll.aspx")
+    server = start_server(fixtures, **handler_kwargs)
+    replay_url = f"http://{server.server_address[0]}:{server.server_address[1]}"
+    parse_ms = []
+
+    def handler(result):
+        if result.ok:
+            start = time.perf_counter()
+            parse_law_page(result.text)
+            parse_ms.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    fetcher = AsyncFetcher(concurrency=concurrency, rate_per_host=rate_per_host, cache=False, backoff=0.05, replay_url=replay_url)
+    _, summary = run_sync(fetch_all(urls, handler=handler, fetcher=fetcher))
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    return {
+        "pages": len(urls),
+        "ok": summary.ok,
+        "failed": summary.failed,
+        "retries": summary.retries,
+        "seconds": round(elapsed, 3),
+        "pages_per_s": round(len(urls) / elapsed, 2) if elapsed else None,
+        "parse_ms_p50": round(statistics.median(parse_ms), 2) if parse_ms else None,
+        "parse_ms_max": round(max(parse_ms), 2) if parse_ms else None,
+    }
+
+
+def _add_injection_args(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record law.moj.gov.tw responses and replay them from a local server")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = sub.add_parser("record", help="record responses into the fixture directory")
+    record_parser.add_argument("--urls", default=None, help="file with one URL per line (e.g. links.txt)")
+    record_parser.add_argument("--from-cache", action="store_true", help="import every response in the HTTP cache")
+    record_parser.add_argument("--cache-dir", default=HTTP_CACHE_DIR)
+
+    serve_parser = sub.add_parser("serve", help="replay the fixtures over HTTP")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    _add_injection_args(serve_parser)
+
+    bench_parser = sub.add_parser("bench", help="crawl and parse every recorded law page from a local replay server")
+    bench_parser.add_argument("--concurrency", type=int, default=8)
+    bench_parser.add_argument("--rate", type=float, default=0, help="requests per second per host (0 = unlimited)")
+    bench_parser.add_argument("--output", default=None, help="write the result as JSON")
+    _add_injection_args(bench_parser)
+    args = parser.parse_args()
+
+    fixtures = Fixtures(args.fixtures)
+    if args.command == "record":
+        if args.from_cache:
+            record_from_cache(fixtures, args.cache_dir)
+        if args.urls:
+            with open(args.urls, "r", encoding="utf-8") as f:
+                record_urls(fixtures, [line.strip() for line in f if line.strip()])
+        if not (args.urls or args.from_cache):
+            parser.error("record needs --urls and/or --from-cache")
+    else:
+        injection = dict(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                         error_status=args.error_status, seed=args.seed)
+        if args.command == "serve":
+            server = ThreadingHTTPServer((args.host, args.port), make_handler(fixtures, **injection))
+            print(f"[replay] Serving {len(fixtures.index)} responses on http://{args.host}:{args.port}")
+            print(f"[replay] export CRAWL_REPLAY_URL=http://{args.host}:{args.port}")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+        else:
+            result = bench(fixtures, args.concurrency, args.rate, **injection)
+            print(json.dumps(result, ensure_ascii=False, indent=2))
+            if args.output:
+                with open(args.output, "w", encoding="utf-8") as f:
+                    json.dump(result, f, ensure_ascii=False, indent=2)